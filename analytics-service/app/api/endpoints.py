@@ -1,16 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy import func
 import logging
 
 # ПРАВИЛЬНЫЕ ИМПОРТЫ - из корневой директории app
 from app.database import get_db
-from app.models import GameStat, UserStat
+from app.models import DailyGameStat
 from app.collectors.metrics import get_metrics
-from app.collectors.game_stats import game_stats
-from app.collectors.user_stats import user_stats
 from app.api import schemas
 from fastapi.responses import Response
 
@@ -34,18 +32,17 @@ async def get_game_stats(db: Session = Depends(get_db)):
     try:
         logger.info("Getting game stats...")
         
-        # Простая агрегация
+        # Дневные сводки вместо агрегации всей game_stats: строк - дни x типы игр
         stats = db.query(
-            GameStat.game_type,
-            func.count(GameStat.id).label('total_bets'),
-            func.sum(GameStat.win_amount).label('total_wins'),
-        ).group_by(GameStat.game_type).all()
+            DailyGameStat.game_type,
+            func.sum(DailyGameStat.bet_count).label('total_bets'),
+            func.sum(DailyGameStat.win_sum).label('total_wins'),
+            func.sum(DailyGameStat.bet_sum).label('total_bets_amount'),
+        ).group_by(DailyGameStat.game_type).all()
         
         result = []
         for stat in stats:
-            total_bets_amount = db.query(func.sum(GameStat.bet_amount)).filter(
-                GameStat.game_type == stat.game_type
-            ).scalar() or 0
+            total_bets_amount = stat.total_bets_amount or 0
             
             total_revenue = total_bets_amount - (stat.total_wins or 0)
             house_edge = (total_revenue / total_bets_amount * 100) if total_bets_amount > 0 else 0
@@ -73,6 +70,25 @@ async def get_game_stats(db: Session = Depends(get_db)):
             "data": []
         }
 
+@router.get("/games/stats/daily")
+async def get_daily_game_stats(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db)):
+    """Дневные сводки по типам игр за последние дни"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = db.query(DailyGameStat).filter(DailyGameStat.day >= since).order_by(
+        DailyGameStat.day.desc(), DailyGameStat.game_type
+    ).all()
+    data = [{
+        "date": row.day.isoformat(),
+        "game_type": row.game_type,
+        "bet_count": row.bet_count,
+        "bet_sum": row.bet_sum,
+        "win_count": row.win_count,
+        "win_sum": row.win_sum,
+        "net_revenue": row.bet_sum - row.win_sum,
+        "player_count": row.player_count
+    } for row in rows]
+    return {"success": True, "data": data, "count": len(data)}
+
 @router.get("/users/{user_id}/stats")
 async def get_user_stats(user_id: int, db: Session = Depends(get_db)):
     """Статистика по конкретному пользователю"""
@@ -108,28 +124,30 @@ async def get_user_stats(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/events/game")
-async def track_game_event(event_data: dict, db: Session = Depends(get_db)):
-    """Трекинг игровых событий"""
+async def track_game_event(event_data: dict):
+    """Трекинг игровых событий: событие ставится в очередь и пишется пачкой в фоне"""
+    from app.event_queue import event_queue, EventQueueFull
+    
     try:
-        event_type = event_data.get("type")
-        game_type = event_data.get("game_type")
-        user_id = event_data.get("user_id")
-        game_id = event_data.get("game_id")
-        amount = event_data.get("amount", 0.0)
-        
-        if event_type == "bet":
-            await game_stats.track_bet(db, game_type, user_id, game_id, amount)
-            await user_stats.update_user_stats(db, user_id, bet_amount=amount)
-        elif event_type == "win":
-            await game_stats.track_win(db, game_type, user_id, game_id, amount)
-            await user_stats.update_user_stats(db, user_id, win_amount=amount)
-        elif event_type == "deposit":
-            await user_stats.track_deposit(db, user_id, amount)
-        
-        return {"status": "tracked", "event": event_type}
+        await event_queue.put(event_data)
+    except EventQueueFull as e:
+        # Обратное давление: производитель может повторить позже или отправить пакетом
+        logger.warning(f"Game event rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail="Analytics queue is full")
+    
+    return {"status": "queued", "event": event_data.get("type")}
+
+@router.post("/events/batch")
+def track_game_events_batch(batch: schemas.EventBatch, db: Session = Depends(get_db)):
+    """Пакет игровых событий одной транзакцией: многострочный INSERT и upsert статистики игроков"""
+    from app.ingest import ingest_events
+    
+    try:
+        result = ingest_events(db, [event.model_dump() for event in batch.events])
+        return {"status": "tracked", **result}
         
     except Exception as e:
-        logger.error(f"Error tracking game event: {str(e)}")
+        logger.error(f"Error tracking event batch: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/health")
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from typing import List, Optional
+from pydantic import Field
 
 class GameStatResponse(BaseModel):
     game_type: str
@@ -21,4 +22,18 @@ class RevenueResponse(BaseModel):
     total_bets: float
     total_wins: float
     net_revenue: float
-    player_count: int
\ No newline at end of file
+    player_count: int
+
+class GameEvent(BaseModel):
+    type: str  # bet, win, batch, deposit
+    game_type: Optional[str] = None
+    user_id: Optional[int] = None
+    game_id: Optional[int] = None
+    amount: float = 0.0
+    # Только для type=batch - агрегат серии спинов
+    spins: int = 1
+    wins: int = 0
+    win_amount: float = 0.0
+
+class EventBatch(BaseModel):
+    events: List[GameEvent] = Field(..., max_length=5000)
@@ -16,4 +16,13 @@ TOTAL_REVENUE = Gauge('total_revenue', 'Total casino revenue')
 HOUSE_EDGE = Gauge('house_edge', 'Casino house edge percentage')
 
 def get_metrics():
-    return generate_latest()
\ No newline at end of file
+    return generate_latest()
+
+# Метрики очереди записи событий
+EVENT_QUEUE_DEPTH = Gauge('analytics_event_queue_depth', 'Events waiting in the ingestion queue')
+EVENT_FLUSH_LATENCY = Histogram('analytics_event_flush_seconds', 'Time to write one batch of events',
+                                buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+EVENT_FLUSH_SIZE = Histogram('analytics_event_flush_size', 'Events per written batch',
+                             buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+EVENTS_REJECTED = Counter('analytics_events_rejected_total', 'Events rejected because the queue stayed full')
+EVENTS_DROPPED = Counter('analytics_events_dropped_total', 'Queued events that failed to be written')
@@ -2,7 +2,7 @@ from sqlalchemy.orm import Session
 from ..models import UserStat
 from prometheus_client import Gauge, Counter
 import logging
-import datetime
+from datetime import datetime
 logger = logging.getLogger(__name__)
 
 class UserStatsCollector:
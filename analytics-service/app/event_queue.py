@@ -0,0 +1,143 @@
+"""Очередь записи игровых событий внутри процесса.
+
+/events/game кладет событие в ограниченную asyncio-очередь и сразу
+отвечает - производителю (slots, рулетка) не нужно ждать двух коммитов
+в БД. Фоновый флашер забирает события пачками и пишет их через
+ingest_events, когда набралось FLUSH_EVENTS событий или прошло
+FLUSH_INTERVAL с первого события пачки.
+
+Заполненная очередь - это обратное давление: put ждет места до
+ENQUEUE_TIMEOUT, потом событие отклоняется, и эндпоинт отвечает 503.
+При остановке сервиса очередь дописывается до конца.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import List
+
+from .database import SessionLocal
+from .ingest import ingest_events
+from .collectors.metrics import (
+    EVENT_QUEUE_DEPTH, EVENT_FLUSH_LATENCY, EVENT_FLUSH_SIZE, EVENTS_REJECTED, EVENTS_DROPPED
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("ANALYTICS_QUEUE_SIZE", "10000"))
+FLUSH_EVENTS = int(os.getenv("ANALYTICS_FLUSH_EVENTS", "500"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_FLUSH_MS", "50")) / 1000
+ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_ENQUEUE_TIMEOUT", "1.0"))
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_DRAIN_TIMEOUT", "10"))
+
+
+class EventQueueFull(Exception):
+    """Очередь не освободилась за ENQUEUE_TIMEOUT"""
+
+
+class EventQueue:
+    def __init__(self, maxsize: int = QUEUE_SIZE, flush_events: int = FLUSH_EVENTS,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS, session_factory=SessionLocal):
+        self.maxsize = maxsize
+        self.flush_events = flush_events
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+        self.queue = None
+        self._task = None
+        self._closing = False
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def put(self, event: dict, timeout: float = ENQUEUE_TIMEOUT_SECONDS):
+        """Ставит событие в очередь; ждет места не дольше timeout"""
+        if self.queue is None or self._closing:
+            raise EventQueueFull("Event queue is not running")
+        try:
+            await asyncio.wait_for(self.queue.put(event), timeout)
+        except asyncio.TimeoutError:
+            EVENTS_REJECTED.inc()
+            raise EventQueueFull(f"Event queue is full ({self.maxsize} events)")
+
+    async def _next_batch(self) -> List[dict]:
+        """Ждет первое событие, затем добирает пачку до размера или дедлайна"""
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_events:
+            # Уже лежащие в очереди события забираем без ожидания
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _write(self, events: List[dict]):
+        db = self.session_factory()
+        try:
+            try:
+                ingest_events(db, events)
+            except Exception as e:
+                # Пачка откатилась целиком - пишем по одному, чтобы потерять только сбойные события
+                logger.error(f"Event batch of {len(events)} failed, retrying one by one: {str(e)}")
+                for event in events:
+                    try:
+                        ingest_events(db, [event])
+                    except Exception as e:
+                        EVENTS_DROPPED.inc()
+                        logger.error(f"Dropped analytics event {event}: {str(e)}")
+        finally:
+            db.close()
+
+    async def flush(self, events: List[dict]):
+        started = time.perf_counter()
+        try:
+            # Сессия синхронная - пишем в потоке, чтобы не блокировать прием событий
+            await asyncio.to_thread(self._write, events)
+        finally:
+            EVENT_FLUSH_LATENCY.observe(time.perf_counter() - started)
+            EVENT_FLUSH_SIZE.observe(len(events))
+            for _ in events:
+                self.queue.task_done()
+
+    async def run(self):
+        """Флашер: пачка за пачкой, пока задачу не остановят"""
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.flush(batch)
+            except Exception as e:
+                logger.error(f"Event flush failed: {str(e)}")
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self._closing = False
+        self._task = asyncio.create_task(self.run())
+        logger.info(f"Event queue started: {self.maxsize} events, flush at {self.flush_events} "
+                    f"events or {self.flush_interval * 1000:.0f} ms")
+
+    async def stop(self, timeout: float = DRAIN_TIMEOUT_SECONDS):
+        """Перестает принимать события и дописывает очередь"""
+        if self._task is None:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            EVENTS_DROPPED.inc(self.depth())
+            logger.error(f"Event queue drain timed out, {self.depth()} events lost")
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+# Глобальная очередь сервиса
+event_queue = EventQueue()
+EVENT_QUEUE_DEPTH.set_function(event_queue.depth)
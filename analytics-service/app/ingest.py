@@ -0,0 +1,179 @@
+"""Пакетная запись игровых событий.
+
+/events/game на каждое событие делает два коммита: строку GameStat и
+отдельно обновление UserStat. Здесь пакет событий пишется одной
+транзакцией: все новые строки game_stats - одним многострочным INSERT,
+а изменения UserStat сначала суммируются по игроку внутри пакета и
+применяются одним upsert на всех игроков. Дневные сводки по типам игр
+обновляются в той же транзакции (см. rollups).
+
+Выигрыш закрывает последнюю открытую ставку игрока в этой игре - сперва
+среди ставок того же пакета (она еще не записана, выигрыш просто
+попадает в ее строку), и только если ее там нет - в БД.
+"""
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .models import GameStat, UserStat
+from .collectors.game_stats import game_stats
+from .collectors.user_stats import user_stats
+from .rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ("bet", "win", "batch", "deposit")
+
+
+def _new_delta() -> dict:
+    return {"bets": 0, "wins": 0, "deposits": 0.0}
+
+
+def _user_deltas_upsert(deltas: Dict[int, dict], now: datetime):
+    """Один INSERT ... ON CONFLICT на всех игроков пакета; счетчики прибавляются к текущим"""
+    stmt = pg_insert(UserStat).values([{
+        "user_id": user_id,
+        "total_bets": delta["bets"],
+        "total_wins": delta["wins"],
+        "total_losses": 0,
+        "total_deposits": delta["deposits"],
+        "total_withdrawals": 0.0,
+        "current_balance": delta["deposits"],
+        "last_activity": now
+    } for user_id, delta in sorted(deltas.items())])  # один порядок строк - без взаимных блокировок
+    return stmt.on_conflict_do_update(index_elements=[UserStat.user_id], set_={
+        "total_bets": UserStat.total_bets + stmt.excluded.total_bets,
+        "total_wins": UserStat.total_wins + stmt.excluded.total_wins,
+        "total_deposits": UserStat.total_deposits + stmt.excluded.total_deposits,
+        "current_balance": UserStat.current_balance + stmt.excluded.current_balance,
+        "last_activity": stmt.excluded.last_activity
+    })
+
+
+def _close_stored_bet(db: Session, event: dict):
+    """Выигрыш к ставке из прошлого пакета: одна UPDATE по последней открытой ставке.
+
+    Возвращает (день ставки, тип игры, сумма) для сводок или None, если ставки нет.
+    """
+    last_bet = select(GameStat.id).where(
+        GameStat.game_type == event.get("game_type"),
+        GameStat.user_id == event.get("user_id"),
+        GameStat.game_id == event.get("game_id"),
+        GameStat.is_winner == False
+    ).order_by(GameStat.created_at.desc(), GameStat.id.desc()).limit(1).scalar_subquery()
+    closed = db.execute(update(GameStat).where(GameStat.id == last_bet).values(
+        win_amount=event.get("amount", 0.0), is_winner=True, wins=1
+    ).returning(GameStat.created_at, GameStat.game_type).execution_options(synchronize_session=False)).first()
+    if closed is None:
+        return None
+    return closed.created_at.date(), closed.game_type, event.get("amount", 0.0)
+
+
+def ingest_events(db: Session, events: List[dict]) -> dict:
+    """Записывает пакет событий одной транзакцией; неизвестные типы пропускаются"""
+    now = datetime.utcnow()
+    rows: List[dict] = []
+    open_bets: Dict[tuple, List[dict]] = {}
+    stored_wins: List[dict] = []
+    deltas: Dict[int, dict] = {}
+    deposits_only = set()
+    skipped = 0
+    # Метрики Prometheus обновляются только после коммита
+    bet_counts, win_counts, bet_amounts = Counter(), Counter(), []
+
+    for event in events:
+        event_type = event.get("type")
+        game_type = event.get("game_type")
+        user_id = event.get("user_id")
+        amount = event.get("amount", 0.0)
+        if event_type not in EVENT_TYPES:
+            skipped += 1
+            continue
+
+        delta = deltas.setdefault(user_id, _new_delta())
+        if event_type == "deposit":
+            delta["deposits"] += amount
+            if delta["bets"] == 0 and delta["wins"] == 0:
+                deposits_only.add(user_id)
+            continue
+        deposits_only.discard(user_id)
+
+        if event_type == "bet":
+            row = {"game_type": game_type, "game_id": event.get("game_id"), "user_id": user_id,
+                   "bet_amount": amount, "win_amount": 0.0, "is_winner": False, "spins": 1, "wins": 0,
+                   "created_at": now}
+            rows.append(row)
+            open_bets.setdefault((game_type, user_id, event.get("game_id")), []).append(row)
+            if amount > 0:
+                delta["bets"] += 1
+            bet_counts[game_type] += 1
+            bet_amounts.append((game_type, amount))
+        elif event_type == "win":
+            pending = open_bets.get((game_type, user_id, event.get("game_id")))
+            if pending:
+                row = pending.pop()
+                row["win_amount"] = amount
+                row["is_winner"] = True
+                row["wins"] = 1
+                win_counts[game_type] += 1
+            else:
+                stored_wins.append(event)
+            if amount > 0:
+                delta["wins"] += 1
+        else:
+            # Агрегат серии спинов - одна строка с суммами, счетчики по числу спинов
+            spins = event.get("spins", 1)
+            wins = event.get("wins", 0)
+            win_amount = event.get("win_amount", 0.0)
+            rows.append({"game_type": game_type, "game_id": event.get("game_id"), "user_id": user_id,
+                         "bet_amount": amount, "win_amount": win_amount, "is_winner": win_amount > 0,
+                         "spins": spins, "wins": wins, "created_at": now})
+            if amount > 0:
+                delta["bets"] += spins
+            if win_amount > 0:
+                delta["wins"] += wins
+            bet_counts[game_type] += spins
+            win_counts[game_type] += wins
+
+    deltas.pop(None, None)
+    try:
+        if rows:
+            db.execute(insert(GameStat), rows)
+        closed_bets = [closed for closed in (_close_stored_bet(db, event) for event in stored_wins) if closed]
+        for _, game_type, _ in closed_bets:
+            win_counts[game_type] += 1
+        apply_rollups(db, rows, closed_bets)
+
+        known_users = set()
+        if deltas:
+            known_users = set(db.execute(
+                select(UserStat.user_id).where(UserStat.user_id.in_(deltas.keys()))
+            ).scalars())
+            # Депозит без игры, как и в /events/game, не заводит статистику новому игроку
+            for user_id in deposits_only - known_users:
+                deltas.pop(user_id, None)
+        if deltas:
+            db.execute(_user_deltas_upsert(deltas, now))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for game_type, count in bet_counts.items():
+        game_stats.bets_counter.labels(game_type=game_type).inc(count)
+    for game_type, count in win_counts.items():
+        if count:
+            game_stats.wins_counter.labels(game_type=game_type).inc(count)
+    for game_type, amount in bet_amounts:
+        game_stats.bet_amount_histogram.labels(game_type=game_type).observe(amount)
+    user_stats.user_registrations.inc(len(deltas.keys() - known_users))
+    user_stats.active_users_gauge.inc(len(deltas))
+
+    logger.info(f"Ingested batch: {len(events)} events, {len(rows)} game rows, "
+                f"{len(deltas)} users, {skipped} skipped")
+    return {"events": len(events), "game_stats": len(rows), "users": len(deltas), "skipped": skipped}
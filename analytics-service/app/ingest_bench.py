@@ -0,0 +1,91 @@
+"""Пропускная способность записи событий на одном воркере.
+
+Сравнивает путь /events/game (событие за событием: строка GameStat и
+обновление UserStat, два коммита) с пакетной записью ingest_events.
+Поток событий - ставки игроков, каждая пятая с выигрышем.
+
+    python -m app.ingest_bench --events 20000 --batch-size 500
+    python -m app.ingest_bench --database-url sqlite:///bench.db
+"""
+import time
+import random
+import asyncio
+import argparse
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .database import Base, DATABASE_URL
+from .collectors.game_stats import game_stats
+from .collectors.user_stats import user_stats
+from .ingest import ingest_events
+
+
+def _events(n: int, users: int) -> list:
+    rng = random.Random(1)
+    events = []
+    for game_id in range(n):
+        user_id = rng.randint(1, users)
+        events.append({"type": "bet", "game_type": "slots", "user_id": user_id, "game_id": game_id, "amount": 1.0})
+        if game_id % 5 == 0:
+            events.append({"type": "win", "game_type": "slots", "user_id": user_id, "game_id": game_id, "amount": 3.0})
+    return events[:n]
+
+
+def benchmark(n: int, batch_size: int, users: int, database_url: str = DATABASE_URL) -> dict:
+    """Событий в секунду для каждого пути"""
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    events = _events(n, users)
+
+    async def single():
+        db = Session()
+        try:
+            for event in events:
+                if event["type"] == "bet":
+                    await game_stats.track_bet(db, event["game_type"], event["user_id"], event["game_id"], event["amount"])
+                    await user_stats.update_user_stats(db, event["user_id"], bet_amount=event["amount"])
+                else:
+                    await game_stats.track_win(db, event["game_type"], event["user_id"], event["game_id"], event["amount"])
+                    await user_stats.update_user_stats(db, event["user_id"], win_amount=event["amount"])
+        finally:
+            db.close()
+
+    def batched():
+        db = Session()
+        try:
+            for i in range(0, len(events), batch_size):
+                ingest_events(db, events[i:i + batch_size])
+        finally:
+            db.close()
+
+    def events_per_second(fn) -> float:
+        started = time.perf_counter()
+        fn()
+        return len(events) / (time.perf_counter() - started)
+
+    try:
+        return {
+            "one event per request": events_per_second(lambda: asyncio.run(single())),
+            f"batches of {batch_size}": events_per_second(batched),
+        }
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics ingestion throughput")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--database-url", default=DATABASE_URL, help="tables of this DB are recreated")
+    args = parser.parse_args()
+
+    for name, rate in benchmark(args.events, args.batch_size, args.users, args.database_url).items():
+        print(f"{name:<24} {rate:>10,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
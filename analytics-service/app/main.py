@@ -1,14 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .database import Base, engine
+from .schema import upgrade_schema
 from .api.endpoints import router as analytics_router
 
-# Создаем таблицы
+# Создаем таблицы и доводим уже существующие до моделей
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: флашер очереди событий
+    from .event_queue import event_queue
+    event_queue.start()
+    
+    yield
+    
+    # Shutdown: дописываем принятые события
+    await event_queue.stop()
 
 app = FastAPI(
     title="Analytics Service",
     description="Microservice for casino analytics and metrics",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Подключаем роутеры
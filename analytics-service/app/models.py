@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, JSON, Boolean
 from .database import Base
 from datetime import datetime
 
@@ -13,12 +13,15 @@ class GameStat(Base):
     win_amount = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_winner = Column(Boolean)
+    # Строка серии автоигры (type=batch) - сколько спинов и выигрышей в ней
+    spins = Column(Integer, default=1)
+    wins = Column(Integer, default=0)
 
 class UserStat(Base):
     __tablename__ = "user_stats"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
+    user_id = Column(Integer, unique=True, index=True)  # Ключ upsert пакетной записи
     total_bets = Column(Integer, default=0)
     total_wins = Column(Integer, default=0)
     total_losses = Column(Integer, default=0)
@@ -35,4 +38,24 @@ class DailyRevenue(Base):
     total_bets = Column(Float, default=0.0)
     total_wins = Column(Float, default=0.0)
     net_revenue = Column(Float, default=0.0)  # total_bets - total_wins
-    player_count = Column(Integer, default=0)
\ No newline at end of file
+    player_count = Column(Integer, default=0)
+
+class DailyGameStat(Base):
+    """Сводка по типу игры за день, обновляется при записи событий"""
+    __tablename__ = "daily_game_stats"
+    
+    day = Column(Date, primary_key=True)
+    game_type = Column(String, primary_key=True)
+    bet_count = Column(Integer, default=0)
+    bet_sum = Column(Float, default=0.0)
+    win_count = Column(Integer, default=0)
+    win_sum = Column(Float, default=0.0)
+    player_count = Column(Integer, default=0)  # Уникальные игроки за день
+
+class DailyGamePlayer(Base):
+    """Игроки, уже учтенные в player_count сводки за день"""
+    __tablename__ = "daily_game_players"
+    
+    day = Column(Date, primary_key=True)
+    game_type = Column(String, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
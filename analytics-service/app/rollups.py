@@ -0,0 +1,130 @@
+"""Дневные сводки по типам игр.
+
+/games/stats раньше агрегировал всю таблицу game_stats и еще по запросу
+на каждый тип игры - стоимость росла вместе со всей историей. Теперь
+ingest_events в той же транзакции прибавляет к строке (день, тип игры)
+число ставок и выигрышей и их суммы, а статистика читает эти строки.
+
+Уникальные игроки считаются через таблицу участников дня: строка игрока
+вставляется с ON CONFLICT DO NOTHING, и к player_count прибавляются
+только реально вставленные.
+
+Ставки и выигрыши считаются по spins/wins строки game_stats: обычная
+ставка - один спин, серия автоигры - все ее спины. Выигрыш относится ко
+дню своей ставки. Старые строки без spins/wins считаются как одна
+ставка и выигрыш по is_winner.
+
+Пересборка по всей истории (бэкфилл или проверка):
+
+    python -m app.rollups rebuild
+"""
+import argparse
+import logging
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Date, case, delete, distinct, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .models import GameStat, DailyGameStat, DailyGamePlayer
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_GAME_TYPE = "unknown"
+
+
+def _new_rollup() -> dict:
+    return {"bet_count": 0, "bet_sum": 0.0, "win_count": 0, "win_sum": 0.0, "player_count": 0}
+
+
+def rollup_key(day, game_type) -> Tuple[date, str]:
+    return day, game_type or UNKNOWN_GAME_TYPE
+
+
+def apply_rollups(db: Session, rows: List[dict], closed_bets: List[tuple]):
+    """Прибавляет к сводкам новые строки game_stats и выигрыши к ставкам прошлых пакетов.
+
+    closed_bets - (день ставки, тип игры, сумма выигрыша). Коммит делает вызывающий.
+    """
+    rollups: Dict[tuple, dict] = {}
+    players = set()
+    for row in rows:
+        key = rollup_key(row["created_at"].date(), row["game_type"])
+        rollup = rollups.setdefault(key, _new_rollup())
+        rollup["bet_count"] += row["spins"]
+        rollup["bet_sum"] += row["bet_amount"] or 0.0
+        if row["is_winner"]:
+            rollup["win_count"] += row["wins"]
+            rollup["win_sum"] += row["win_amount"] or 0.0
+        if row["user_id"] is not None:
+            players.add((*key, row["user_id"]))
+    for day, game_type, win_amount in closed_bets:
+        rollup = rollups.setdefault(rollup_key(day, game_type), _new_rollup())
+        rollup["win_count"] += 1
+        rollup["win_sum"] += win_amount or 0.0
+    if not rollups:
+        return
+
+    if players:
+        stmt = pg_insert(DailyGamePlayer).values([
+            {"day": day, "game_type": game_type, "user_id": user_id}
+            for day, game_type, user_id in sorted(players)
+        ]).on_conflict_do_nothing().returning(DailyGamePlayer.day, DailyGamePlayer.game_type)
+        new_players = Counter(tuple(row) for row in db.execute(stmt))
+        for key, count in new_players.items():
+            rollups[key]["player_count"] += count
+
+    # Один порядок строк у всех транзакций - без взаимных блокировок
+    stmt = pg_insert(DailyGameStat).values([
+        {"day": day, "game_type": game_type, **rollup} for (day, game_type), rollup in sorted(rollups.items())
+    ])
+    db.execute(stmt.on_conflict_do_update(index_elements=[DailyGameStat.day, DailyGameStat.game_type], set_={
+        column: getattr(DailyGameStat, column) + getattr(stmt.excluded, column)
+        for column in ("bet_count", "bet_sum", "win_count", "win_sum", "player_count")
+    }))
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Пересобирает сводки по всей game_stats одной транзакцией; возвращает число строк"""
+    day = func.date(GameStat.created_at, type_=Date)
+    game_type = func.coalesce(GameStat.game_type, UNKNOWN_GAME_TYPE)
+
+    db.execute(delete(DailyGamePlayer))
+    db.execute(delete(DailyGameStat))
+    db.execute(insert(DailyGamePlayer).from_select(
+        ["day", "game_type", "user_id"],
+        select(day, game_type, GameStat.user_id).where(GameStat.user_id.isnot(None)).distinct()
+    ))
+    db.execute(insert(DailyGameStat).from_select(
+        ["day", "game_type", "bet_count", "bet_sum", "win_count", "win_sum", "player_count"],
+        select(
+            day, game_type,
+            func.sum(func.coalesce(GameStat.spins, 1)),
+            func.coalesce(func.sum(GameStat.bet_amount), 0.0),
+            func.sum(case((GameStat.is_winner == True, func.coalesce(GameStat.wins, 1)), else_=0)),
+            func.coalesce(func.sum(case((GameStat.is_winner == True, GameStat.win_amount), else_=0.0)), 0.0),
+            func.count(distinct(GameStat.user_id))
+        ).group_by(day, game_type)
+    ))
+    db.commit()
+    return db.query(DailyGameStat).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily game stats rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    from .database import Base, SessionLocal, engine
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild_rollups(db)} daily rollup rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
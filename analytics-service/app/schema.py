@@ -0,0 +1,115 @@
+"""Доводка схемы существующей базы до моделей.
+
+create_all создает только недостающие таблицы: новые колонки, индексы и
+ограничения уже существующих таблиц он не трогает. Здесь - идемпотентные
+шаги, которые main.py выполняет при старте сразу после create_all. На
+свежей базе каждый шаг видит, что все уже на месте, и ничего не делает.
+
+user_stats.user_id: ingest_events пишет счетчики через ON CONFLICT
+(user_id), для этого нужен уникальный индекс. В старой схеме индекс
+ix_user_stats_user_id был обычным, и гонка "нет строки - вставляю"
+могла оставить несколько строк одного игрока. Перед заменой индекса
+дубликаты сливаются в строку с меньшим id: счетчики складываются,
+last_activity берется последняя.
+
+game_stats.spins/wins: колонки строки серии автоигры. Добавляются без
+серверного default - у старых строк они NULL, и сводки (app.rollups)
+считают такую строку одной ставкой и выигрышем по is_winner. Новые
+строки получают значения из default модели.
+
+На Postgres шаги идут под advisory lock транзакции: воркеры, стартующие
+одновременно, не добавляют одну колонку дважды.
+
+Запуск вручную (та же доводка без старта сервиса):
+
+    python -m app.schema
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_LOCK_ID = 7_420_048  # Ключ pg_advisory_xact_lock доводки схемы
+USER_STATS_INDEX = "ix_user_stats_user_id"
+
+# Колонки, появившиеся в уже существующих таблицах: (таблица, колонка, тип)
+ADDED_COLUMNS = [
+    ("game_stats", "spins", "INTEGER"),
+    ("game_stats", "wins", "INTEGER"),
+]
+
+MERGE_DUPLICATE_USER_STATS = """
+UPDATE user_stats SET
+    total_bets = (SELECT SUM(s.total_bets) FROM user_stats s WHERE s.user_id = user_stats.user_id),
+    total_wins = (SELECT SUM(s.total_wins) FROM user_stats s WHERE s.user_id = user_stats.user_id),
+    total_losses = (SELECT SUM(s.total_losses) FROM user_stats s WHERE s.user_id = user_stats.user_id),
+    total_deposits = (SELECT SUM(s.total_deposits) FROM user_stats s WHERE s.user_id = user_stats.user_id),
+    total_withdrawals = (SELECT SUM(s.total_withdrawals) FROM user_stats s WHERE s.user_id = user_stats.user_id),
+    current_balance = (SELECT SUM(s.current_balance) FROM user_stats s WHERE s.user_id = user_stats.user_id),
+    last_activity = (SELECT MAX(s.last_activity) FROM user_stats s WHERE s.user_id = user_stats.user_id)
+WHERE id IN (
+    SELECT MIN(id) FROM user_stats WHERE user_id IS NOT NULL
+    GROUP BY user_id HAVING COUNT(*) > 1
+)
+"""
+
+DELETE_DUPLICATE_USER_STATS = """
+DELETE FROM user_stats
+WHERE user_id IS NOT NULL AND id NOT IN (
+    SELECT MIN(id) FROM user_stats WHERE user_id IS NOT NULL GROUP BY user_id
+)
+"""
+
+
+def _add_missing_columns(conn: Connection):
+    inspector = inspect(conn)
+    for table, column, column_type in ADDED_COLUMNS:
+        if column in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+        logger.info(f"Added column {table}.{column}")
+
+
+def _has_unique_user_id(conn: Connection) -> bool:
+    inspector = inspect(conn)
+    indexes = inspector.get_indexes("user_stats")
+    constraints = inspector.get_unique_constraints("user_stats")
+    return any(index["unique"] and index["column_names"] == ["user_id"] for index in indexes) \
+        or any(constraint["column_names"] == ["user_id"] for constraint in constraints)
+
+
+def _upgrade_user_stats(conn: Connection):
+    """Сливает дубликаты игроков и делает индекс user_stats.user_id уникальным"""
+    if _has_unique_user_id(conn):
+        return
+    if conn.dialect.name == "postgresql":
+        # Пока идет слияние, ingest другого воркера не должен вставить новый дубликат
+        conn.execute(text("LOCK TABLE user_stats IN SHARE ROW EXCLUSIVE MODE"))
+    conn.execute(text(MERGE_DUPLICATE_USER_STATS))
+    merged = conn.execute(text(DELETE_DUPLICATE_USER_STATS)).rowcount
+    conn.execute(text(f"DROP INDEX IF EXISTS {USER_STATS_INDEX}"))
+    conn.execute(text(f"CREATE UNIQUE INDEX {USER_STATS_INDEX} ON user_stats (user_id)"))
+    logger.info(f"user_stats.user_id is unique now, {merged} duplicate rows merged")
+
+
+def upgrade_schema(engine: Engine):
+    """Идемпотентно доводит существующие таблицы до моделей; одна транзакция"""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_ID})
+        _add_missing_columns(conn)
+        _upgrade_user_stats(conn)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from .database import Base, engine
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    print("Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
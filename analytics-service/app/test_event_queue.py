@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.event_queue import EventQueue, EventQueueFull
+from app.models import GameStat, UserStat
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def bet(game_id: int) -> dict:
+    return {"type": "bet", "game_type": "slots", "user_id": 1, "game_id": game_id, "amount": 1.0}
+
+
+def test_flushes_by_size_and_time_and_drains_on_stop(session_factory, monkeypatch):
+    flushed = []
+    original_write = EventQueue._write
+    monkeypatch.setattr(EventQueue, "_write", lambda self, events: (flushed.append(len(events)),
+                                                                     original_write(self, events)))
+
+    async def run():
+        queue = EventQueue(maxsize=100, flush_events=5, flush_interval=0.05, session_factory=session_factory)
+        queue.start()
+        for i in range(7):
+            await queue.put(bet(i))
+        # 5 событий уходят сразу по размеру, остаток - по таймеру
+        await asyncio.sleep(0.2)
+        assert flushed == [5, 2]
+
+        for i in range(7, 10):
+            await queue.put(bet(i))
+        await queue.stop()
+        with pytest.raises(EventQueueFull):
+            await queue.put(bet(10))
+
+    asyncio.run(run())
+
+    db = session_factory()
+    assert db.query(GameStat).count() == 10
+    assert db.query(UserStat).one().total_bets == 10
+    db.close()
+
+
+def test_full_queue_applies_backpressure(session_factory):
+    async def run():
+        queue = EventQueue(maxsize=2, flush_events=1, flush_interval=0.01, session_factory=session_factory)
+        blocked = asyncio.Event()
+
+        async def stuck_flush(events):
+            await blocked.wait()
+            for _ in events:
+                queue.queue.task_done()
+
+        queue.flush = stuck_flush
+        queue.start()
+        # Одно событие забрал зависший флашер, два заполнили очередь
+        for i in range(3):
+            await queue.put(bet(i))
+        await asyncio.sleep(0)
+        with pytest.raises(EventQueueFull):
+            await queue.put(bet(3), timeout=0.05)
+        assert queue.depth() == 2
+
+        blocked.set()
+        await queue.stop()
+        assert queue.depth() == 0
+
+    asyncio.run(run())
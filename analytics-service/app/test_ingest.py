@@ -0,0 +1,88 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.api.endpoints import router
+from app.database import Base, get_db
+from app.models import GameStat, UserStat
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    session = sessionmaker(autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(engine):
+    TestingSession = sessionmaker(autoflush=False, bind=engine)
+
+    def override_db():
+        db = TestingSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_db
+    with TestClient(app) as c:
+        yield c
+
+
+def test_batch_is_one_transaction_with_aggregated_user_deltas(client, db_session, engine):
+    # Игрок 1 уже есть, ставка игрока 2 из прошлого пакета ждет выигрыша
+    db_session.add(UserStat(user_id=1, total_bets=10, total_wins=2))
+    db_session.add(GameStat(game_type="slots", game_id=7, user_id=2, bet_amount=1.0,
+                            win_amount=0.0, is_winner=False))
+    db_session.commit()
+
+    events = [
+        {"type": "bet", "game_type": "slots", "user_id": 1, "game_id": 1, "amount": 1.0},
+        {"type": "win", "game_type": "slots", "user_id": 1, "game_id": 1, "amount": 5.0},
+        {"type": "bet", "game_type": "roulette", "user_id": 1, "game_id": 2, "amount": 2.0},
+        {"type": "batch", "game_type": "slots", "user_id": 3, "game_id": 3, "amount": 50.0,
+         "spins": 50, "wins": 4, "win_amount": 20.0},
+        {"type": "win", "game_type": "slots", "user_id": 2, "game_id": 7, "amount": 3.0},
+        {"type": "deposit", "user_id": 1, "amount": 100.0},
+        {"type": "deposit", "user_id": 9, "amount": 100.0},
+        {"type": "refund", "user_id": 1},
+    ]
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = client.post("/analytics/events/batch", json={"events": events})
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert response.json()["game_stats"] == 3
+    assert response.json()["skipped"] == 1
+    # INSERT строк, UPDATE ставки из БД, участники дня и upsert сводок,
+    # выборка игроков и upsert их статистики - независимо от числа событий
+    assert len(statements) == 6
+
+    db_session.expire_all()
+    won = db_session.query(GameStat).filter_by(user_id=1, game_id=1).one()
+    assert won.is_winner and won.win_amount == 5.0
+    assert db_session.query(GameStat).filter_by(user_id=2, game_id=7).one().is_winner
+
+    users = {u.user_id: u for u in db_session.query(UserStat)}
+    assert (users[1].total_bets, users[1].total_wins, users[1].total_deposits) == (12, 3, 100.0)
+    assert (users[2].total_bets, users[2].total_wins) == (0, 1)
+    assert (users[3].total_bets, users[3].total_wins) == (50, 4)
+    # Депозит без игры новому игроку статистику не заводит
+    assert 9 not in users
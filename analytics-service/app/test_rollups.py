@@ -0,0 +1,70 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.endpoints import router
+from app.database import Base, get_db
+from app.ingest import ingest_events
+from app.models import DailyGameStat
+from app.rollups import rebuild_rollups
+
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def snapshot(db) -> dict:
+    db.expire_all()
+    return {(r.day, r.game_type): (r.bet_count, r.bet_sum, r.win_count, r.win_sum, r.player_count)
+            for r in db.query(DailyGameStat)}
+
+
+def test_incremental_rollups_match_rebuild_and_serve_stats(Session):
+    db = Session()
+    ingest_events(db, [
+        {"type": "bet", "game_type": "slots", "user_id": 1, "game_id": 1, "amount": 2.0},
+        {"type": "bet", "game_type": "slots", "user_id": 2, "game_id": 2, "amount": 3.0},
+        {"type": "bet", "game_type": "roulette", "user_id": 1, "game_id": 3, "amount": 10.0},
+    ])
+    # Выигрыш к ставке прошлого пакета, повторный игрок и серия спинов
+    ingest_events(db, [
+        {"type": "win", "game_type": "slots", "user_id": 2, "game_id": 2, "amount": 9.0},
+        {"type": "bet", "game_type": "slots", "user_id": 1, "game_id": 4, "amount": 1.0},
+        {"type": "batch", "game_type": "slots", "user_id": 3, "game_id": 5, "amount": 50.0,
+         "spins": 50, "wins": 4, "win_amount": 20.0},
+    ])
+
+    incremental = snapshot(db)
+    (slots,) = [v for (_, game_type), v in incremental.items() if game_type == "slots"]
+    # 3 ставки и серия из 50 спинов; выигрыш к ставке и 4 выигрыша серии
+    assert slots == (53, 56.0, 5, 29.0, 3)
+
+    rebuild_rollups(db)
+    assert snapshot(db) == incremental
+    db.close()
+
+    def override_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_db
+    with TestClient(app) as client:
+        stats = {s["game_type"]: s for s in client.get("/analytics/games/stats").json()["data"]}
+        daily = client.get("/analytics/games/stats/daily").json()["data"]
+
+    assert stats["slots"]["total_bets"] == 53
+    assert stats["slots"]["total_wins"] == 29.0
+    assert stats["slots"]["total_revenue"] == 27.0
+    assert stats["roulette"]["house_edge"] == 100.0
+    assert {row["game_type"]: row["player_count"] for row in daily} == {"slots": 3, "roulette": 1}
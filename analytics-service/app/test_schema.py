@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.ingest import _user_deltas_upsert, ingest_events
+from app.models import DailyGameStat, GameStat, UserStat
+from app.rollups import rebuild_rollups
+from app.schema import upgrade_schema
+
+# user_stats в том виде, в каком ее создавал create_all до уникального user_id
+OLD_USER_STATS = [
+    """CREATE TABLE user_stats (
+        id INTEGER PRIMARY KEY, user_id INTEGER, total_bets INTEGER, total_wins INTEGER,
+        total_losses INTEGER, total_deposits FLOAT, total_withdrawals FLOAT,
+        current_balance FLOAT, last_activity DATETIME)""",
+    "CREATE INDEX ix_user_stats_id ON user_stats (id)",
+    "CREATE INDEX ix_user_stats_user_id ON user_stats (user_id)",
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_old_user_stats_are_merged_and_made_unique(engine):
+    with engine.begin() as conn:
+        for statement in OLD_USER_STATS:
+            conn.execute(text(statement))
+        conn.execute(text(
+            "INSERT INTO user_stats VALUES "
+            "(1, 7, 2, 1, 0, 10.0, 0.0, 10.0, '2024-01-01 00:00:00'),"
+            "(2, 7, 3, 0, 0, 5.0, 0.0, 5.0, '2024-01-02 00:00:00'),"
+            "(3, 8, 1, 1, 0, 0.0, 0.0, 0.0, '2024-01-01 00:00:00')"
+        ))
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    indexes = {index["name"]: index for index in inspect(engine).get_indexes("user_stats")}
+    assert indexes["ix_user_stats_user_id"]["unique"]
+
+    with Session(engine) as db:
+        rows = {row.user_id: row for row in db.query(UserStat).all()}
+        assert set(rows) == {7, 8}
+        assert (rows[7].id, rows[7].total_bets, rows[7].total_wins) == (1, 5, 1)
+        assert rows[7].total_deposits == pytest.approx(15.0)
+        assert rows[7].last_activity == datetime(2024, 1, 2)
+
+        # Upsert пакетной записи теперь находит строку по user_id
+        db.execute(_user_deltas_upsert({7: {"bets": 1, "wins": 0, "deposits": 0.0}}, datetime(2024, 1, 3)))
+        db.commit()
+        assert db.query(UserStat).filter(UserStat.user_id == 7).one().total_bets == 6
+
+
+def test_upgrade_is_noop_on_fresh_schema(engine):
+    Base.metadata.create_all(bind=engine)
+    before = inspect(engine).get_indexes("user_stats")
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+    assert inspect(engine).get_indexes("user_stats") == before
+
+
+def test_old_game_stats_get_series_columns(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE game_stats (id INTEGER PRIMARY KEY, game_type VARCHAR, game_id INTEGER, "
+            "user_id INTEGER, bet_amount FLOAT, win_amount FLOAT, created_at DATETIME, is_winner BOOLEAN)"
+        ))
+        conn.execute(text(
+            "INSERT INTO game_stats VALUES (1, 'slots', 1, 7, 1.0, 3.0, '2024-01-01 10:00:00', 1)"
+        ))
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    assert {"spins", "wins"} <= {c["name"] for c in inspect(engine).get_columns("game_stats")}
+
+    with Session(engine) as db:
+        # Старая строка - без значений серии, новые пишутся с ними
+        old = db.get(GameStat, 1)
+        assert (old.spins, old.wins) == (None, None)
+        ingest_events(db, [{"type": "bet", "game_type": "slots", "game_id": 2, "user_id": 7,
+                            "amount": 2.0}])
+        assert db.query(GameStat).filter(GameStat.game_id == 2).one().spins == 1
+
+        rebuild_rollups(db)
+        rollups = db.query(DailyGameStat).all()
+        assert sum(r.bet_count for r in rollups) == 2
+        assert sum(r.win_count for r in rollups) == 1
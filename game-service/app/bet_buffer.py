@@ -0,0 +1,187 @@
+"""Write-behind буфер ставок рулетки.
+
+Принятая ставка получает id из заранее выделенного блока значений
+последовательности и кладется в список Redis своего раунда. Фоновый
+flusher пачками переносит ставки в Postgres одним multi-row INSERT.
+Перед спином раунд закрывается и буфер дописывается до конца, так что
+к расчету все ставки уже лежат в БД.
+"""
+import os
+import json
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from .database import AsyncSessionLocal, RouletteBet, RouletteBetType
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = "roulette:bets:{}"
+CLOSED_KEY = "roulette:bets:{}:closed"
+FLUSH_LOCK_KEY = "roulette:bets:{}:flush"
+PENDING_KEY = "roulette:bets:pending"
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("ROULETTE_BET_FLUSH_INTERVAL", "0.25"))
+FLUSH_BATCH_SIZE = int(os.getenv("ROULETTE_BET_FLUSH_BATCH", "1000"))
+ID_BLOCK_SIZE = int(os.getenv("ROULETTE_BET_ID_BLOCK", "500"))
+CLOSED_TTL_SECONDS = 24 * 3600
+FLUSH_LOCK_SECONDS = 30
+
+# Ставка принимается только пока раунд не закрыт - атомарно с записью в буфер
+PUSH_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[2])
+return 1
+"""
+# Блокировку снимает только ее владелец: после истечения TTL ключ может принадлежать другому flush
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# Вставленная пачка снимается с головы буфера, только пока блокировка у этого flush:
+# иначе голову уже вставил и срезал другой flush, и LTRIM срезал бы невставленные ставки.
+# KEYS: буфер, блокировка; ARGV: токен, размер пачки
+TRIM_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+redis.call('LTRIM', KEYS[1], ARGV[2], -1)
+return 1
+"""
+_push_script = redis_client.register_script(PUSH_SCRIPT)
+_release_script = redis_client.register_script(RELEASE_SCRIPT)
+_trim_script = redis_client.register_script(TRIM_SCRIPT)
+
+
+class BetIdAllocator:
+    """Выдает id ставок из блоков, заранее взятых у последовательности Postgres"""
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._ids: List[int] = []
+        self._lock = asyncio.Lock()
+
+    async def _fetch_block(self) -> List[int]:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                text("SELECT nextval(pg_get_serial_sequence('roulette_bets', 'id')) "
+                     "FROM generate_series(1, :n)"),
+                {"n": self.block_size}
+            )).all()
+            return [row[0] for row in rows]
+
+    async def allocate(self) -> int:
+        async with self._lock:
+            if not self._ids:
+                self._ids = await self._fetch_block()
+                self._ids.reverse()
+            return self._ids.pop()
+
+
+bet_ids = BetIdAllocator()
+
+
+async def is_closed(game_id: int) -> bool:
+    return bool(await redis_client.exists(CLOSED_KEY.format(game_id)))
+
+
+async def buffer_bet(bet: dict) -> bool:
+    """Кладет ставку в буфер раунда. False - раунд уже закрыт"""
+    game_id = bet["game_id"]
+    accepted = await _push_script(
+        keys=[BUFFER_KEY.format(game_id), CLOSED_KEY.format(game_id), PENDING_KEY],
+        args=[json.dumps(bet), game_id]
+    )
+    return bool(accepted)
+
+
+async def close_round(game_id: int):
+    """Закрывает прием ставок в буфер раунда"""
+    await redis_client.set(CLOSED_KEY.format(game_id), 1, ex=CLOSED_TTL_SECONDS)
+
+
+async def _insert_bets(rows: List[dict]):
+    """Multi-row INSERT пачки ставок; повторная вставка того же id игнорируется"""
+    values = [{
+        **row,
+        "bet_type": RouletteBetType(row["bet_type"]),
+        "created_at": datetime.fromisoformat(row["created_at"]),
+    } for row in rows]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(RouletteBet).on_conflict_do_nothing(index_elements=["id"]), values)
+        await db.commit()
+
+
+async def flush_game(game_id: int, wait: bool = False) -> int:
+    """Переносит буфер раунда в БД. wait=True - дождаться чужого flush и дописать все"""
+    lock_key = FLUSH_LOCK_KEY.format(game_id)
+    buffer_key = BUFFER_KEY.format(game_id)
+    token = uuid.uuid4().hex
+    while not await redis_client.set(lock_key, token, nx=True, ex=FLUSH_LOCK_SECONDS):
+        if not wait:
+            return 0
+        await asyncio.sleep(0.05)
+
+    flushed = 0
+    lock_lost = False
+    try:
+        while True:
+            raw = await redis_client.lrange(buffer_key, 0, FLUSH_BATCH_SIZE - 1)
+            if not raw:
+                break
+            await _insert_bets([json.loads(item) for item in raw])
+            # Удаляем из буфера только после коммита и только владея блокировкой
+            if not await _trim_script(keys=[buffer_key, lock_key], args=[token, len(raw)]):
+                lock_lost = True
+                break
+            flushed += len(raw)
+
+        if not lock_lost:
+            await redis_client.srem(PENDING_KEY, game_id)
+            # Ставка могла прийти между последним LRANGE и SREM
+            if await redis_client.llen(buffer_key):
+                await redis_client.sadd(PENDING_KEY, game_id)
+    finally:
+        await _release_script(keys=[lock_key], args=[token])
+
+    if lock_lost:
+        # Пачку дописал новый владелец блокировки (повторная вставка игнорируется по id)
+        logger.warning(f"Bet flush lock for game {game_id} expired mid-flush")
+        if wait:
+            # Расчету нужен весь буфер - ждем новую блокировку и дописываем остаток
+            flushed += await flush_game(game_id, wait=True)
+
+    if flushed:
+        logger.info(f"Flushed {flushed} buffered bets for game {game_id}")
+    return flushed
+
+
+async def flush_all(wait: bool = False) -> int:
+    """Сбрасывает буферы всех раундов с ожидающими ставками"""
+    flushed = 0
+    for game_id in await redis_client.smembers(PENDING_KEY):
+        flushed += await flush_game(int(game_id), wait=wait)
+    return flushed
+
+
+async def run_bet_flusher():
+    """Фоновая задача: периодически сбрасывает буферы всех раундов"""
+    while True:
+        try:
+            await flush_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Bet flush failed: {str(e)}")
+        await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
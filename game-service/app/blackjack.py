@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-import random
 import httpx
 from typing import List
 
-from .database import get_db, BlackjackGame, BlackjackGameStatus
+from .database import get_async_db, BlackjackGame, BlackjackGameStatus
 from .dependencies import get_current_user_id
+from . import hand_store, leaderboard, history
+from .outcomes import outcomes
+from .transitions import TransitionConflict
 
 router = APIRouter(prefix="/blackjack", tags=["blackjack"])
 
@@ -36,6 +39,27 @@ class BlackjackGameResponse(BaseModel):
     is_push: bool
     created_at: datetime
 
+def game_payload(game: BlackjackGame) -> dict:
+    """Тело BlackjackGameResponse прямо из атрибутов раздачи.
+
+    Отдается через ORJSONResponse: модель ответа не собирается и не
+    валидируется повторно, схема в response_model остается для OpenAPI.
+    """
+    return {
+        "id": game.id,
+        "user_id": game.user_id,
+        "bet_amount": game.bet_amount,
+        "status": game.status.value,
+        "player_cards": game.player_cards,
+        "player_score": game.player_score,
+        "dealer_cards": game.dealer_cards,
+        "dealer_score": game.dealer_score,
+        "win_amount": game.win_amount,
+        "is_winner": game.is_winner,
+        "is_push": game.is_push,
+        "created_at": game.created_at,
+    }
+
 def calculate_score(cards: List[str]) -> int:
     """Рассчитывает счет руки"""
     score = 0
@@ -62,13 +86,13 @@ def deal_card(used_cards: List[str]) -> str:
     available_cards = [card for card in DECK if card not in used_cards]
     if not available_cards:
         # Если карты закончились, перемешиваем виртуально
-        return random.choice(DECK)
-    return random.choice(available_cards)
+        return outcomes.choice(DECK)
+    return outcomes.choice(available_cards)
 
 @router.post("/start", response_model=BlackjackGameResponse)
 async def start_blackjack(
     start_data: BlackjackStartRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id),
     authorization: str = Header(..., alias="Authorization")
 ):
@@ -131,38 +155,24 @@ async def start_blackjack(
     )
     
     db.add(game)
-    db.commit()
-    db.refresh(game)
+    await db.commit()
+
+    # 5. Дальше раздача живет в Redis до расчета
+    await hand_store.save_hand(game)
  
-    return BlackjackGameResponse(
-        id=game.id, # type: ignore
-        user_id=game.user_id,# pyright: ignore[reportArgumentType]
-        bet_amount=game.bet_amount,# pyright: ignore[reportArgumentType]
-        status=game.status.value,
-        player_cards=game.player_cards, # pyright: ignore[reportArgumentType]
-        player_score=game.player_score,# pyright: ignore[reportArgumentType]
-        dealer_cards=game.dealer_cards,# pyright: ignore[reportArgumentType]
-        dealer_score=game.dealer_score,# pyright: ignore[reportArgumentType]
-        win_amount=game.win_amount,# pyright: ignore[reportArgumentType]
-        is_winner=game.is_winner,# pyright: ignore[reportArgumentType]
-        is_push=game.is_push,# pyright: ignore[reportArgumentType]
-        created_at=game.created_at# pyright: ignore[reportArgumentType]
-    )
+    return ORJSONResponse(game_payload(game))
 
 @router.post("/{game_id}/action", response_model=BlackjackGameResponse)
 async def player_action(
     game_id: int,
     action_data: BlackjackActionRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id),
     authorization: str = Header(..., alias="Authorization")
 ):
     """Действие игрока (hit/stand)"""
     
-    game = db.query(BlackjackGame).filter(
-        BlackjackGame.id == game_id,
-        BlackjackGame.user_id == user_id
-    ).first()
+    game = await hand_store.load_hand(db, game_id, user_id)
     
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
@@ -173,6 +183,11 @@ async def player_action(
     if action_data.action not in ["hit", "stand"]:
         raise HTTPException(status_code=400, detail="Invalid action. Use 'hit' or 'stand'")
     
+    # Номер хода, с которого начато действие: параллельный запрос с тем же
+    # номером не сможет ни сохранить ход, ни второй раз рассчитать раздачу
+    expected_version = game.version
+    game.version = expected_version + 1
+    
     # Восстанавливаем использованные карты
     used_cards = game.player_cards + [card for card in game.dealer_cards if card != "?"]# type: ignore
     
@@ -191,27 +206,41 @@ async def player_action(
     else:  # stand
         # Ход дилера
         game.status = BlackjackGameStatus.DEALER_TURN# type: ignore
-        await dealer_turn(game, used_cards, authorization)# type: ignore
+        await dealer_turn(game, used_cards)# type: ignore
     
-    db.commit()
-    db.refresh(game)
+    # В БД пишем только завершенную раздачу, промежуточные ходы - в Redis
+    if game.status == BlackjackGameStatus.FINISHED:# type: ignore
+        # Сначала CAS в Redis: hit с того же хода уже не сохранится, а если
+        # он успел раньше - расчет по устаревшей раздаче не делаем
+        if not await hand_store.claim_hand(game, expected_version):
+            raise HTTPException(status_code=409, detail="Hand was changed by another request, reload and retry")
+        # Если запись в БД не удастся, завершенную раздачу из Redis рассчитает sweep
+        try:
+            await settle_hand(db, game, authorization)
+        except TransitionConflict:
+            raise HTTPException(status_code=409, detail="Hand was already settled by another request")
+    elif not await hand_store.save_hand(game, expected_version):
+        raise HTTPException(status_code=409, detail="Hand was changed by another request, reload and retry")
     
-    return BlackjackGameResponse(
-        id=game.id,# type: ignore
-        user_id=game.user_id,# type: ignore
-        bet_amount=game.bet_amount,# type: ignore
-        status=game.status.value,
-        player_cards=game.player_cards,# type: ignore
-        player_score=game.player_score,# type: ignore
-        dealer_cards=game.dealer_cards,# type: ignore
-        dealer_score=game.dealer_score,# type: ignore
-        win_amount=game.win_amount,# type: ignore
-        is_winner=game.is_winner,# type: ignore
-        is_push=game.is_push,# type: ignore
-        created_at=game.created_at# type: ignore
-    )
+    return ORJSONResponse(game_payload(game))
 
-async def dealer_turn(game: BlackjackGame, used_cards: List[str], authorization: str):
+async def settle_hand(db: AsyncSession, game: BlackjackGame, authorization: str):
+    """Записывает завершенную раздачу в БД, выплачивает выигрыш и освобождает Redis.
+
+    Выплата - только после того, как этот вызов выиграл переход в FINISHED
+    (persist_hand); иначе TransitionConflict.
+    """
+    await hand_store.persist_hand(db, game)
+    await pay_out(game, authorization)
+    await hand_store.drop_hand(game.id)# type: ignore
+    try:
+        await leaderboard.record("blackjack", game.user_id, game.win_amount - game.bet_amount,# type: ignore
+                                 at=game.created_at)# type: ignore
+        await history.invalidate_first_page(game.user_id)# type: ignore
+    except Exception as e:
+        print(f"Leaderboard update failed: {str(e)}")
+
+async def dealer_turn(game: BlackjackGame, used_cards: List[str]):
     """Логика хода дилера"""
     # Открываем вторую карту дилера
     if "?" in game.dealer_cards:
@@ -226,10 +255,10 @@ async def dealer_turn(game: BlackjackGame, used_cards: List[str], authorization:
     
     # Определяем победителя
     game.status = BlackjackGameStatus.FINISHED# type: ignore
-    await determine_winner(game, authorization)  # ← передаем authorization
+    determine_winner(game)
 
-async def determine_winner(game: BlackjackGame, authorization: str = None):# type: ignore
-    """Определяет победителя и выплачивает выигрыш"""
+def determine_winner(game: BlackjackGame):
+    """Определяет победителя; выплата - отдельно, после записи результата (pay_out)"""
     player_score = game.player_score
     dealer_score = game.dealer_score
     
@@ -254,8 +283,9 @@ async def determine_winner(game: BlackjackGame, authorization: str = None):# typ
         # Дилер выиграл
         game.is_winner = False
         game.win_amount = 0.0
-    
-    # Выплачиваем выигрыш если есть
+
+async def pay_out(game: BlackjackGame, authorization: str):
+    """Выплачивает выигрыш рассчитанной раздачи и уведомляет игрока"""
     if game.win_amount > game.bet_amount:  # Если реальный выигрыш (не возврат)
         payout_amount = game.win_amount - game.bet_amount
         
@@ -303,32 +333,16 @@ async def determine_winner(game: BlackjackGame, authorization: str = None):# typ
 @router.get("/{game_id}", response_model=BlackjackGameResponse)
 async def get_blackjack_game(
     game_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Получает информацию об игре в блэкджек"""
-    game = db.query(BlackjackGame).filter(
-        BlackjackGame.id == game_id,
-        BlackjackGame.user_id == user_id
-    ).first()
+    game = await hand_store.load_hand(db, game_id, user_id)
     
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
-    return BlackjackGameResponse(
-        id=game.id,
-        user_id=game.user_id,
-        bet_amount=game.bet_amount,
-        status=game.status.value,
-        player_cards=game.player_cards,
-        player_score=game.player_score,
-        dealer_cards=game.dealer_cards,
-        dealer_score=game.dealer_score,
-        win_amount=game.win_amount,
-        is_winner=game.is_winner,
-        is_push=game.is_push,
-        created_at=game.created_at
-    )
+    return ORJSONResponse(game_payload(game))
 
 @router.get("/test")
 async def blackjack_test():
@@ -0,0 +1,262 @@
+"""Пакетный симулятор блэкджека для оценки преимущества казино.
+
+Повторяет правила из blackjack.py: счет как в calculate_score (туз 11 или 1),
+дилер добирает до 17 и стоит на любых 17, ничья возвращает ставку,
+бонуса за блэкджек нет. Раздача тоже как в deal_card: карта выбирается
+среди рангов, которых еще нет у игрока и в открытой карте дилера.
+
+Запуск из каталога game-service:
+    python -m app.blackjack_sim --hands 5000000 --workers 4 --seed 1
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+
+from .blackjack import DECK
+
+RANKS = DECK[:13]
+RANK_VALUES = np.array(
+    [10 if r in ("J", "Q", "K") else 1 if r == "A" else int(r) for r in RANKS],
+    dtype=np.int16
+)
+ACE = RANKS.index("A")
+N_RANKS = len(RANKS)
+
+# Открытая карта дилера: 2..10 и туз (J/Q/K считаются как 10)
+UPCARD_LABELS = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "A"]
+UPCARD_INDEX = np.array([9 if r == ACE else RANK_VALUES[r] - 2 for r in range(N_RANKS)], dtype=np.int16)
+
+DEFAULT_BATCH_SIZE = 250_000
+COUNTERS = ("hands", "wins", "pushes", "losses", "player_busts", "dealer_busts", "net")
+
+
+def basic_strategy() -> Dict[str, np.ndarray]:
+    """Базовая стратегия hit/stand (удвоения и сплита в игре нет).
+
+    Таблицы [счет 0..21, открытая карта дилера] -> True = брать карту.
+    """
+    hard = np.zeros((22, 10), dtype=bool)
+    soft = np.zeros((22, 10), dtype=bool)
+    hard[:12, :] = True
+    hard[12, :] = True
+    hard[12, 2:5] = False          # 12 против 4-6 - стоим
+    hard[13:17, 5:] = True         # 13-16 против 7..A - берем
+    soft[:18, :] = True
+    soft[18, 7:] = True            # мягкие 18 против 9, 10, A - берем
+    return {"hard": hard, "soft": soft}
+
+
+def dealer_strategy(stand_on: int = 17) -> Dict[str, np.ndarray]:
+    """Стратегия "как дилер": брать до stand_on независимо от открытой карты"""
+    table = np.zeros((22, 10), dtype=bool)
+    table[:stand_on, :] = True
+    return {"hard": table, "soft": table.copy()}
+
+
+STRATEGIES = {
+    "basic": basic_strategy,
+    "dealer": dealer_strategy,
+}
+
+
+def hand_score(hard_total: np.ndarray, has_ace: np.ndarray) -> np.ndarray:
+    """Векторный аналог calculate_score: один туз считается за 11, если не перебор"""
+    return np.where(has_ace & (hard_total + 10 <= 21), hard_total + 10, hard_total)
+
+
+def _draw(rng: np.random.Generator, excluded: np.ndarray) -> np.ndarray:
+    """Равновероятный ранг среди не исключенных (как deal_card)"""
+    available = ~excluded
+    counts = available.sum(axis=1)
+    # Если все ранги заняты, deal_card берет любую карту из колоды
+    empty = counts == 0
+    if empty.any():
+        available[empty] = True
+        counts[empty] = N_RANKS
+    pick = rng.integers(0, counts)
+    return np.argmax(np.cumsum(available, axis=1) > pick[:, None], axis=1)
+
+
+def _empty_counts() -> Dict[str, np.ndarray]:
+    return {name: np.zeros(len(UPCARD_LABELS), dtype=np.int64) for name in COUNTERS}
+
+
+def play_batch(rng: np.random.Generator, n: int, strategy: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Разыгрывает n раздач и возвращает счетчики по открытой карте дилера"""
+    rows = np.arange(n)
+    up = rng.integers(0, N_RANKS, n)
+    p1 = rng.integers(0, N_RANKS, n)
+    p2 = rng.integers(0, N_RANKS, n)
+    up_idx = UPCARD_INDEX[up]
+
+    player_ranks = np.zeros((n, N_RANKS), dtype=bool)
+    player_ranks[rows, p1] = True
+    player_ranks[rows, p2] = True
+    p_hard = RANK_VALUES[p1] + RANK_VALUES[p2]
+    p_ace = (p1 == ACE) | (p2 == ACE)
+
+    # Ход игрока
+    deciding = np.ones(n, dtype=bool)
+    while True:
+        score = hand_score(p_hard, p_ace)
+        soft = p_ace & (p_hard + 10 <= 21)
+        capped = np.minimum(score, 21)
+        wants_hit = np.where(soft, strategy["soft"][capped, up_idx], strategy["hard"][capped, up_idx])
+        hit = np.flatnonzero(deciding & (score <= 21) & wants_hit)
+        if hit.size == 0:
+            break
+        excluded = player_ranks[hit]
+        excluded[np.arange(hit.size), up[hit]] = True
+        card = _draw(rng, excluded)
+        player_ranks[hit, card] = True
+        p_hard[hit] += RANK_VALUES[card]
+        p_ace[hit] |= card == ACE
+        deciding[hit] = hand_score(p_hard[hit], p_ace[hit]) <= 21
+
+    p_score = hand_score(p_hard, p_ace)
+    player_bust = p_score > 21
+
+    # Ход дилера - только если игрок не перебрал
+    live = np.flatnonzero(~player_bust)
+    d_score = np.zeros(n, dtype=np.int16)
+    if live.size:
+        excluded = player_ranks[live]
+        excluded[np.arange(live.size), up[live]] = True
+        hole = _draw(rng, excluded)
+        d_hard = RANK_VALUES[up[live]] + RANK_VALUES[hole]
+        d_ace = (up[live] == ACE) | (hole == ACE)
+        while True:
+            need = np.flatnonzero(hand_score(d_hard, d_ace) < 17)
+            if need.size == 0:
+                break
+            card = _draw(rng, excluded[need])
+            d_hard[need] += RANK_VALUES[card]
+            d_ace[need] |= card == ACE
+        d_score[live] = hand_score(d_hard, d_ace)
+
+    dealer_bust = ~player_bust & (d_score > 21)
+    win = ~player_bust & (dealer_bust | (p_score > d_score))
+    push = ~player_bust & ~dealer_bust & (p_score == d_score)
+    loss = ~win & ~push
+
+    def by_upcard(mask):
+        return np.bincount(up_idx[mask], minlength=len(UPCARD_LABELS))
+
+    counts = _empty_counts()
+    counts["hands"] += np.bincount(up_idx, minlength=len(UPCARD_LABELS))
+    counts["wins"] += by_upcard(win)
+    counts["pushes"] += by_upcard(push)
+    counts["losses"] += by_upcard(loss)
+    counts["player_busts"] += by_upcard(player_bust)
+    counts["dealer_busts"] += by_upcard(dealer_bust)
+    counts["net"] += counts["wins"] - counts["losses"]
+    return counts
+
+
+def run_counts(hands: int, seed=None, strategy_name: str = "basic",
+               batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, np.ndarray]:
+    """Разыгрывает hands раздач в одном процессе"""
+    rng = np.random.default_rng(seed)
+    strategy = STRATEGIES[strategy_name]()
+    counts = _empty_counts()
+    remaining = hands
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        batch = play_batch(rng, size, strategy)
+        for name in COUNTERS:
+            counts[name] += batch[name]
+        remaining -= size
+    return counts
+
+
+def summarize(counts: Dict[str, np.ndarray]) -> Dict:
+    """Переводит счетчики в house edge, частоты и разбивку по открытой карте"""
+    hands = int(counts["hands"].sum())
+    net = counts["net"].astype(np.float64)
+    per_hand = net / np.maximum(counts["hands"], 1)
+    # Исход раздачи: -1, 0 или +1 ставки
+    mean = net.sum() / hands
+    decided = (counts["wins"].sum() + counts["losses"].sum()) / hands
+    std_error = np.sqrt(max(decided - mean * mean, 0.0) / hands)
+
+    return {
+        "hands": hands,
+        "house_edge": -mean,
+        "house_edge_ci95": [-mean - 1.96 * std_error, -mean + 1.96 * std_error],
+        "win_rate": counts["wins"].sum() / hands,
+        "push_rate": counts["pushes"].sum() / hands,
+        "loss_rate": counts["losses"].sum() / hands,
+        "player_bust_rate": counts["player_busts"].sum() / hands,
+        "dealer_bust_rate": counts["dealer_busts"].sum() / hands,
+        "by_upcard": {
+            label: {
+                "hands": int(counts["hands"][i]),
+                "player_ev": float(per_hand[i]),
+                "dealer_bust_rate": float(counts["dealer_busts"][i] / max(counts["hands"][i], 1)),
+            }
+            for i, label in enumerate(UPCARD_LABELS)
+        },
+    }
+
+
+def simulate(hands: int, seed: Optional[int] = None, strategy_name: str = "basic",
+             workers: int = 1, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """Симуляция hands раздач, при workers > 1 - параллельно по процессам"""
+    if hands <= 0:
+        raise ValueError("hands must be positive")
+    if strategy_name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy_name}")
+
+    started = time.perf_counter()
+    if workers <= 1:
+        counts = run_counts(hands, seed, strategy_name, batch_size)
+    else:
+        # Независимые потоки случайных чисел для каждого процесса
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        shares = [hands // workers + (1 if i < hands % workers else 0) for i in range(workers)]
+        counts = _empty_counts()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(run_counts, share, s, strategy_name, batch_size)
+                for share, s in zip(shares, seeds) if share
+            ]
+            for future in futures:
+                part = future.result()
+                for name in COUNTERS:
+                    counts[name] += part[name]
+
+    elapsed = time.perf_counter() - started
+    result = summarize(counts)
+    result["strategy"] = strategy_name
+    result["elapsed_seconds"] = elapsed
+    result["hands_per_second"] = hands / elapsed if elapsed > 0 else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blackjack house edge simulator")
+    parser.add_argument("--hands", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="basic")
+    args = parser.parse_args()
+
+    result = simulate(args.hands, seed=args.seed, strategy_name=args.strategy, workers=args.workers)
+    low, high = result["house_edge_ci95"]
+    print(f"Hands:            {result['hands']:,} ({result['strategy']} strategy)")
+    print(f"House edge:       {result['house_edge']:.4%} (95% CI {low:.4%} .. {high:.4%})")
+    print(f"Win/push/loss:    {result['win_rate']:.4f} / {result['push_rate']:.4f} / {result['loss_rate']:.4f}")
+    print(f"Player bust rate: {result['player_bust_rate']:.4f}")
+    print(f"Dealer bust rate: {result['dealer_bust_rate']:.4f}")
+    print("Upcard  hands       player EV  dealer bust")
+    for label, row in result["by_upcard"].items():
+        print(f"{label:>6}  {row['hands']:>10,}  {row['player_ev']:+.4f}    {row['dealer_bust_rate']:.4f}")
+    print(f"Elapsed:          {result['elapsed_seconds']:.2f}s "
+          f"({result['hands_per_second']:,.0f} hands/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Задержка event loop при конкурентных спинах: синхронная сессия против асинхронной.
+
+Каждый "спин" повторяет путь /slots/spin: ожидание кошелька (sleep с
+задержкой сети) и запись SlotGame в БД. Параллельно зонд каждые 10 мс
+засыпает и меряет, на сколько позже он проснулся - это время, на
+которое запросы блокировали event loop.
+
+    python -m app.db_bench --spins 2000 --concurrency 100
+    python -m app.db_bench --database-url sqlite:///bench.db
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from .database import Base, SlotGame, SlotSymbol, DATABASE_URL, ASYNC_DATABASE_URL, POOL_OPTIONS
+
+PROBE_INTERVAL_SECONDS = 0.01
+
+
+def _slot_game() -> SlotGame:
+    return SlotGame(user_id=1, machine="classic", bet_amount=1.0, reel1=SlotSymbol.CHERRY,
+                    reel2=SlotSymbol.LEMON, reel3=SlotSymbol.BELL, win_amount=0.0,
+                    payout_multiplier=0.0, is_winner=False)
+
+
+async def _probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL_SECONDS)
+
+
+async def _run(spin, spins: int, concurrency: int) -> dict:
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await spin()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(spins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    lags.sort()
+    return {
+        "spins_per_second": spins / elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000,
+        "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000,
+        "lag_max_ms": lags[-1] * 1000,
+    }
+
+
+def benchmark(spins: int, concurrency: int, wallet_latency: float,
+              database_url: str = DATABASE_URL, async_database_url: str = ASYNC_DATABASE_URL) -> dict:
+    """Одна и та же нагрузка через sync Session и через AsyncSession"""
+    is_sqlite = database_url.startswith("sqlite")
+    engine = create_engine(database_url, **({} if is_sqlite else POOL_OPTIONS))
+    async_engine = create_async_engine(async_database_url, **({} if is_sqlite else POOL_OPTIONS))
+    Base.metadata.create_all(bind=engine)
+    SyncSession = sessionmaker(bind=engine, autoflush=False)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def sync_spin():
+        await asyncio.sleep(wallet_latency)
+        db = SyncSession()
+        try:
+            db.add(_slot_game())
+            db.commit()
+        finally:
+            db.close()
+
+    async def async_spin():
+        await asyncio.sleep(wallet_latency)
+        async with AsyncSession() as db:
+            db.add(_slot_game())
+            await db.commit()
+
+    async def run_all():
+        results = {
+            "sync Session": await _run(sync_spin, spins, concurrency),
+            "AsyncSession": await _run(async_spin, spins, concurrency),
+        }
+        await async_engine.dispose()
+        return results
+
+    try:
+        return asyncio.run(run_all())
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event loop lag under concurrent spins")
+    parser.add_argument("--spins", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--wallet-latency", type=float, default=0.005, help="seconds per wallet call")
+    parser.add_argument("--database-url", default=None, help="sync URL; the async one is derived from it")
+    args = parser.parse_args()
+
+    urls = {}
+    if args.database_url:
+        async_url = args.database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        urls = {"database_url": args.database_url,
+                "async_database_url": async_url.replace("sqlite://", "sqlite+aiosqlite://", 1)}
+
+    results = benchmark(args.spins, args.concurrency, args.wallet_latency, **urls)
+    print(f"{'':<14} {'spins/s':>10} {'lag p50':>10} {'lag p99':>10} {'lag max':>10}")
+    for name, r in results.items():
+        print(f"{name:<14} {r['spins_per_second']:>10,.0f} {r['lag_p50_ms']:>8.2f}ms "
+              f"{r['lag_p99_ms']:>8.2f}ms {r['lag_max_ms']:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
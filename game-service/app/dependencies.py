@@ -4,8 +4,8 @@ from typing import Optional
 
 AUTH_SERVICE_URL = "http://auth-service:8000"
 
-async def verify_token(authorization: str = Header(None)) -> int:
-    """Верифицирует JWT токен и возвращает user_id"""
+async def fetch_current_user(authorization: Optional[str]) -> dict:
+    """Запрашивает текущего пользователя у Auth Service"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -23,8 +23,7 @@ async def verify_token(authorization: str = Header(None)) -> int:
             )
             
             if response.status_code == 200:
-                user_data = response.json()
-                return user_data.get("id") or user_data.get("user_id")
+                return response.json()
             else:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -37,6 +36,21 @@ async def verify_token(authorization: str = Header(None)) -> int:
                 detail="Auth service unavailable"
             )
 
+async def verify_token(authorization: str = Header(None)) -> int:
+    """Верифицирует JWT токен и возвращает user_id"""
+    user_data = await fetch_current_user(authorization)
+    return user_data.get("id") or user_data.get("user_id")
+
+async def get_current_admin(authorization: str = Header(None)) -> int:
+    """Проверяет что пользователь - админ, и возвращает его user_id"""
+    user_data = await fetch_current_user(authorization)
+    if user_data.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user_data.get("id") or user_data.get("user_id")
+
 async def get_current_user_id(user_id: int = Depends(verify_token)) -> int:
     """Возвращает ID текущего пользователя"""
     return user_id
\ No newline at end of file
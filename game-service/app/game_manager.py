@@ -1,32 +1,231 @@
-from typing import Dict, Set
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
 
 class GameManager:
-    """Менеджер для управления активными играми"""
+    """Менеджер для управления активными играми (в памяти процесса, для тестов и одного воркера)"""
     
     def __init__(self):
         self.active_games: Set[int] = set()
         self.game_players: Dict[int, Set[int]] = {}
+        self.tables: Dict[str, dict] = {}
     
-    def add_game(self, game_id: int):
+    async def add_game(self, game_id: int):
         """Добавляет игру в активные"""
         self.active_games.add(game_id)
         self.game_players[game_id] = set()
     
-    def remove_game(self, game_id: int):
+    async def remove_game(self, game_id: int):
         """Удаляет игру из активных"""
         self.active_games.discard(game_id)
         self.game_players.pop(game_id, None)
     
-    def add_player_to_game(self, game_id: int, user_id: int):
+    async def is_active_game(self, game_id: int) -> bool:
+        """Проверяет что игра активна"""
+        return game_id in self.active_games
+    
+    async def add_player_to_game(self, game_id: int, user_id: int):
         """Добавляет игрока в игру"""
         if game_id in self.game_players:
             self.game_players[game_id].add(user_id)
     
-    def remove_player_from_game(self, game_id: int, user_id: int):
+    async def remove_player_from_game(self, game_id: int, user_id: int):
         """Удаляет игрока из игры"""
         if game_id in self.game_players:
             self.game_players[game_id].discard(user_id)
     
-    def get_game_players(self, game_id: int) -> Set[int]:
+    async def get_game_players(self, game_id: int) -> Set[int]:
+        """Возвращает игроков в игре"""
+        return self.game_players.get(game_id, set())
+    
+    async def set_table_round(self, table_id: str, game_id: int, phase: str, phase_ends_at: float):
+        """Запоминает текущий раунд стола и его фазу"""
+        self.tables[table_id] = {
+            "table_id": table_id,
+            "game_id": game_id,
+            "phase": phase,
+            "phase_ends_at": phase_ends_at,
+        }
+    
+    async def get_table(self, table_id: str) -> Optional[dict]:
+        """Возвращает состояние стола"""
+        return self.tables.get(table_id)
+    
+    async def get_tables(self) -> Dict[str, dict]:
+        """Возвращает состояние всех столов"""
+        return dict(self.tables)
+    
+    async def listen(self):
+        """Инвалидация не нужна - состояние живет в одном процессе"""
+        return None
+
+
+GAMES_KEY = "gm:games"
+PLAYERS_KEY = "gm:players:{}"
+TABLES_KEY = "gm:tables"
+INVALIDATION_CHANNEL = "gm:invalidate"
+
+
+class RedisGameManager:
+    """Менеджер активных игр в Redis - общий для всех воркеров и реплик.
+
+    Изменения пишутся pipeline-ом и рассылаются через pub/sub, чтобы
+    остальные процессы сбросили локальный кэш. Чтения идут через
+    локальный read-through кэш, поэтому проверки членства на горячем
+    пути не ходят в Redis.
+    """
+    
+    def __init__(self, redis, cache_ttl: float = 5.0):
+        self.redis = redis
+        self.cache_ttl = cache_ttl
+        self.origin = uuid.uuid4().hex[:8]
+        self._games: Optional[Set[int]] = None
+        self._games_loaded_at = 0.0
+        self._players: Dict[int, Tuple[float, Set[int]]] = {}
+        self._tables: Optional[Dict[str, dict]] = None
+        self._tables_loaded_at = 0.0
+    
+    def _fresh(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at < self.cache_ttl
+    
+    def _publish(self, pipe, kind: str, key):
+        pipe.publish(INVALIDATION_CHANNEL, f"{self.origin}|{kind}|{key}")
+    
+    def _invalidate(self, kind: str, key: str):
+        if kind == "games":
+            self._games = None
+            self._players.pop(int(key), None)
+        elif kind == "players":
+            self._players.pop(int(key), None)
+        elif kind == "tables":
+            self._tables = None
+    
+    async def add_game(self, game_id: int):
+        """Добавляет игру в активные"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(GAMES_KEY, game_id)
+            pipe.delete(PLAYERS_KEY.format(game_id))
+            self._publish(pipe, "games", game_id)
+            await pipe.execute()
+        if self._games is not None:
+            self._games.add(game_id)
+        self._players[game_id] = (time.monotonic(), set())
+    
+    async def remove_game(self, game_id: int):
+        """Удаляет игру из активных"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.srem(GAMES_KEY, game_id)
+            pipe.delete(PLAYERS_KEY.format(game_id))
+            self._publish(pipe, "games", game_id)
+            await pipe.execute()
+        if self._games is not None:
+            self._games.discard(game_id)
+        self._players.pop(game_id, None)
+    
+    async def is_active_game(self, game_id: int) -> bool:
+        """Проверяет что игра активна (из локального кэша)"""
+        if self._games is None or not self._fresh(self._games_loaded_at):
+            members = await self.redis.smembers(GAMES_KEY)
+            self._games = {int(m) for m in members}
+            self._games_loaded_at = time.monotonic()
+        return game_id in self._games
+    
+    async def add_player_to_game(self, game_id: int, user_id: int):
+        """Добавляет игрока в игру"""
+        if not await self.is_active_game(game_id):
+            return
+        players = await self.get_game_players(game_id)
+        if user_id in players:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(PLAYERS_KEY.format(game_id), user_id)
+            self._publish(pipe, "players", game_id)
+            await pipe.execute()
+        players.add(user_id)
+    
+    async def remove_player_from_game(self, game_id: int, user_id: int):
+        """Удаляет игрока из игры"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.srem(PLAYERS_KEY.format(game_id), user_id)
+            self._publish(pipe, "players", game_id)
+            await pipe.execute()
+        cached = self._players.get(game_id)
+        if cached:
+            cached[1].discard(user_id)
+    
+    async def get_game_players(self, game_id: int) -> Set[int]:
         """Возвращает игроков в игре"""
-        return self.game_players.get(game_id, set())
\ No newline at end of file
+        cached = self._players.get(game_id)
+        if cached and self._fresh(cached[0]):
+            return cached[1]
+        members = await self.redis.smembers(PLAYERS_KEY.format(game_id))
+        players = {int(m) for m in members}
+        self._players[game_id] = (time.monotonic(), players)
+        return players
+    
+    async def set_table_round(self, table_id: str, game_id: int, phase: str, phase_ends_at: float):
+        """Запоминает текущий раунд стола и его фазу"""
+        table = {
+            "table_id": table_id,
+            "game_id": game_id,
+            "phase": phase,
+            "phase_ends_at": phase_ends_at,
+        }
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(TABLES_KEY, table_id, json.dumps(table))
+            self._publish(pipe, "tables", table_id)
+            await pipe.execute()
+        if self._tables is not None:
+            self._tables[table_id] = table
+    
+    async def get_table(self, table_id: str) -> Optional[dict]:
+        """Возвращает состояние стола"""
+        return (await self.get_tables()).get(table_id)
+    
+    async def get_tables(self) -> Dict[str, dict]:
+        """Возвращает состояние всех столов"""
+        if self._tables is None or not self._fresh(self._tables_loaded_at):
+            raw = await self.redis.hgetall(TABLES_KEY)
+            self._tables = {table_id: json.loads(value) for table_id, value in raw.items()}
+            self._tables_loaded_at = time.monotonic()
+        return dict(self._tables)
+    
+    async def listen(self):
+        """Слушает инвалидации от других процессов и сбрасывает локальный кэш"""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    origin, kind, key = message["data"].split("|", 2)
+                    if origin != self.origin:
+                        self._invalidate(kind, key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Game manager invalidation listener failed: {str(e)}")
+                # Пока нет подписки, кэшу доверять нельзя
+                self._games = None
+                self._tables = None
+                self._players.clear()
+            finally:
+                # Иначе каждое переподключение оставляет открытым соединение старой подписки
+                await pubsub.aclose()
+            await asyncio.sleep(1.0)
+
+
+def create_game_manager():
+    """Выбирает реализацию по GAME_MANAGER_BACKEND: memory (по умолчанию) или redis"""
+    backend = os.getenv("GAME_MANAGER_BACKEND", "memory").lower()
+    if backend == "redis":
+        from .redis_client import redis_client
+        return RedisGameManager(redis_client)
+    return GameManager()
@@ -0,0 +1,242 @@
+"""Хранилище активных раздач блэкджека в Redis.
+
+Пока раздача идет, ее состояние живет в компактном хеше Redis с TTL,
+а строка BlackjackGame в БД обновляется только при расчете.
+"""
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal, BlackjackGame, BlackjackGameStatus
+from .redis_client import redis_client
+from .transitions import TransitionConflict
+
+logger = logging.getLogger(__name__)
+
+# TTL хеша раздачи - страховка, если sweep не успел
+HAND_TTL_SECONDS = int(os.getenv("BLACKJACK_HAND_TTL", "3600"))
+# Через сколько секунд бездействия раздача считается брошенной
+HAND_IDLE_SECONDS = int(os.getenv("BLACKJACK_HAND_IDLE", "900"))
+SWEEP_INTERVAL_SECONDS = int(os.getenv("BLACKJACK_SWEEP_INTERVAL", "60"))
+
+HAND_KEY = "bj:hand:{}"
+ACTIVE_HANDS_KEY = "bj:active"  # ZSET: game_id -> время последнего действия
+
+# Запись раздачи только если ее номер хода не изменился (compare-and-set).
+# KEYS: hand, active; ARGV: ожидаемый номер ('' - новая раздача), game_id, время, TTL, поля...
+SAVE_SCRIPT = """
+if ARGV[1] ~= '' and redis.call('HGET', KEYS[1], 'v') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+return 1
+"""
+# Удаление раздачи только если с момента снимка не было хода.
+# KEYS: hand, active; ARGV: номер хода снимка, game_id
+DROP_IF_UNCHANGED_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'v') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[2])
+return 1
+"""
+_save_script = redis_client.register_script(SAVE_SCRIPT)
+_drop_if_unchanged_script = redis_client.register_script(DROP_IF_UNCHANGED_SCRIPT)
+
+
+def _join_cards(cards: List[str]) -> str:
+    return ",".join(cards)
+
+
+def _split_cards(value: str) -> List[str]:
+    return value.split(",") if value else []
+
+
+def encode_hand(game: BlackjackGame) -> Dict[str, str]:
+    """Упаковывает раздачу в плоский хеш"""
+    return {
+        "u": str(game.user_id),
+        "b": repr(float(game.bet_amount)),
+        "s": game.status.value,
+        "p": _join_cards(game.player_cards),
+        "ps": str(game.player_score),
+        "d": _join_cards(game.dealer_cards),
+        "ds": str(game.dealer_score),
+        "c": game.created_at.isoformat(),
+        "v": str(game.version or 0),
+        # Итог раздачи: завершенная, но еще не записанная в БД раздача рассчитывается по нему
+        "w": repr(float(game.win_amount or 0.0)),
+        "iw": "1" if game.is_winner else "0",
+        "ip": "1" if game.is_push else "0",
+    }
+
+
+def decode_hand(game_id: int, data: Dict[str, str]) -> BlackjackGame:
+    """Восстанавливает раздачу из хеша (объект не привязан к сессии)"""
+    return BlackjackGame(
+        id=game_id,
+        user_id=int(data["u"]),
+        bet_amount=float(data["b"]),
+        status=BlackjackGameStatus(data["s"]),
+        player_cards=_split_cards(data["p"]),
+        player_score=int(data["ps"]),
+        dealer_cards=_split_cards(data["d"]),
+        dealer_score=int(data["ds"]),
+        created_at=datetime.fromisoformat(data["c"]),
+        version=int(data.get("v", 0)),
+        win_amount=float(data.get("w", 0.0)),
+        is_winner=data.get("iw") == "1",
+        is_push=data.get("ip") == "1",
+    )
+
+
+async def save_hand(game: BlackjackGame, expected_version: Optional[int] = None) -> bool:
+    """Сохраняет состояние раздачи в Redis одним скриптом.
+
+    expected_version - номер хода, с которого начиналось действие: если
+    раздачу успел изменить параллельный запрос, запись не делается (False).
+    """
+    fields = [item for pair in encode_hand(game).items() for item in pair]
+    saved = await _save_script(
+        keys=[HAND_KEY.format(game.id), ACTIVE_HANDS_KEY],
+        args=["" if expected_version is None else expected_version, game.id, time.time(), HAND_TTL_SECONDS, *fields]
+    )
+    return bool(saved)
+
+
+async def claim_hand(game: BlackjackGame, expected_version: int) -> bool:
+    """Забирает раздачу на расчет: записывает завершенную раздачу тем же CAS по номеру хода.
+
+    После этого параллельный ход с того же номера не сохранится, а новый
+    запрос увидит раздачу завершенной. False - раздачу уже изменил другой запрос.
+    """
+    return await save_hand(game, expected_version)
+
+
+async def drop_hand_if_unchanged(game_id: int, version: int) -> bool:
+    """Удаляет раздачу, только если ее номер хода все еще version"""
+    dropped = await _drop_if_unchanged_script(
+        keys=[HAND_KEY.format(game_id), ACTIVE_HANDS_KEY],
+        args=[version, game_id]
+    )
+    return bool(dropped)
+
+
+async def drop_hand(game_id: int):
+    """Удаляет раздачу из Redis"""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(HAND_KEY.format(game_id))
+        pipe.zrem(ACTIVE_HANDS_KEY, str(game_id))
+        await pipe.execute()
+
+
+async def load_hand(db: AsyncSession, game_id: int, user_id: int) -> Optional[BlackjackGame]:
+    """Ищет раздачу в Redis, при промахе - в БД (и возвращает активную в Redis)"""
+    data = await redis_client.hgetall(HAND_KEY.format(game_id))
+    if data:
+        game = decode_hand(game_id, data)
+        return game if game.user_id == user_id else None
+
+    game = (await db.execute(select(BlackjackGame).where(
+        BlackjackGame.id == game_id,
+        BlackjackGame.user_id == user_id
+    ))).scalar_one_or_none()
+    if not game:
+        return None
+
+    # Дальше работаем с объектом вне сессии, запись в БД - только через persist_hand
+    db.expunge(game)
+    if game.status == BlackjackGameStatus.PLAYER_TURN:
+        await save_hand(game)
+    return game
+
+
+async def persist_hand(db: AsyncSession, game: BlackjackGame):
+    """Записывает раздачу в БД одним охраняемым UPDATE без предварительного SELECT.
+
+    Строка меняется, только пока раздача в PLAYER_TURN и снимок не старше
+    записанного, - завершить раздачу (и выплатить выигрыш) может только
+    один запрос. Иначе TransitionConflict.
+    """
+    result = await db.execute(update(BlackjackGame).where(
+        BlackjackGame.id == game.id,
+        BlackjackGame.status == BlackjackGameStatus.PLAYER_TURN,
+        BlackjackGame.version <= game.version
+    ).values(
+        status=game.status,
+        player_cards=list(game.player_cards),
+        player_score=game.player_score,
+        dealer_cards=list(game.dealer_cards),
+        dealer_score=game.dealer_score,
+        win_amount=game.win_amount,
+        is_winner=game.is_winner,
+        is_push=game.is_push,
+        version=game.version,
+    ))
+    if result.rowcount != 1:
+        await db.rollback()
+        raise TransitionConflict(f"Blackjack hand {game.id} was already settled")
+    await db.commit()
+
+
+async def sweep_abandoned_hands():
+    """Сбрасывает в БД брошенные раздачи и освобождает Redis.
+
+    Раздача остается в статусе PLAYER_TURN, поэтому игрок может
+    продолжить ее позже - load_hand поднимет ее из БД.
+
+    Завершенная раздача в Redis - это расчет, оборванный между claim_hand
+    и записью в БД (ошибка БД, падение воркера): ее рассчитывает и
+    выплачивает sweep, если БД еще не записана.
+    """
+    from .blackjack import settle_hand
+
+    cutoff = time.time() - HAND_IDLE_SECONDS
+    game_ids = await redis_client.zrangebyscore(ACTIVE_HANDS_KEY, 0, cutoff)
+    if not game_ids:
+        return 0
+
+    async with AsyncSessionLocal() as db:
+        for raw_id in game_ids:
+            game_id = int(raw_id)
+            data = await redis_client.hgetall(HAND_KEY.format(game_id))
+            if not data:
+                await redis_client.zrem(ACTIVE_HANDS_KEY, raw_id)
+                continue
+            game = decode_hand(game_id, data)
+            if game.status == BlackjackGameStatus.FINISHED:
+                try:
+                    await settle_hand(db, game, f"Bearer {game.user_id}")
+                except TransitionConflict:
+                    # Расчет уже записан запросом игрока
+                    await drop_hand_if_unchanged(game_id, game.version)
+                continue
+            try:
+                await persist_hand(db, game)
+            except TransitionConflict:
+                # Раздачу успел завершить сам игрок - снимок устарел
+                pass
+            # Если игрок сходил, пока снимок писался в БД, раздача остается в Redis
+            await drop_hand_if_unchanged(game_id, game.version)
+
+    logger.info(f"Blackjack sweep: persisted {len(game_ids)} abandoned hands")
+    return len(game_ids)
+
+
+async def run_hand_sweeper():
+    """Фоновая задача периодической очистки брошенных раздач"""
+    while True:
+        try:
+            await sweep_abandoned_hands()
+        except Exception as e:
+            logger.error(f"Blackjack sweep failed: {str(e)}")
+        await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,151 @@
+"""Общая история игр игрока: слоты, блэкджек и ставки рулетки.
+
+Одна выборка UNION ALL по узким проекциям трех таблиц. Каждая ветка
+читает не больше limit + 1 строк по индексу (user_id, created_at, id),
+внешний запрос сливает их и режет страницу. Пагинация keyset по
+(created_at, id, game_type) - тип игры нужен только для разрыва
+совпадений между таблицами.
+
+Первая страница - самый частый запрос - кэшируется в Redis на несколько
+секунд и сбрасывается, когда игрок завершает игру.
+"""
+import os
+import json
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, literal, union_all, tuple_, null
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import get_async_db, SlotGame, BlackjackGame, RouletteBet
+from .dependencies import get_current_user_id
+from .redis_client import redis_client
+
+router = APIRouter(tags=["history"])
+
+FIRST_PAGE_KEY = "history:{}:first"  # hash: размер страницы -> JSON
+FIRST_PAGE_TTL_SECONDS = int(os.getenv("HISTORY_FIRST_PAGE_TTL", "10"))
+MAX_LIMIT = 100
+
+
+def _branches(user_id: int):
+    """Узкие проекции таблиц в общую форму строки истории"""
+    yield "blackjack", BlackjackGame, select(
+        literal("blackjack").label("game_type"),
+        BlackjackGame.id.label("id"),
+        BlackjackGame.created_at.label("created_at"),
+        BlackjackGame.bet_amount.label("bet_amount"),
+        BlackjackGame.win_amount.label("win_amount"),
+        null().label("round_id"),
+    ).where(BlackjackGame.user_id == user_id)
+
+    yield "roulette", RouletteBet, select(
+        literal("roulette").label("game_type"),
+        RouletteBet.id.label("id"),
+        RouletteBet.created_at.label("created_at"),
+        RouletteBet.amount.label("bet_amount"),
+        RouletteBet.payout_amount.label("win_amount"),
+        RouletteBet.game_id.label("round_id"),
+    ).where(RouletteBet.user_id == user_id)
+
+    yield "slots", SlotGame, select(
+        literal("slots").label("game_type"),
+        SlotGame.id.label("id"),
+        SlotGame.created_at.label("created_at"),
+        SlotGame.bet_amount.label("bet_amount"),
+        SlotGame.win_amount.label("win_amount"),
+        null().label("round_id"),
+    ).where(SlotGame.user_id == user_id)
+
+
+def encode_cursor(created_at: datetime, row_id: int, game_type: str) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}|{game_type}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, str]:
+    try:
+        created_at, row_id, game_type = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id), game_type
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def fetch_history(db: Session, user_id: int, limit: int, cursor: Optional[str] = None) -> dict:
+    """Страница истории: один UNION ALL запрос"""
+    after = decode_cursor(cursor) if cursor else None
+
+    branches = []
+    for game_type, model, branch in _branches(user_id):
+        if after:
+            created_at, row_id, after_type = after
+            # Порядок (created_at, id, game_type) по убыванию: при равных
+            # (created_at, id) ветки с меньшим типом идут после курсора
+            key = tuple_(model.created_at, model.id)
+            branch = branch.where(key <= (created_at, row_id) if game_type < after_type
+                                  else key < (created_at, row_id))
+        branch = branch.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+        branches.append(select(branch.subquery()))
+
+    merged = union_all(*branches).subquery()
+    rows = db.execute(
+        select(merged).order_by(merged.c.created_at.desc(), merged.c.id.desc(), merged.c.game_type.desc())
+        .limit(limit + 1)
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = rows[-1] if rows else None
+    return {
+        "items": [
+            {
+                "game_type": row.game_type,
+                "id": row.id,
+                "round_id": row.round_id,
+                "bet_amount": row.bet_amount,
+                "win_amount": row.win_amount,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+            }
+            for row in rows
+        ],
+        "next_cursor": encode_cursor(last.created_at, last.id, last.game_type) if has_more else None,
+    }
+
+
+async def invalidate_first_page(*user_ids: int):
+    """Сбрасывает закэшированные первые страницы игроков (все размеры страницы) одним DEL"""
+    if user_ids:
+        await redis_client.delete(*(FIRST_PAGE_KEY.format(user_id) for user_id in user_ids))
+
+
+@router.get("/history")
+async def get_history(
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """История всех игр игрока, новые сверху"""
+    if cursor:
+        return await db.run_sync(fetch_history, user_id, limit, cursor)
+
+    key = FIRST_PAGE_KEY.format(user_id)
+    try:
+        cached = await redis_client.hget(key, limit)
+        if cached:
+            return json.loads(cached)
+    except Exception as e:
+        print(f"History cache read failed: {str(e)}")
+
+    page = await db.run_sync(fetch_history, user_id, limit)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, limit, json.dumps(page))
+            pipe.expire(key, FIRST_PAGE_TTL_SECONDS)
+            await pipe.execute()
+    except Exception as e:
+        print(f"History cache write failed: {str(e)}")
+    return page
@@ -0,0 +1,162 @@
+"""Прогрессивный джекпот слотов.
+
+Каждый спин /slots/spin отчисляет долю ставки в джекпот. Чтобы не
+превращать одну строку БД в самую горячую блокировку системы, взносы
+копятся в шардированных счетчиках Redis (INCRBYFLOAT в один из
+JACKPOT_SHARDS ключей). Фоновая задача периодически сворачивает шарды в
+базовую сумму и сохраняет снимок в таблицу jackpots - по нему джекпот
+восстанавливается, если Redis потерял данные.
+
+Розыгрыш атомарен: Lua-скрипт собирает базу и все шарды, сбрасывает
+джекпот к стартовой сумме и увеличивает эпоху, так что два выигрыша
+одного и того же пула невозможны.
+"""
+import os
+import asyncio
+import logging
+import itertools
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from .database import AsyncSessionLocal, Jackpot, JackpotWin
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+JACKPOT_NAME = os.getenv("JACKPOT_NAME", "slots")
+CONTRIBUTION_RATE = float(os.getenv("JACKPOT_CONTRIBUTION_RATE", "0.01"))
+SEED_AMOUNT = float(os.getenv("JACKPOT_SEED_AMOUNT", "1000"))
+# Шанс выигрыша на единицу ставки: ставка 10 - шанс в 10 раз выше
+HIT_PROBABILITY_PER_UNIT = float(os.getenv("JACKPOT_HIT_PROBABILITY_PER_UNIT", "0.00001"))
+SHARDS = int(os.getenv("JACKPOT_SHARDS", "16"))
+FOLD_INTERVAL_SECONDS = float(os.getenv("JACKPOT_FOLD_INTERVAL", "10"))
+
+BASE_KEY = "jackpot:{}:base"
+EPOCH_KEY = "jackpot:{}:epoch"
+SHARD_KEY = "jackpot:{}:shard:{}"
+
+# KEYS: base, epoch, shards... -> [свернуто, база, эпоха]
+FOLD_SCRIPT = """
+local folded = 0
+for i = 3, #KEYS do
+    folded = folded + tonumber(redis.call('GETSET', KEYS[i], 0) or '0')
+end
+local base = redis.call('INCRBYFLOAT', KEYS[1], folded)
+return {tostring(folded), base, redis.call('GET', KEYS[2]) or '0'}
+"""
+
+# KEYS: base, epoch, shards...; ARGV: стартовая сумма -> [выигрыш, новая эпоха]
+AWARD_SCRIPT = """
+local total = tonumber(redis.call('GET', KEYS[1]) or '0')
+for i = 3, #KEYS do
+    total = total + tonumber(redis.call('GET', KEYS[i]) or '0')
+    redis.call('SET', KEYS[i], 0)
+end
+redis.call('SET', KEYS[1], ARGV[1])
+local epoch = redis.call('INCR', KEYS[2])
+return {tostring(total), epoch}
+"""
+
+_fold_script = redis_client.register_script(FOLD_SCRIPT)
+_award_script = redis_client.register_script(AWARD_SCRIPT)
+_shard_cycle = itertools.cycle(range(SHARDS))
+
+
+def _keys(name: str):
+    return [BASE_KEY.format(name), EPOCH_KEY.format(name)] + [SHARD_KEY.format(name, i) for i in range(SHARDS)]
+
+
+def contribution_for(bet_amount: float) -> float:
+    return round(bet_amount * CONTRIBUTION_RATE, 6)
+
+
+def hit_probability(bet_amount: float) -> float:
+    return min(1.0, bet_amount * HIT_PROBABILITY_PER_UNIT)
+
+
+async def contribute(bet_amount: float, name: str = JACKPOT_NAME) -> float:
+    """Отчисляет долю ставки в следующий по кругу шард"""
+    amount = contribution_for(bet_amount)
+    if amount > 0:
+        await redis_client.incrbyfloat(SHARD_KEY.format(name, next(_shard_cycle)), amount)
+    return amount
+
+
+async def current_value(name: str = JACKPOT_NAME) -> float:
+    """Текущий джекпот: база + несвернутые шарды, один MGET"""
+    keys = _keys(name)
+    values = await redis_client.mget([keys[0]] + keys[2:])
+    if values[0] is None:
+        await ensure_jackpot(name)
+        values = await redis_client.mget([keys[0]] + keys[2:])
+    return round(sum(float(v) for v in values if v is not None), 2)
+
+
+async def award(name: str = JACKPOT_NAME) -> Tuple[float, int]:
+    """Атомарно забирает весь джекпот и сбрасывает его к стартовой сумме: (сумма, эпоха)"""
+    total, epoch = await _award_script(keys=_keys(name), args=[SEED_AMOUNT])
+    return round(float(total), 2), int(epoch)
+
+
+async def record_award(user_id: int, amount: float, epoch: int, slot_game_id: Optional[int] = None,
+                       name: str = JACKPOT_NAME):
+    """Сохраняет выигрыш джекпота и снимок после сброса"""
+    async with AsyncSessionLocal() as db:
+        db.add(JackpotWin(jackpot=name, user_id=user_id, amount=amount, slot_game_id=slot_game_id))
+        await _save_snapshot(db, name, SEED_AMOUNT, epoch)
+        await db.commit()
+    logger.info(f"Jackpot {name} won by user {user_id}: {amount}")
+
+
+async def _save_snapshot(db, name: str, amount: float, epoch: int):
+    """Снимок в SQL; устаревший снимок (меньшая эпоха) не перетирает новый"""
+    await db.execute(update(Jackpot).where(Jackpot.name == name, Jackpot.epoch <= epoch).values(
+        amount=amount, epoch=epoch, updated_at=datetime.utcnow()
+    ).execution_options(synchronize_session=False))
+
+
+async def fold(name: str = JACKPOT_NAME) -> float:
+    """Сворачивает шарды в базу и сохраняет снимок в SQL"""
+    folded, base, epoch = await _fold_script(keys=_keys(name))
+    async with AsyncSessionLocal() as db:
+        await _save_snapshot(db, name, float(base), int(epoch))
+        await db.commit()
+    return float(folded)
+
+
+async def ensure_jackpot(name: str = JACKPOT_NAME):
+    """Создает строку джекпота и восстанавливает Redis из последнего снимка"""
+    query = select(Jackpot).where(Jackpot.name == name)
+    async with AsyncSessionLocal() as db:
+        jackpot = (await db.execute(query)).scalar_one_or_none()
+        if not jackpot:
+            jackpot = Jackpot(name=name, amount=SEED_AMOUNT, epoch=0)
+            db.add(jackpot)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Строку одновременно создал другой воркер
+                await db.rollback()
+                jackpot = (await db.execute(query)).scalar_one()
+        amount, epoch = jackpot.amount, jackpot.epoch
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(BASE_KEY.format(name), amount, nx=True)
+        pipe.set(EPOCH_KEY.format(name), epoch, nx=True)
+        await pipe.execute()
+
+
+async def run_jackpot_folder():
+    """Фоновая задача: периодически сворачивает шарды в SQL-снимок"""
+    await ensure_jackpot()
+    while True:
+        try:
+            await fold()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Jackpot fold failed: {str(e)}")
+        await asyncio.sleep(FOLD_INTERVAL_SECONDS)
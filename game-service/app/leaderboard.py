@@ -0,0 +1,282 @@
+"""Лидерборды на sorted set Redis.
+
+Доски по каждому типу игры за день, неделю и все время. Очки игрока -
+чистый результат (выигрыш минус ставка). Доски обновляются
+инкрементально через ZINCRBY в момент расчета игры, чтение топа и ранга
+игрока - O(log n).
+
+Раз в сутки доски пересобираются из SQL, чтобы исправить расхождения
+(потерянные инкременты). Вручную:
+    python -m app.leaderboard --rebuild
+
+Инкремент и пересборка кладут игру в один и тот же период: слоты и
+блэкджек - по created_at игры, рулетка - по finished_at раунда.
+
+Пока доска пересобирается, на ней стоит метка, и инкременты пишутся еще
+и в дельту. Подмена доски - один Lua-скрипт: собранный из SQL ключ
+объединяется с дельтой (ZUNIONSTORE) и переименовывается в доску, так что
+очки, набранные во время пересборки, не теряются.
+"""
+import os
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import (
+    AsyncSessionLocal, SlotGame, BlackjackGame, BlackjackGameStatus, RouletteGame, RouletteBet
+)
+from .dependencies import get_current_user_id
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+GAME_TYPES = ("slots", "blackjack", "roulette")
+PERIODS = ("daily", "weekly", "alltime")
+BOARD_KEY = "lb:{}:{}:{}"
+REBUILD_LOCK_KEY = "lb:rebuild:lock"
+REBUILD_MARK_SECONDS = 600
+PERIOD_TTL_SECONDS = {"daily": 8 * 24 * 3600, "weekly": 5 * 7 * 24 * 3600, "alltime": None}
+REBUILD_HOUR_UTC = int(os.getenv("LEADERBOARD_REBUILD_HOUR", "0"))
+MAX_LIMIT = 100
+
+
+# KEYS: доска, дельта, метка пересборки; ARGV: TTL доски (0 - без TTL), затем пары user_id, net
+RECORD_SCRIPT = """
+local rebuilding = redis.call('EXISTS', KEYS[3]) == 1
+for i = 2, #ARGV, 2 do
+    redis.call('ZINCRBY', KEYS[1], ARGV[i + 1], ARGV[i])
+    if rebuilding then
+        redis.call('ZINCRBY', KEYS[2], ARGV[i + 1], ARGV[i])
+    end
+end
+if tonumber(ARGV[1]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+"""
+
+# KEYS: доска, собранный из SQL ключ, дельта, метка пересборки; ARGV: TTL доски
+SWAP_SCRIPT = """
+redis.call('ZUNIONSTORE', KEYS[2], 2, KEYS[2], KEYS[3])
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('RENAME', KEYS[2], KEYS[1])
+    if tonumber(ARGV[1]) > 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+    end
+else
+    redis.call('DEL', KEYS[1])
+end
+redis.call('DEL', KEYS[3], KEYS[4])
+"""
+
+_record_script = redis_client.register_script(RECORD_SCRIPT)
+_swap_script = redis_client.register_script(SWAP_SCRIPT)
+
+
+def period_bucket(period: str, at: datetime) -> str:
+    if period == "daily":
+        return at.strftime("%Y-%m-%d")
+    if period == "weekly":
+        year, week, _ = at.isocalendar()
+        return f"{year}-W{week:02d}"
+    return "all"
+
+
+def period_window(period: str, at: datetime):
+    """Окно периода (UTC) как [начало, конец); (None, None) - за все время"""
+    day = datetime(at.year, at.month, at.day)
+    if period == "daily":
+        return day, day + timedelta(days=1)
+    if period == "weekly":
+        start = day - timedelta(days=at.weekday())
+        return start, start + timedelta(days=7)
+    return None, None
+
+
+def board_key(game_type: str, period: str, at: Optional[datetime] = None) -> str:
+    return BOARD_KEY.format(game_type, period, period_bucket(period, at or datetime.utcnow()))
+
+
+def _rebuild_keys(key: str):
+    """Собираемый из SQL ключ, дельта инкрементов и метка пересборки доски"""
+    return f"{key}:rebuild", f"{key}:delta", f"{key}:rebuilding"
+
+
+async def record_many(game_type: str, results: Dict[int, float], at: Optional[datetime] = None):
+    """ZINCRBY чистого результата игроков во все доски периода одним pipeline.
+
+    at - момент, по которому игру относит к периоду и пересборка (см. aggregate_from_sql).
+    """
+    if not results:
+        return
+    at = at or datetime.utcnow()
+    pairs = [value for user_id, net in results.items() for value in (user_id, net)]
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for period in PERIODS:
+            key = board_key(game_type, period, at)
+            _, delta_key, mark_key = _rebuild_keys(key)
+            await _record_script(keys=[key, delta_key, mark_key],
+                                 args=[PERIOD_TTL_SECONDS[period] or 0, *pairs], client=pipe)
+        await pipe.execute()
+
+
+async def record(game_type: str, user_id: int, net: float, at: Optional[datetime] = None):
+    await record_many(game_type, {user_id: net}, at)
+
+
+def aggregate_from_sql(db: Session, game_type: str, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> Dict[int, float]:
+    """Чистый результат игроков за окно - GROUP BY по таблице игры"""
+    if game_type == "slots":
+        net = func.sum(SlotGame.win_amount - SlotGame.bet_amount)
+        query = db.query(SlotGame.user_id, net).group_by(SlotGame.user_id)
+        created_at = SlotGame.created_at
+    elif game_type == "blackjack":
+        net = func.sum(BlackjackGame.win_amount - BlackjackGame.bet_amount)
+        query = db.query(BlackjackGame.user_id, net).filter(
+            BlackjackGame.status == BlackjackGameStatus.FINISHED
+        ).group_by(BlackjackGame.user_id)
+        created_at = BlackjackGame.created_at
+    elif game_type == "roulette":
+        # Ставки раунда попадают в доску в момент расчета - по finished_at раунда
+        net = func.sum(func.coalesce(RouletteBet.payout_amount, 0.0) - RouletteBet.amount)
+        query = db.query(RouletteBet.user_id, net).join(
+            RouletteGame, RouletteGame.id == RouletteBet.game_id
+        ).filter(
+            RouletteBet.is_winner.isnot(None)
+        ).group_by(RouletteBet.user_id)
+        created_at = RouletteGame.finished_at
+    else:
+        raise ValueError(f"Unknown game type: {game_type}")
+
+    if since is not None:
+        query = query.filter(created_at >= since)
+    if until is not None:
+        query = query.filter(created_at < until)
+    return {user_id: float(total or 0.0) for user_id, total in query.all()}
+
+
+async def rebuild(db: AsyncSession, at: Optional[datetime] = None, periods=PERIODS) -> int:
+    """Пересобирает доски периода, содержащего at, из SQL.
+
+    До чтения SQL на доску ставится метка, и все инкременты с этого момента
+    копятся еще и в дельте; подмена - SWAP_SCRIPT (SQL + дельта, затем RENAME).
+    Игра, записанная в SQL до чтения, но отправившая ZINCRBY уже после метки,
+    может посчитаться дважды - окно в доли секунды, до следующей пересборки.
+    """
+    at = at or datetime.utcnow()
+    boards = 0
+    for game_type in GAME_TYPES:
+        for period in periods:
+            key = board_key(game_type, period, at)
+            tmp_key, delta_key, mark_key = _rebuild_keys(key)
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(tmp_key, delta_key)
+                pipe.set(mark_key, 1, ex=REBUILD_MARK_SECONDS)
+                await pipe.execute()
+
+            scores = await db.run_sync(aggregate_from_sql, game_type, *period_window(period, at))
+            if scores:
+                await redis_client.zadd(tmp_key, {str(user_id): score for user_id, score in scores.items()})
+            await _swap_script(keys=[key, tmp_key, delta_key, mark_key],
+                               args=[PERIOD_TTL_SECONDS[period] or 0])
+            boards += 1
+    logger.info(f"Rebuilt {boards} leaderboards from SQL")
+    return boards
+
+
+async def run_leaderboard_rebuilder():
+    """Фоновая задача: раз в сутки пересобирает доски (один воркер - по блокировке)"""
+    while True:
+        now = datetime.utcnow()
+        next_run = datetime(now.year, now.month, now.day, REBUILD_HOUR_UTC, 5)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        try:
+            if await redis_client.set(REBUILD_LOCK_KEY, 1, nx=True, ex=3600):
+                async with AsyncSessionLocal() as db:
+                    # Вчерашние доски закрываются, текущие - сверяются с SQL
+                    await rebuild(db, datetime.utcnow() - timedelta(days=1), periods=("daily", "weekly"))
+                    await rebuild(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Leaderboard rebuild failed: {str(e)}")
+
+
+# ===== API =====
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+
+def _check_board(game_type: str, period: str):
+    if game_type not in GAME_TYPES:
+        raise HTTPException(status_code=404, detail="Unknown game type")
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Period must be one of {', '.join(PERIODS)}")
+
+
+@router.get("/{game_type}")
+async def get_leaderboard(
+    game_type: str,
+    period: str = Query("daily"),
+    limit: int = Query(10, ge=1, le=MAX_LIMIT)
+):
+    """Топ игроков доски: ZREVRANGE, O(log n + limit)"""
+    _check_board(game_type, period)
+    entries = await redis_client.zrevrange(board_key(game_type, period), 0, limit - 1, withscores=True)
+    return {
+        "game_type": game_type,
+        "period": period,
+        "entries": [
+            {"rank": rank, "user_id": int(user_id), "score": round(score, 2)}
+            for rank, (user_id, score) in enumerate(entries, start=1)
+        ]
+    }
+
+
+@router.get("/{game_type}/me")
+async def get_my_rank(
+    game_type: str,
+    period: str = Query("daily"),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Место текущего игрока: ZREVRANK + ZSCORE, O(log n)"""
+    _check_board(game_type, period)
+    key = board_key(game_type, period)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zrevrank(key, user_id)
+        pipe.zscore(key, user_id)
+        rank, score = await pipe.execute()
+    return {
+        "game_type": game_type,
+        "period": period,
+        "user_id": user_id,
+        "rank": rank + 1 if rank is not None else None,
+        "score": round(score, 2) if score is not None else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard maintenance")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild current boards from SQL")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            await rebuild(db)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Снимок лобби одним запросом.
+
+Вместо четырех запросов клиента через nginx и KrakenD (баланс в
+кошельке, активные игры рулетки, история слотов, уведомления) один
+эндпоинт опрашивает все источники параллельно. У каждого источника свой
+таймаут: медленный или упавший источник не задерживает ответ, его поле
+приходит пустым и попадает в errors, а снимок помечается partial.
+
+Собранный снимок кэшируется в Redis на несколько секунд на игрока -
+повторное открытие лобби не ходит в источники вовсе.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Tuple
+
+import httpx
+import orjson
+from fastapi import APIRouter, Depends, Header, Response
+from fastapi.responses import ORJSONResponse
+
+from .database import AsyncSessionLocal
+from .dependencies import get_current_user_id
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["lobby"])
+
+NOTIFICATION_SERVICE_URL = os.getenv("NOTIFICATION_SERVICE_URL", "http://notification-service:8005")
+LOBBY_KEY = "lobby:{}"
+CACHE_TTL_SECONDS = float(os.getenv("LOBBY_CACHE_TTL", "3"))
+# Неполный снимок живет меньше: источник скоро может подняться
+PARTIAL_CACHE_TTL_SECONDS = float(os.getenv("LOBBY_PARTIAL_CACHE_TTL", "1"))
+GAMES_LIMIT = int(os.getenv("LOBBY_GAMES_LIMIT", "10"))
+NOTIFICATIONS_LIMIT = int(os.getenv("LOBBY_NOTIFICATIONS_LIMIT", "10"))
+
+SOURCE_TIMEOUTS = {
+    "balance": float(os.getenv("LOBBY_BALANCE_TIMEOUT", "1.0")),
+    "roulette_games": float(os.getenv("LOBBY_ROULETTE_TIMEOUT", "0.5")),
+    "slots_history": float(os.getenv("LOBBY_SLOTS_TIMEOUT", "0.5")),
+    "notifications": float(os.getenv("LOBBY_NOTIFICATIONS_TIMEOUT", "1.0")),
+}
+DEFAULT_TIMEOUT_SECONDS = 1.0
+
+
+async def fetch_sources(sources: Dict[str, Callable[[], Awaitable]],
+                        timeouts: Dict[str, float] = SOURCE_TIMEOUTS) -> Tuple[dict, dict]:
+    """Опрашивает источники параллельно: (данные, ошибки); упавший источник дает None"""
+    async def run(name: str, source):
+        try:
+            return name, await asyncio.wait_for(source(), timeouts.get(name, DEFAULT_TIMEOUT_SECONDS)), None
+        except asyncio.TimeoutError:
+            logger.warning(f"Lobby source {name} timed out")
+            return name, None, "timeout"
+        except Exception as e:
+            logger.warning(f"Lobby source {name} failed: {str(e)}")
+            return name, None, "error"
+
+    results = await asyncio.gather(*(run(name, source) for name, source in sources.items()))
+    data = {name: value for name, value, _ in results}
+    errors = {name: error for name, _, error in results if error}
+    return data, errors
+
+
+def lobby_sources(user_id: int, authorization: str) -> Dict[str, Callable[[], Awaitable]]:
+    """Источники лобби; локальные берут каждый свою сессию - запросы идут параллельно"""
+    from .roulette import get_active_games_fixed
+    from .slots import get_wallet_balance, get_slots_history
+
+    async def balance():
+        return await get_wallet_balance(authorization)
+
+    async def roulette_games():
+        async with AsyncSessionLocal() as db:
+            page = await get_active_games_fixed(status="active", limit=GAMES_LIMIT, cursor=None,
+                                                bets="summary", db=db)
+        return page["games"]
+
+    async def slots_history():
+        async with AsyncSessionLocal() as db:
+            return (await get_slots_history(db=db, user_id=user_id))["games"]
+
+    async def notifications():
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{NOTIFICATION_SERVICE_URL}/notifications/user/{user_id}")
+        response.raise_for_status()
+        return response.json()["data"][:NOTIFICATIONS_LIMIT]
+
+    return {
+        "balance": balance,
+        "roulette_games": roulette_games,
+        "slots_history": slots_history,
+        "notifications": notifications,
+    }
+
+
+async def build_snapshot(user_id: int, sources: Dict[str, Callable[[], Awaitable]]) -> dict:
+    data, errors = await fetch_sources(sources)
+    return {
+        "user_id": user_id,
+        **data,
+        "partial": bool(errors),
+        "errors": errors,
+        "generated_at": time.time(),
+    }
+
+
+@router.get("/lobby")
+async def get_lobby(
+    user_id: int = Depends(get_current_user_id),
+    authorization: str = Header(..., alias="Authorization")
+):
+    """Баланс, игры рулетки, история слотов и уведомления одним ответом"""
+    key = LOBBY_KEY.format(user_id)
+    try:
+        cached = await redis_client.get(key)
+        if cached:
+            return Response(content=cached, media_type="application/json")
+    except Exception as e:
+        print(f"Lobby cache read failed: {str(e)}")
+
+    snapshot = await build_snapshot(user_id, lobby_sources(user_id, authorization))
+    try:
+        ttl = PARTIAL_CACHE_TTL_SECONDS if snapshot["partial"] else CACHE_TTL_SECONDS
+        await redis_client.set(key, orjson.dumps(snapshot), px=int(ttl * 1000))
+    except Exception as e:
+        print(f"Lobby cache write failed: {str(e)}")
+    return ORJSONResponse(snapshot)
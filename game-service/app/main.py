@@ -1,20 +1,65 @@
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi import Request
+from contextlib import asynccontextmanager
+import asyncio
 import logging
-from .database import engine, Base
+from .database import engine, async_engine, Base
+from .schema import upgrade_schema
 
-# Создаем таблицы
+# Создаем таблицы и доводим уже существующие до моделей
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: фоновые задачи сервиса
+    from .hand_store import run_hand_sweeper
+    from .table_scheduler import start_tables
+    from .roulette import game_manager, table_feed
+    from .bet_buffer import run_bet_flusher
+    from .jackpot import run_jackpot_folder
+    from .leaderboard import run_leaderboard_rebuilder
+    tasks = [
+        asyncio.create_task(run_hand_sweeper()),
+        asyncio.create_task(game_manager.listen()),
+        asyncio.create_task(table_feed.listen()),
+        asyncio.create_task(run_bet_flusher()),
+        asyncio.create_task(run_jackpot_folder()),
+        asyncio.create_task(run_leaderboard_rebuilder())
+    ]
+    tasks += start_tables()
+    logger.info("Background tasks started")
+    
+    yield
+    
+    # Shutdown
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    try:
+        from .bet_buffer import flush_all
+        await flush_all(wait=True)
+    except Exception as e:
+        logger.error(f"Final bet flush failed: {str(e)}")
+    try:
+        from .jackpot import fold
+        await fold()
+    except Exception as e:
+        logger.error(f"Final jackpot fold failed: {str(e)}")
+    await async_engine.dispose()
+    logger.info("Background tasks stopped")
+
 app = FastAPI(
     title="Game Service API",
     description="Microservice for casino games", 
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 templates = Jinja2Templates(directory="app/templates")
@@ -38,6 +83,15 @@ app.include_router(slots_router)
 from .blackjack import router as blackjack_router
 app.include_router(blackjack_router)
 
+from .leaderboard import router as leaderboard_router
+app.include_router(leaderboard_router)
+
+from .history import router as history_router
+app.include_router(history_router)
+
+from .lobby import router as lobby_router
+app.include_router(lobby_router)
+
 # Minimal UI endpoints
 @app.get("/ui/login", response_class=HTMLResponse)
 async def ui_login(request: Request):
@@ -0,0 +1,347 @@
+"""Источник случайных исходов игр.
+
+BufferedOutcomeSource читает байты CSPRNG (os.urandom) блоками в буфер и
+превращает их в несмещенные целые методом отбраковки, так что на один
+исход не приходится отдельный системный вызов. Вызовы синхронные и не
+отдают управление event loop, поэтому общий источник безопасен для
+корутин одного процесса.
+
+Для доказуемо честных раундов используется цепочка серверных сидов:
+    seed[N] - случайный, seed[i - 1] = sha256(seed[i])
+Заранее публикуется якорь seed[0], раунды получают seed[1], seed[2], ...
+Раскрытый сид раунда хешируется в сид предыдущего раунда, а исход
+воспроизводится из сида через HMAC-SHA256 (SeededOutcomeSource).
+
+До спина раунд публикует только commit_seed(seed) - HMAC с отдельной
+меткой, а не sha256 сида: sha256(seed[i]) - это сид предыдущего раунда,
+который, возможно, еще не сыгран. По той же причине сид раскрывается
+только когда сыграны все раунды цепочки с меньшими номерами.
+
+С GAME_MANAGER_BACKEND=redis цепочка одна на все воркеры и переживает
+перезапуск (RedisSeedChainManager), якоря всех цепочек хранятся в Redis
+и отдаются через /roulette/fairness/anchors.
+
+Бенчмарк из каталога game-service:
+    python -m app.outcomes --n 1000000
+"""
+import os
+import abc
+import hmac
+import time
+import random
+import hashlib
+import argparse
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+BUFFER_SIZE = int(os.getenv("OUTCOME_BUFFER_SIZE", "65536"))
+SEED_CHAIN_LENGTH = int(os.getenv("FAIR_SEED_CHAIN_LENGTH", "10000"))
+
+
+class OutcomeSource(abc.ABC):
+    """Несмещенные числа поверх потока байт, который дает _read"""
+
+    @abc.abstractmethod
+    def _read(self, n: int) -> bytes:
+        """Следующие n байт потока"""
+
+    def _read_int(self, n_bytes: int) -> int:
+        return int.from_bytes(self._read(n_bytes), "big")
+
+    def randbelow(self, n: int) -> int:
+        """Целое из [0, n) без смещения по модулю.
+
+        Берется на байт больше, чем нужно для n, и отбрасываются значения
+        из неполного последнего периода - отбраковка реже 1/256.
+        """
+        if n <= 0:
+            raise ValueError("n must be positive")
+        n_bytes = ((n - 1).bit_length() + 7) // 8 + 1
+        limit = ((1 << (8 * n_bytes)) // n) * n
+        while True:
+            value = self._read_int(n_bytes)
+            if value < limit:
+                return value % n
+
+    def randint(self, a: int, b: int) -> int:
+        """Целое из [a, b] включительно, как random.randint"""
+        return a + self.randbelow(b - a + 1)
+
+    def choice(self, seq: Sequence):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[self.randbelow(len(seq))]
+
+    def random(self) -> float:
+        """Float из [0, 1) с 53 битами точности"""
+        return (self._read_int(7) >> 3) / 9007199254740992.0
+
+
+class BufferedOutcomeSource(OutcomeSource):
+    """CSPRNG-байты, читаемые из os.urandom блоками по buffer_size"""
+
+    def __init__(self, buffer_size: int = BUFFER_SIZE, entropy: Callable[[int], bytes] = os.urandom):
+        self.buffer_size = buffer_size
+        self.entropy = entropy
+        self._buffer = b""
+        self._view = memoryview(self._buffer)
+        self._pos = 0
+        self._lock = threading.Lock()
+
+    def _read(self, n: int) -> bytes:
+        with self._lock:
+            end = self._pos + n
+            if end > len(self._buffer):
+                self._refill(n)
+                end = n
+            chunk = self._buffer[self._pos:end]
+            self._pos = end
+            return chunk
+
+    def _read_int(self, n_bytes: int) -> int:
+        with self._lock:
+            end = self._pos + n_bytes
+            if end > len(self._buffer):
+                self._refill(n_bytes)
+                end = n_bytes
+            value = int.from_bytes(self._view[self._pos:end], "big")
+            self._pos = end
+            return value
+
+    def _refill(self, n: int):
+        self._buffer = self._buffer[self._pos:] + self.entropy(max(self.buffer_size, n))
+        self._view = memoryview(self._buffer)
+        self._pos = 0
+
+
+class SeededOutcomeSource(OutcomeSource):
+    """Детерминированный поток: HMAC-SHA256(server_seed, "message:counter")"""
+
+    def __init__(self, server_seed: bytes, message: str):
+        self.server_seed = server_seed
+        self.message = message
+        self._counter = 0
+        self._buffer = b""
+
+    def _read(self, n: int) -> bytes:
+        while len(self._buffer) < n:
+            block = hmac.new(self.server_seed, f"{self.message}:{self._counter}".encode(), hashlib.sha256)
+            self._buffer += block.digest()
+            self._counter += 1
+        chunk, self._buffer = self._buffer[:n], self._buffer[n:]
+        return chunk
+
+
+COMMITMENT_LABEL = b"roulette:commitment"
+
+
+def hash_seed(seed: bytes) -> bytes:
+    return hashlib.sha256(seed).digest()
+
+
+def commit_seed(seed: bytes) -> bytes:
+    """Публикуемое до спина обязательство по сиду; не совпадает ни с одним звеном цепочки"""
+    return hmac.new(seed, COMMITMENT_LABEL, hashlib.sha256).digest()
+
+
+class SeedChain:
+    """Заранее посчитанная хеш-цепочка серверных сидов"""
+
+    def __init__(self, length: int = SEED_CHAIN_LENGTH, terminal_seed: Optional[bytes] = None):
+        seed = terminal_seed or os.urandom(32)
+        chain = [seed]
+        for _ in range(length):
+            seed = hash_seed(seed)
+            chain.append(seed)
+        chain.reverse()
+        # chain[0] - публикуемый якорь, chain[1:] - сиды раундов по порядку
+        self._chain = chain
+        self._next = 1
+        self._lock = threading.Lock()
+
+    @property
+    def anchor(self) -> bytes:
+        return self._chain[0]
+
+    @property
+    def terminal(self) -> bytes:
+        return self._chain[-1]
+
+    def seed(self, index: int) -> bytes:
+        return self._chain[index]
+
+    @property
+    def remaining(self) -> int:
+        return len(self._chain) - self._next
+
+    def next_seed(self) -> Optional[Tuple[int, bytes]]:
+        """(номер в цепочке, сид) следующего раунда; None - цепочка исчерпана"""
+        with self._lock:
+            if self._next >= len(self._chain):
+                return None
+            index = self._next
+            self._next += 1
+            return index, self._chain[index]
+
+
+class SeedChainManager:
+    """Выдает сиды раундам, начиная новую цепочку, когда текущая закончилась (память процесса)"""
+
+    def __init__(self, length: int = SEED_CHAIN_LENGTH):
+        self.length = length
+        self._chain: Optional[SeedChain] = None
+        self._anchors: List[bytes] = []
+        self._lock = threading.Lock()
+
+    @property
+    def chain(self) -> SeedChain:
+        with self._lock:
+            if self._chain is None or self._chain.remaining == 0:
+                self._chain = SeedChain(self.length)
+                self._anchors.append(self._chain.anchor)
+            return self._chain
+
+    async def next_seed(self) -> Tuple[bytes, int, bytes]:
+        """(якорь цепочки, номер в цепочке, сид) для следующего раунда"""
+        while True:
+            chain = self.chain
+            issued = chain.next_seed()
+            if issued:
+                return chain.anchor, issued[0], issued[1]
+
+    async def anchors(self) -> List[bytes]:
+        """Якоря всех выданных цепочек, от старых к новым"""
+        return list(self._anchors)
+
+
+CHAIN_KEY = "fair:chain"  # hash: terminal, anchor, length, next
+ANCHORS_KEY = "fair:anchors"
+
+# Номер следующего сида текущей цепочки; строка - цепочка исчерпана (якорь) или ее нет ('')
+ISSUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return ''
+end
+local length = tonumber(redis.call('HGET', KEYS[1], 'length'))
+if tonumber(redis.call('HGET', KEYS[1], 'next')) >= length then
+    return redis.call('HGET', KEYS[1], 'anchor')
+end
+local index = redis.call('HINCRBY', KEYS[1], 'next', 1)
+return {redis.call('HGET', KEYS[1], 'terminal'), index, length}
+"""
+
+# Новая цепочка ставится, только если текущая все еще та, что видел воркер
+ROTATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'anchor') or ''
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'terminal', ARGV[2], 'anchor', ARGV[3], 'length', ARGV[4], 'next', 0)
+redis.call('RPUSH', KEYS[2], ARGV[3])
+return 1
+"""
+
+
+class RedisSeedChainManager:
+    """Одна цепочка сидов на все воркеры: секрет цепочки и счетчик - в Redis"""
+
+    def __init__(self, redis, length: int = SEED_CHAIN_LENGTH):
+        self.redis = redis
+        self.length = length
+        self._issue = redis.register_script(ISSUE_SCRIPT)
+        self._rotate = redis.register_script(ROTATE_SCRIPT)
+        self._chain: Optional[SeedChain] = None
+
+    def _chain_for(self, terminal: bytes, length: int) -> SeedChain:
+        # Цепочка считается из секрета один раз на воркер и цепочку
+        if self._chain is None or self._chain.terminal != terminal:
+            self._chain = SeedChain(length, terminal_seed=terminal)
+        return self._chain
+
+    async def next_seed(self) -> Tuple[bytes, int, bytes]:
+        """(якорь цепочки, номер в цепочке, сид) для следующего раунда"""
+        while True:
+            issued = await self._issue(keys=[CHAIN_KEY])
+            if not isinstance(issued, str):
+                terminal, index, length = issued
+                chain = self._chain_for(bytes.fromhex(terminal), int(length))
+                return chain.anchor, int(index), chain.seed(int(index))
+            fresh = SeedChain(self.length)
+            await self._rotate(keys=[CHAIN_KEY, ANCHORS_KEY],
+                               args=[issued, fresh.terminal.hex(), fresh.anchor.hex(), self.length])
+
+    async def anchors(self) -> List[bytes]:
+        """Якоря всех выданных цепочек, от старых к новым"""
+        return [bytes.fromhex(anchor) for anchor in await self.redis.lrange(ANCHORS_KEY, 0, -1)]
+
+
+def create_seed_chains():
+    """Redis при GAME_MANAGER_BACKEND=redis, иначе память процесса"""
+    if os.getenv("GAME_MANAGER_BACKEND", "memory").lower() == "redis":
+        from .redis_client import redis_client
+        return RedisSeedChainManager(redis_client)
+    return SeedChainManager()
+
+
+def verify_chain(seeds: List[bytes], anchor: bytes) -> bool:
+    """Проверяет, что сиды идут подряд по цепочке, начиная сразу за якорем"""
+    previous = anchor
+    for seed in seeds:
+        if hash_seed(seed) != previous:
+            return False
+        previous = seed
+    return True
+
+
+def verify_seed(seed: bytes, anchor: bytes, index: int) -> bool:
+    """Сид с номером index в цепочке хешируется index раз в якорь"""
+    for _ in range(index):
+        seed = hash_seed(seed)
+    return seed == anchor
+
+
+def roulette_number(server_seed: bytes, game_id: int) -> int:
+    """Выигрышное число раунда, воспроизводимое по раскрытому сиду"""
+    return SeededOutcomeSource(server_seed, f"roulette:{game_id}").randint(0, 36)
+
+
+# Общий источник процесса и цепочка сидов раундов рулетки
+outcomes = BufferedOutcomeSource()
+seed_chains = create_seed_chains()
+
+
+def benchmark(n: int) -> dict:
+    """Исходов в секунду: random, secrets и буферизованный CSPRNG"""
+    import secrets
+
+    def rate(fn) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return n / (time.perf_counter() - started)
+
+    source = BufferedOutcomeSource()
+    seeded = SeededOutcomeSource(os.urandom(32), "benchmark")
+    return {
+        "random.randint(0, 36)": rate(lambda: random.randint(0, 36)),
+        "secrets.randbelow(37)": rate(lambda: secrets.randbelow(37)),
+        "buffered.randint(0, 36)": rate(lambda: source.randint(0, 36)),
+        "seeded.randint(0, 36)": rate(lambda: seeded.randint(0, 36)),
+        "random.random()": rate(random.random),
+        "buffered.random()": rate(source.random),
+        "random.choice(deck)": rate(lambda: random.choice(range(52))),
+        "buffered.choice(deck)": rate(lambda: source.choice(range(52))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outcome source benchmark")
+    parser.add_argument("--n", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    for name, per_second in benchmark(args.n).items():
+        print(f"{name:<26} {per_second:>14,.0f} /s")
+
+
+if __name__ == "__main__":
+    main()
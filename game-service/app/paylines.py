@@ -0,0 +1,272 @@
+"""Многолинейные слоты: сетка 3x3 / 5x3, линии выплат, wild и scatter.
+
+Сетка хранится как массив id символов shape (rows, reels), пачка сеток -
+(batch, rows, reels). Все линии всех сеток пачки считаются разом через
+индексные массивы NumPy, без циклов Python по сеткам и линиям.
+
+Правила:
+  * линия платит за k >= 3 одинаковых символов подряд с левого барабана,
+    wild заменяет любой символ, кроме scatter;
+  * выплата линии - множитель ставки на линию (ставка / число линий);
+  * scatter платит за количество на всей сетке, множитель общей ставки.
+
+Бенчмарк из каталога game-service:
+    python -m app.paylines --grids 1000000 --machine lines5x3
+"""
+import os
+import json
+import time
+import random
+import argparse
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .database import SlotSymbol
+from .reels import AliasTable
+
+WILD = "wild"
+SCATTER = "scatter"
+GRID_SYMBOLS = [symbol.value for symbol in SlotSymbol] + [WILD, SCATTER]
+GRID_SYMBOL_IDS = {symbol: i for i, symbol in enumerate(GRID_SYMBOLS)}
+N_GRID_SYMBOLS = len(GRID_SYMBOLS)
+WILD_ID = GRID_SYMBOL_IDS[WILD]
+SCATTER_ID = GRID_SYMBOL_IDS[SCATTER]
+# Бит на ячейку при упаковке сетки в одно число
+CELL_BITS = max(1, (N_GRID_SYMBOLS - 1).bit_length())
+
+
+class GridMachine:
+    """Машина с сеткой rows x reels и набором линий выплат"""
+
+    def __init__(self, name: str, rows: int, reel_weights: List[Dict[str, float]],
+                 paylines: Sequence[Sequence[int]], line_pays: Dict[str, Dict[int, float]],
+                 scatter_pays: Optional[Dict[int, float]] = None):
+        self.name = name
+        self.rows = rows
+        self.n_reels = len(reel_weights)
+        if rows * self.n_reels * CELL_BITS > 63:
+            raise ValueError(f"Grid {rows}x{self.n_reels} does not fit into a BigInteger")
+
+        self.reels = [
+            AliasTable([weights.get(symbol, 0.0) for symbol in GRID_SYMBOLS])
+            for weights in reel_weights
+        ]
+
+        # Линия - номер строки на каждом барабане
+        self.paylines = np.asarray(paylines, dtype=np.int64)
+        if self.paylines.ndim != 2 or self.paylines.shape[1] != self.n_reels:
+            raise ValueError("Each payline must have one row index per reel")
+        if (self.paylines < 0).any() or (self.paylines >= rows).any():
+            raise ValueError("Payline row index out of range")
+        self.n_lines = len(self.paylines)
+        self._reel_index = np.arange(self.n_reels)
+
+        # pay_table[symbol, k] - множитель ставки на линию за k символов подряд
+        self.pay_table = np.zeros((N_GRID_SYMBOLS, self.n_reels + 1), dtype=np.float64)
+        for symbol, pays in line_pays.items():
+            for count, multiplier in pays.items():
+                self.pay_table[GRID_SYMBOL_IDS[symbol], int(count)] = multiplier
+        self.pay_table[SCATTER_ID] = 0.0
+
+        self.scatter_table = np.zeros(rows * self.n_reels + 1, dtype=np.float64)
+        for count, multiplier in (scatter_pays or {}).items():
+            self.scatter_table[int(count)] = multiplier
+
+    def sample_grids(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Пачка сеток shape (size, rows, reels)"""
+        columns = [reel.sample_batch(rng, size * self.rows).reshape(size, self.rows) for reel in self.reels]
+        return np.stack(columns, axis=2)
+
+    def spin(self, uniform=random.random) -> np.ndarray:
+        """Одна сетка shape (rows, reels)"""
+        return np.array([
+            [reel.sample(uniform) for reel in self.reels]
+            for _ in range(self.rows)
+        ], dtype=np.int64)
+
+    def evaluate(self, grids: np.ndarray) -> Dict[str, np.ndarray]:
+        """Считает все линии пачки сеток.
+
+        Возвращает множители общей ставки shape (batch,), а также по
+        линиям: символ, длину серии и выигрыш shape (batch, lines).
+        """
+        grids = np.asarray(grids)
+        if grids.ndim == 2:
+            grids = grids[None]
+
+        # (batch, lines, reels): символы вдоль каждой линии
+        line_symbols = grids[:, self.paylines, self._reel_index]
+        is_wild = line_symbols == WILD_ID
+
+        # Символ линии - первый не-wild слева (или wild, если линия целиком из wild)
+        first = np.argmax(~is_wild, axis=2)
+        line_symbol = np.take_along_axis(line_symbols, first[..., None], axis=2)[..., 0]
+
+        # Длина серии с левого барабана: символ линии или wild
+        matches = (line_symbols == line_symbol[..., None]) | is_wild
+        run = np.where(matches.all(axis=2), self.n_reels, np.argmin(matches, axis=2))
+
+        line_wins = self.pay_table[line_symbol, run] / self.n_lines
+        scatters = np.count_nonzero(grids == SCATTER_ID, axis=(1, 2))
+        scatter_wins = self.scatter_table[scatters]
+
+        return {
+            "multipliers": line_wins.sum(axis=1) + scatter_wins,
+            "line_symbols": line_symbol,
+            "line_runs": run,
+            "line_wins": line_wins,
+            "scatters": scatters,
+            "scatter_wins": scatter_wins,
+        }
+
+    def spin_result(self, uniform=random.random) -> dict:
+        """Одна сетка с разбором выигрышных линий для ответа API"""
+        grid = self.spin(uniform)
+        result = self.evaluate(grid)
+        wins = [
+            {
+                "line": int(line),
+                "symbol": GRID_SYMBOLS[int(result["line_symbols"][0, line])],
+                "count": int(result["line_runs"][0, line]),
+                "multiplier": float(result["line_wins"][0, line]),
+            }
+            for line in np.flatnonzero(result["line_wins"][0])
+        ]
+        return {
+            "grid": grid,
+            "multiplier": float(result["multipliers"][0]),
+            "line_wins": wins,
+            "scatters": int(result["scatters"][0]),
+        }
+
+    def encode_grid(self, grid: np.ndarray) -> int:
+        """Упаковывает сетку в одно целое (CELL_BITS бит на ячейку) для SlotGame.grid"""
+        code = 0
+        for symbol_id in np.asarray(grid).ravel()[::-1]:
+            code = (code << CELL_BITS) | int(symbol_id)
+        return code
+
+    def decode_grid(self, code: int) -> List[List[str]]:
+        """Обратное преобразование: строки сетки именами символов"""
+        mask = (1 << CELL_BITS) - 1
+        cells = []
+        for _ in range(self.rows * self.n_reels):
+            cells.append(GRID_SYMBOLS[code & mask])
+            code >>= CELL_BITS
+        return [cells[r * self.n_reels:(r + 1) * self.n_reels] for r in range(self.rows)]
+
+
+# Линии: номера строк (0 - верхняя) слева направо
+PAYLINES_3X3 = [
+    [1, 1, 1], [0, 0, 0], [2, 2, 2],
+    [0, 1, 2], [2, 1, 0],
+]
+PAYLINES_5X3 = [
+    [1, 1, 1, 1, 1], [0, 0, 0, 0, 0], [2, 2, 2, 2, 2],
+    [0, 1, 2, 1, 0], [2, 1, 0, 1, 2],
+    [0, 0, 1, 2, 2], [2, 2, 1, 0, 0],
+    [1, 0, 0, 0, 1], [1, 2, 2, 2, 1],
+    [1, 0, 1, 2, 1],
+]
+
+REEL_WEIGHTS = {
+    "cherry": 8, "lemon": 7, "orange": 6, "plum": 5,
+    "bell": 3, "seven": 2, WILD: 1, SCATTER: 1,
+}
+
+
+def _default_machines() -> Dict[str, GridMachine]:
+    no_scatter = {symbol: weight for symbol, weight in REEL_WEIGHTS.items() if symbol != SCATTER}
+    lines3x3 = GridMachine(
+        "lines3x3", rows=3, reel_weights=[no_scatter] * 3, paylines=PAYLINES_3X3,
+        line_pays={
+            "cherry": {3: 9}, "lemon": {3: 12}, "orange": {3: 17}, "plum": {3: 24},
+            "bell": {3: 57}, "seven": {3: 140}, WILD: {3: 240},
+        }
+    )
+    lines5x3 = GridMachine(
+        "lines5x3", rows=3, reel_weights=[REEL_WEIGHTS] * 5, paylines=PAYLINES_5X3,
+        line_pays={
+            "cherry": {3: 8, 4: 20, 5: 55}, "lemon": {3: 10, 4: 24, 5: 75},
+            "orange": {3: 11, 4: 28, 5: 90}, "plum": {3: 14, 4: 36, 5: 140},
+            "bell": {3: 27, 4: 90, 5: 360}, "seven": {3: 45, 4: 180, 5: 900},
+            WILD: {3: 90, 4: 450, 5: 1800},
+        },
+        scatter_pays={3: 3, 4: 12, 5: 50, 6: 100, 7: 200}
+    )
+    return {machine.name: machine for machine in (lines3x3, lines5x3)}
+
+
+def _grid_machine_from_config(name: str, config: dict) -> GridMachine:
+    return GridMachine(
+        name,
+        rows=config.get("rows", 3),
+        reel_weights=config["reels"],
+        paylines=config["paylines"],
+        line_pays={symbol: {int(k): v for k, v in pays.items()} for symbol, pays in config["line_pays"].items()},
+        scatter_pays={int(k): v for k, v in config.get("scatter_pays", {}).items()}
+    )
+
+
+def load_grid_machines(path: Optional[str] = None) -> Dict[str, GridMachine]:
+    """Встроенные машины 3x3 и 5x3 + машины из JSON-файла (SLOT_GRID_MACHINES_FILE)"""
+    machines = _default_machines()
+    path = path or os.getenv("SLOT_GRID_MACHINES_FILE")
+    if path:
+        with open(path) as f:
+            for name, config in json.load(f).items():
+                machines[name] = _grid_machine_from_config(name, config)
+    return machines
+
+
+GRID_MACHINES = load_grid_machines()
+
+
+def benchmark(grids: int, machine: str = "lines5x3", batch_size: int = 100_000, seed: Optional[int] = None) -> dict:
+    """Скорость оценки сеток пачками и средний множитель (оценка RTP)"""
+    grid_machine = GRID_MACHINES[machine]
+    rng = np.random.default_rng(seed)
+    total = 0.0
+    hits = 0
+    evaluate_seconds = 0.0
+    remaining = grids
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        batch = grid_machine.sample_grids(rng, size)
+        started = time.perf_counter()
+        multipliers = grid_machine.evaluate(batch)["multipliers"]
+        evaluate_seconds += time.perf_counter() - started
+        total += float(multipliers.sum())
+        hits += int(np.count_nonzero(multipliers))
+        remaining -= size
+
+    return {
+        "machine": machine,
+        "grids": grids,
+        "lines": grid_machine.n_lines,
+        "rtp": total / grids,
+        "hit_rate": hits / grids,
+        "evaluate_seconds": evaluate_seconds,
+        "grids_per_second": grids / evaluate_seconds if evaluate_seconds > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payline evaluation micro-benchmark")
+    parser.add_argument("--grids", type=int, default=1_000_000)
+    parser.add_argument("--machine", default="lines5x3", choices=sorted(GRID_MACHINES))
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    result = benchmark(args.grids, args.machine, args.batch_size, args.seed)
+    print(f"Machine:     {result['machine']} ({result['lines']} lines)")
+    print(f"Grids:       {result['grids']:,}")
+    print(f"RTP:         {result['rtp']:.5f}")
+    print(f"Hit rate:    {result['hit_rate']:.5f}")
+    print(f"Evaluate:    {result['evaluate_seconds']:.2f}s ({result['grids_per_second']:,.0f} grids/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import redis.asyncio as redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/1")
+
+redis_client = redis.from_url(REDIS_URL, decode_responses=True)
@@ -0,0 +1,167 @@
+"""Барабаны слот-машин: взвешенные ленты и alias-таблицы Vose.
+
+Для каждой машины задаются веса символов на каждом барабане. При загрузке
+по весам строится alias-таблица, после чего выбор символа стоит O(1)
+независимо от числа символов. Таблица выплат компилируется в плотный
+массив, индексируемый id символов.
+
+Свои машины можно описать в JSON-файле (путь в SLOT_MACHINES_FILE):
+    {"lucky": {"reels": [{"cherry": 8, "seven": 1, ...}, ...], "payouts": [...]}}
+"""
+import os
+import json
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .database import SlotSymbol
+
+SYMBOLS = list(SlotSymbol)
+SYMBOL_IDS = {symbol: i for i, symbol in enumerate(SYMBOLS)}
+N_SYMBOLS = len(SYMBOLS)
+
+# Таблица выплат классической машины: три одинаковых символа
+CLASSIC_PAYOUTS = {
+    (SlotSymbol.SEVEN, SlotSymbol.SEVEN, SlotSymbol.SEVEN): 50,    # 3 семерки
+    (SlotSymbol.BELL, SlotSymbol.BELL, SlotSymbol.BELL): 15,       # 3 колокола
+    (SlotSymbol.PLUM, SlotSymbol.PLUM, SlotSymbol.PLUM): 10,       # 3 сливы
+    (SlotSymbol.ORANGE, SlotSymbol.ORANGE, SlotSymbol.ORANGE): 5,  # 3 апельсина
+    (SlotSymbol.LEMON, SlotSymbol.LEMON, SlotSymbol.LEMON): 3,     # 3 лимона
+    (SlotSymbol.CHERRY, SlotSymbol.CHERRY, SlotSymbol.CHERRY): 2,  # 3 вишни
+}
+
+
+class AliasTable:
+    """Alias-таблица Vose: выбор индекса с заданными весами за O(1)"""
+
+    def __init__(self, weights: Sequence[float]):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim != 1 or len(weights) == 0 or (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("Weights must be a non-empty list of non-negative numbers")
+
+        n = len(weights)
+        self.n = n
+        self.probabilities = weights / weights.sum()
+        scaled = self.probabilities * n
+        prob = np.zeros(n, dtype=np.float64)
+        alias = np.zeros(n, dtype=np.int64)
+
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in large + small:
+            # Остатки из-за погрешности округления
+            prob[i] = 1.0
+            alias[i] = i
+
+        self.prob = prob
+        self.alias = alias
+        self._prob_list = prob.tolist()
+        self._alias_list = alias.tolist()
+
+    def sample(self, uniform=random.random) -> int:
+        """Один индекс; uniform - источник равномерных чисел [0, 1)"""
+        u = uniform() * self.n
+        i = int(u)
+        if i >= self.n:
+            i = self.n - 1
+        return i if u - i < self._prob_list[i] else self._alias_list[i]
+
+    def sample_batch(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Пачка индексов векторно"""
+        i = rng.integers(0, self.n, size)
+        keep = rng.random(size) < self.prob[i]
+        return np.where(keep, i, self.alias[i])
+
+
+class SlotMachine:
+    """Машина: взвешенные барабаны + скомпилированная таблица выплат"""
+
+    def __init__(self, name: str, reel_weights: List[Dict[SlotSymbol, float]],
+                 payouts: Dict[Tuple[SlotSymbol, ...], float]):
+        self.name = name
+        self.reel_weights = reel_weights
+        self.payouts = payouts
+        self.reels = [
+            AliasTable([weights.get(symbol, 0.0) for symbol in SYMBOLS])
+            for weights in reel_weights
+        ]
+        self.n_reels = len(self.reels)
+        self.payout_table = compile_payout_table(payouts, self.n_reels)
+
+    def combo_index(self, symbol_ids: Sequence[int]) -> int:
+        index = 0
+        for symbol_id in symbol_ids:
+            index = index * N_SYMBOLS + symbol_id
+        return index
+
+    def spin(self, uniform=random.random) -> List[SlotSymbol]:
+        """Один спин: по символу на каждый барабан"""
+        return [SYMBOLS[reel.sample(uniform)] for reel in self.reels]
+
+    def multiplier(self, symbols: Sequence[SlotSymbol]) -> float:
+        return float(self.payout_table[self.combo_index([SYMBOL_IDS[s] for s in symbols])])
+
+    def spin_batch(self, rng: np.random.Generator, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Пачка спинов: (id символов shape (size, reels), множители shape (size,))"""
+        ids = np.stack([reel.sample_batch(rng, size) for reel in self.reels], axis=1)
+        combo = np.zeros(size, dtype=np.int64)
+        for r in range(self.n_reels):
+            combo = combo * N_SYMBOLS + ids[:, r]
+        return ids, self.payout_table[combo]
+
+    def exact_rtp(self) -> float:
+        """Теоретический RTP по весам барабанов"""
+        probs = np.ones(1)
+        for reel in self.reels:
+            probs = np.outer(probs, reel.probabilities).ravel()
+        return float(np.dot(probs, self.payout_table))
+
+
+def compile_payout_table(payouts: Dict[Tuple[SlotSymbol, ...], float], n_reels: int) -> np.ndarray:
+    """Плотная таблица множителей, индекс = комбинация id символов в системе счисления N_SYMBOLS"""
+    table = np.zeros(N_SYMBOLS ** n_reels, dtype=np.float64)
+    for combo, multiplier in payouts.items():
+        if len(combo) != n_reels:
+            raise ValueError(f"Payout combination {combo} does not match {n_reels} reels")
+        index = 0
+        for symbol in combo:
+            index = index * N_SYMBOLS + SYMBOL_IDS[symbol]
+        table[index] = multiplier
+    return table
+
+
+def _machine_from_config(name: str, config: dict) -> SlotMachine:
+    if len(config["reels"]) != 3:
+        raise ValueError(f"Slot machine {name} must have 3 reels")
+    reel_weights = [
+        {SlotSymbol(symbol): float(weight) for symbol, weight in reel.items()}
+        for reel in config["reels"]
+    ]
+    payouts = {
+        tuple(SlotSymbol(s) for s in rule["symbols"]): float(rule["multiplier"])
+        for rule in config["payouts"]
+    } if "payouts" in config else CLASSIC_PAYOUTS
+    return SlotMachine(name, reel_weights, payouts)
+
+
+def load_machines(path: Optional[str] = None) -> Dict[str, SlotMachine]:
+    """Классическая машина (равные веса, как раньше) + машины из JSON-файла"""
+    uniform = {symbol: 1.0 for symbol in SYMBOLS}
+    machines = {"classic": SlotMachine("classic", [uniform, uniform, uniform], CLASSIC_PAYOUTS)}
+
+    path = path or os.getenv("SLOT_MACHINES_FILE")
+    if path:
+        with open(path) as f:
+            for name, config in json.load(f).items():
+                machines[name] = _machine_from_config(name, config)
+    return machines
+
+
+MACHINES = load_machines()
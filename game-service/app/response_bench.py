@@ -0,0 +1,80 @@
+"""Стоимость сериализации одного ответа горячих эндпоинтов.
+
+Сравнивает стандартный путь FastAPI (модель с валидацией в эндпоинте,
+повторная проверка по response_model, jsonable_encoder, json.dumps) с
+быстрым путем игровых роутеров: тело ответа собирается словарем из
+атрибутов игры и сразу отдается через ORJSONResponse.
+
+    python -m app.response_bench --n 20000
+"""
+import time
+import asyncio
+import argparse
+from datetime import datetime
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from .database import BlackjackGame, BlackjackGameStatus
+from .blackjack import BlackjackGameResponse, game_payload
+
+
+def _sample_game() -> BlackjackGame:
+    return BlackjackGame(
+        id=1, user_id=42, bet_amount=10.0, status=BlackjackGameStatus.PLAYER_TURN,
+        player_cards=["10", "A", "5"], player_score=16, dealer_cards=["K", "?"], dealer_score=10,
+        win_amount=0.0, is_winner=False, is_push=False, created_at=datetime.utcnow()
+    )
+
+
+def benchmark(n: int) -> dict:
+    """Микросекунд на ответ для каждого пути"""
+    game = _sample_game()
+    response_field = create_response_field(name="response", type_=BlackjackGameResponse, mode="serialization")
+
+    async def standard():
+        model = BlackjackGameResponse(
+            id=game.id, user_id=game.user_id, bet_amount=game.bet_amount, status=game.status.value,
+            player_cards=game.player_cards, player_score=game.player_score,
+            dealer_cards=game.dealer_cards, dealer_score=game.dealer_score,
+            win_amount=game.win_amount, is_winner=game.is_winner, is_push=game.is_push,
+            created_at=game.created_at
+        )
+        content = await serialize_response(field=response_field, response_content=model)
+        return JSONResponse(content).body
+
+    async def model_construct():
+        model = BlackjackGameResponse.model_construct(**game_payload(game))
+        return ORJSONResponse(model.model_dump()).body
+
+    async def payload():
+        return ORJSONResponse(game_payload(game)).body
+
+    async def per_response(fn) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            await fn()
+        return (time.perf_counter() - started) / n * 1e6
+
+    async def run():
+        return {
+            "model + response_model + json": await per_response(standard),
+            "model_construct + orjson": await per_response(model_construct),
+            "payload dict + orjson": await per_response(payload),
+        }
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization benchmark")
+    parser.add_argument("--n", type=int, default=20000)
+    args = parser.parse_args()
+
+    for name, micros in benchmark(args.n).items():
+        print(f"{name:<32} {micros:>8.1f} us/response")
+
+
+if __name__ == "__main__":
+    main()
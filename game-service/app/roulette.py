@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException,Header
+from fastapi import APIRouter, Depends, HTTPException,Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict  # ← ДОБАВЬ Dict СЮДА!
 from datetime import datetime
-import random
+import asyncio
+import json
+import time
 import httpx
 
-from .database import get_db
+from .database import get_async_db, RouletteGameStatus as GameStatus
 from .dependencies import get_current_user_id
-from .game_manager import GameManager
+from .game_manager import create_game_manager
+from .table_feed import create_table_feed, table_channel, game_channel
+from .table_stats import create_table_stats
+from . import bet_buffer
+from .roulette_bets import InvalidBetError, build_bet_mask, number_color, settle_round_sql
+from . import leaderboard, history
+from .transitions import transition, TransitionConflict
+from .outcomes import outcomes, seed_chains, hash_seed, commit_seed, roulette_number, verify_seed
 
 # ===== СХЕМЫ PYDANTIC =====
 from pydantic import BaseModel
@@ -36,15 +48,19 @@ class RouletteGameResponse(BaseModel):
     created_at: datetime
     started_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
+    server_seed_hash: Optional[str] = None  # Обязательство по сиду раунда, известно до ставок
     current_bets: List[RouletteBetResponse] = []
 
 # ===== РОУТЕР =====
 router = APIRouter(prefix="/roulette", tags=["roulette"])
+# Полный возврат на единицу ставки, включая саму ставку: выигрыш кредитуется
+# как amount * multiplier. Классика 35:1 / 17:1 / 11:1 / 8:1 / 1:1 / 2:1 - это
+# 36 / 18 / 12 / 9 / 2 / 3 здесь; у любой ставки covered * multiplier = 36
 PAYOUT_MULTIPLIERS = {
-    "straight": 35,
-    "split": 17, 
-    "street": 11,
-    "corner": 8,
+    "straight": 36,
+    "split": 18,
+    "street": 12,
+    "corner": 9,
     "red": 2,
     "black": 2,
     "even": 2,
@@ -55,94 +71,146 @@ PAYOUT_MULTIPLIERS = {
     "column": 3
 }
 # Менеджер игр
-game_manager = GameManager()
+game_manager = create_game_manager()
+# Подписки клиентов на события столов и игр
+table_feed = create_table_feed()
+# Горячие/холодные числа столов, обновляются на каждом спине
+table_stats = create_table_stats()
 WALLET_SERVICE_URL = "http://wallet-service:8000"
+PAYOUT_CONCURRENCY = 50
+
+def feed_channels(game_id: int, table_id: Optional[str]) -> List[str]:
+    channels = [game_channel(game_id)]
+    if table_id is not None:
+        channels.append(table_channel(table_id))
+    return channels
+
+async def assign_fair_seed(game):
+    """Выдает раунду сид из хеш-цепочки; игроки видят только обязательство по нему до спина"""
+    anchor, index, seed = await seed_chains.next_seed()
+    game.server_seed = seed.hex()
+    game.server_seed_hash = commit_seed(seed).hex()
+    game.seed_chain_anchor = anchor.hex()
+    game.seed_chain_index = index
 
 @router.post("/games", response_model=RouletteGameResponse)
 async def create_game(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Создает новую игру в рулетку"""
     from .database import RouletteGame
     
-    game = RouletteGame()
+    game = RouletteGame(user_id=user_id)
+    await assign_fair_seed(game)
     db.add(game)
-    db.commit()
-    db.refresh(game)
-    
-    game_manager.add_game(game.id)
-    
-    # ВАЖНО: конвертируем Enum в строку!
-    return RouletteGameResponse(
-        id=game.id,
-        status=game.status.value if game.status else "waiting",  # ← .value ДЛЯ СТРОКИ!
-        winning_number=game.winning_number,
-        winning_color=game.winning_color,
-        created_at=game.created_at,
-        started_at=game.started_at,
-        finished_at=game.finished_at,
-        current_bets=[]
-    )
+    await db.commit()
+    
+    await game_manager.add_game(game.id)
+    
+    return ORJSONResponse(game_payload(game))
 
 @router.get("/games/{game_id}", response_model=RouletteGameResponse)
 async def get_game(
     game_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получает информацию об игре"""
     from .database import RouletteGame, RouletteBet
     
-    game = db.query(RouletteGame).filter(RouletteGame.id == game_id).first()
+    game = await db.get(RouletteGame, game_id)
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    
+    bets = (await db.execute(select(RouletteBet).where(RouletteBet.game_id == game_id))).scalars().all()
+    return ORJSONResponse(game_payload(game, bets))
+
+@router.get("/games/{game_id}/fairness")
+async def get_game_fairness(
+    game_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Данные для проверки честности раунда.
+
+    Сид раскрывается после спина и только если сыграны все раунды цепочки
+    с меньшими номерами: из сида хешированием получаются их сиды.
+    """
+    from sqlalchemy import func
+    from .database import RouletteGame, RouletteGameStatus
+    
+    game = await db.get(RouletteGame, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
+    if not game.server_seed_hash:
+        raise HTTPException(status_code=404, detail="Game has no fairness seed")
     
-    bets = db.query(RouletteBet).filter(RouletteBet.game_id == game_id).all()
-    
-    # Конвертируем ставки
-    bet_responses = []
-    for bet in bets:
-        bet_responses.append(RouletteBetResponse(
-            id=bet.id,
-            game_id=bet.game_id,
-            bet_type=bet.bet_type.value if bet.bet_type else "",  # ← .value ДЛЯ СТРОКИ!
-            numbers=bet.numbers or [],
-            amount=bet.amount or 0.0,
-            payout_multiplier=bet.payout_multiplier or 1.0,
-            created_at=bet.created_at,
-            is_winner=bet.is_winner,
-            payout_amount=bet.payout_amount
-        ))
-    
-    return RouletteGameResponse(
-        id=game.id,
-        status=game.status.value if game.status else "waiting",  # ← .value ДЛЯ СТРОКИ!
-        winning_number=game.winning_number,
-        winning_color=game.winning_color,
-        created_at=game.created_at,
-        started_at=game.started_at,
-        finished_at=game.finished_at,
-        current_bets=bet_responses
-    )
+    result = {
+        "game_id": game.id,
+        "server_seed_hash": game.server_seed_hash,
+        "seed_chain_anchor": game.seed_chain_anchor,
+        "seed_chain_index": game.seed_chain_index,
+        "server_seed": None,
+        "winning_number": game.winning_number,
+        "verified": None,
+        "reveal_pending": False
+    }
+    if game.status != RouletteGameStatus.FINISHED:
+        return result
+    
+    earlier_open = await db.scalar(select(func.count(RouletteGame.id)).where(
+        RouletteGame.seed_chain_anchor == game.seed_chain_anchor,
+        RouletteGame.seed_chain_index < game.seed_chain_index,
+        RouletteGame.status != RouletteGameStatus.FINISHED
+    ))
+    if earlier_open:
+        result["reveal_pending"] = True
+    else:
+        seed = bytes.fromhex(game.server_seed)
+        result["server_seed"] = game.server_seed
+        result["verified"] = (
+            # Старые раунды публиковали sha256(seed) - для них проверяется он
+            game.server_seed_hash in (commit_seed(seed).hex(), hash_seed(seed).hex())
+            and verify_seed(seed, bytes.fromhex(game.seed_chain_anchor), game.seed_chain_index)
+            and roulette_number(seed, game.id) == game.winning_number
+        )
+    return result
+
+@router.get("/fairness/anchors")
+async def get_fairness_anchors():
+    """Якоря цепочек сидов, от старых к новым: сид любого раунда хешируется в якорь своей цепочки"""
+    return {"anchors": [anchor.hex() for anchor in await seed_chains.anchors()]}
 
 @router.post("/games/{game_id}/bet", response_model=RouletteBetResponse)
 async def place_bet(
     game_id: int,
     bet_data: RouletteBetPlace,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id),
     authorization: str = Header(..., alias="Authorization")
 ):
     """Размещает ставку в игре"""
-    from .database import RouletteGame, RouletteBet, RouletteBetType
+    from .database import RouletteGame, RouletteBet, RouletteBetType, RouletteGameStatus
     
-    game = db.query(RouletteGame).filter(RouletteGame.id == game_id).first()
+    game = await db.get(RouletteGame, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
+    if game.status not in (RouletteGameStatus.WAITING, RouletteGameStatus.ACCEPTING_BETS) \
+            or await bet_buffer.is_closed(game_id):
+        raise HTTPException(status_code=400, detail="Bets are closed for this game")
+    
     if bet_data.amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be positive")
     
+    # Проверяем ставку по раскладке стола ДО списания денег
+    try:
+        bet_type_enum = RouletteBetType(bet_data.bet_type)
+        coverage_mask = build_bet_mask(bet_type_enum, bet_data.numbers)
+    except InvalidBetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid bet type")
+    
     # 1. Снимаем деньги через Wallet Service
     async with httpx.AsyncClient() as client:
         try:
@@ -191,199 +259,431 @@ async def place_bet(
         print(f"Analytics tracking failed: {str(e)}")
         # НЕ ПОДНИМАЕМ ОШИБКУ - аналитика не должна ломать основную функциональность
 
-    # 3. Создаем ставку в БД
+    # 3. Кладем ставку в буфер раунда - в БД ее допишет фоновый flush
+    bet = {
+        "id": await bet_buffer.bet_ids.allocate(),
+        "game_id": game_id,
+        "user_id": user_id,
+        "bet_type": bet_type_enum.value,
+        "numbers": bet_data.numbers,
+        "amount": bet_data.amount,
+        "payout_multiplier": PAYOUT_MULTIPLIERS.get(bet_data.bet_type, 1.0),
+        "coverage_mask": coverage_mask,
+        "created_at": datetime.utcnow().isoformat()
+    }
+    
+    if not await bet_buffer.buffer_bet(bet):
+        # Раунд закрылся, пока списывали деньги - возвращаем ставку
+        await refund_bet(authorization, bet_data.amount)
+        raise HTTPException(status_code=400, detail="Bets are closed for this game")
+    await game_manager.add_player_to_game(game_id, user_id)
+    
+    # Дельта для подписчиков стола вместо опроса игры со всеми ставками
     try:
-        bet_type_enum = RouletteBetType(bet_data.bet_type)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid bet type")
+        await table_feed.publish(feed_channels(game_id, game.table_id), {
+            "type": "bet_accepted",
+            "game_id": game_id,
+            "table_id": game.table_id,
+            "bet": {key: bet[key] for key in ("id", "user_id", "bet_type", "numbers", "amount", "created_at")}
+        })
+    except Exception as e:
+        print(f"Table feed publish failed: {str(e)}")
     
-    bet = RouletteBet(
-        game_id=game_id,
-        user_id=user_id,
-        bet_type=bet_type_enum,
-        numbers=bet_data.numbers,
-        amount=bet_data.amount,
-        payout_multiplier = PAYOUT_MULTIPLIERS.get(bet_data.bet_type, 1.0)
-    )
-    
-    db.add(bet)
-    db.commit()
-    db.refresh(bet)
-    
-    return RouletteBetResponse(
-        id=bet.id,
-        game_id=bet.game_id,
-        bet_type=bet.bet_type.value,
-        numbers=bet.numbers or [],
-        amount=bet.amount or 0.0,
-        payout_multiplier=bet.payout_multiplier or 1.0,
-        created_at=bet.created_at,
-        is_winner=bet.is_winner,
-        payout_amount=bet.payout_amount
-    )
+    return ORJSONResponse({
+        "id": bet["id"],
+        "game_id": game_id,
+        "bet_type": bet["bet_type"],
+        "numbers": bet_data.numbers,
+        "amount": bet_data.amount,
+        "payout_multiplier": bet["payout_multiplier"],
+        "created_at": bet["created_at"],
+        "is_winner": None,
+        "payout_amount": None
+    })
+
+async def refund_bet(authorization: str, amount: float):
+    """Возвращает списанную ставку на кошелек"""
+    async with httpx.AsyncClient() as client:
+        try:
+            await client.post(
+                f"{WALLET_SERVICE_URL}/graphql",
+                json={
+                    "query": f"""
+                    mutation {{
+                        createTransaction(type: "win", amount: {amount}) {{
+                            ... on TransactionSuccess {{
+                                transaction {{ id amount }}
+                            }}
+                            ... on TransactionError {{
+                                message
+                            }}
+                        }}
+                    }}
+                    """
+                },
+                headers={"Authorization": authorization}
+            )
+        except Exception as e:
+            print(f"Error refunding bet: {str(e)}")
+
+ACTIVE_STATUSES = ("waiting", "accepting_bets", "no_more_bets", "spinning")
+# Из этих статусов раунд можно рассчитать
+UNFINISHED_STATUSES = [GameStatus(status) for status in ACTIVE_STATUSES]
+MAX_GAMES_PAGE = 100
+
+def encode_games_cursor(game) -> str:
+    return f"{game.created_at.isoformat()}|{game.id}"
+
+def decode_games_cursor(cursor: str):
+    try:
+        created_at, game_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(game_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def bet_to_dict(bet) -> dict:
+    return {
+        "id": bet.id,
+        "game_id": bet.game_id,
+        "bet_type": bet.bet_type.value if bet.bet_type else "unknown",
+        "numbers": bet.numbers or [],
+        "amount": float(bet.amount) if bet.amount else 0.0,
+        "payout_multiplier": float(bet.payout_multiplier) if bet.payout_multiplier else 1.0,
+        "created_at": bet.created_at.isoformat() if bet.created_at else None,
+        "is_winner": bet.is_winner,
+        "payout_amount": float(bet.payout_amount) if bet.payout_amount is not None else None
+    }
+
+def game_payload(game, bets=()) -> dict:
+    """Тело RouletteGameResponse прямо из атрибутов игры - отдается через ORJSONResponse без валидации"""
+    return {
+        "id": game.id,
+        "status": game.status.value if game.status else "waiting",
+        "winning_number": game.winning_number,
+        "winning_color": game.winning_color,
+        "created_at": game.created_at,
+        "started_at": game.started_at,
+        "finished_at": game.finished_at,
+        "server_seed_hash": game.server_seed_hash,
+        "current_bets": [bet_to_dict(bet) for bet in bets]
+    }
+
 @router.get("/games")
-async def get_active_games_fixed(db: Session = Depends(get_db)):
-    """Получает список активных игр - исправленная версия для KrakenD"""
-    from .database import RouletteGame, RouletteBet
+async def get_active_games_fixed(
+    status: str = Query("active", description="active, all или конкретный статус игры"),
+    limit: int = Query(20, ge=1, le=MAX_GAMES_PAGE),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+    bets: str = Query("full", pattern="^(full|summary|none)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Получает список активных игр - исправленная версия для KrakenD.
+    
+    Keyset-пагинация по (created_at, id), ставки всех игр страницы
+    грузятся одним запросом (или только количество и сумма - bets=summary).
+    """
+    from sqlalchemy import func, tuple_
+    from .database import RouletteGame, RouletteBet, RouletteGameStatus
     
-    games = db.query(RouletteGame).all()
+    query = select(RouletteGame)
+    if status == "active":
+        query = query.where(RouletteGame.status.in_([RouletteGameStatus(s) for s in ACTIVE_STATUSES]))
+    elif status != "all":
+        try:
+            query = query.where(RouletteGame.status == RouletteGameStatus(status))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid status")
+    
+    if cursor:
+        cursor_created_at, cursor_id = decode_games_cursor(cursor)
+        query = query.where(tuple_(RouletteGame.created_at, RouletteGame.id) < (cursor_created_at, cursor_id))
+    
+    games = (await db.execute(
+        query.order_by(RouletteGame.created_at.desc(), RouletteGame.id.desc()).limit(limit + 1)
+    )).scalars().all()
+    has_more = len(games) > limit
+    games = games[:limit]
+    game_ids = [game.id for game in games]
+    
+    # Ставки всех игр страницы - один запрос вместо запроса на каждую игру
+    bets_by_game: Dict[int, list] = {game_id: [] for game_id in game_ids}
+    summary_by_game: Dict[int, dict] = {}
+    if game_ids and bets == "full":
+        page_bets = await db.execute(
+            select(RouletteBet).where(RouletteBet.game_id.in_(game_ids)).order_by(RouletteBet.id)
+        )
+        for bet in page_bets.scalars():
+            bets_by_game[bet.game_id].append(bet_to_dict(bet))
+    elif game_ids and bets == "summary":
+        rows = (await db.execute(
+            select(
+                RouletteBet.game_id,
+                func.count(RouletteBet.id),
+                func.coalesce(func.sum(RouletteBet.amount), 0.0)
+            ).where(RouletteBet.game_id.in_(game_ids)).group_by(RouletteBet.game_id)
+        )).all()
+        summary_by_game = {game_id: {"bet_count": count, "bet_total": float(total)}
+                           for game_id, count, total in rows}
     
     game_list = []
     for game in games:
-        bets = db.query(RouletteBet).filter(RouletteBet.game_id == game.id).all()
-        
-        bet_list = []
-        for bet in bets:
-            bet_list.append({
-                "id": bet.id,
-                "game_id": bet.game_id,
-                "bet_type": bet.bet_type.value if bet.bet_type else "unknown",
-                "numbers": bet.numbers or [],
-                "amount": float(bet.amount) if bet.amount else 0.0,
-                "payout_multiplier": float(bet.payout_multiplier) if bet.payout_multiplier else 1.0,
-                "created_at": bet.created_at.isoformat() if bet.created_at else None,
-                "is_winner": bet.is_winner,
-                "payout_amount": float(bet.payout_amount) if bet.payout_amount else None
-            })
-        
-        game_list.append({
+        item = {
             "id": game.id,
             "status": game.status.value if game.status else "waiting",
+            "table_id": game.table_id,
             "winning_number": game.winning_number,
             "winning_color": game.winning_color,
             "created_at": game.created_at.isoformat() if game.created_at else None,
             "started_at": game.started_at.isoformat() if game.started_at else None,
-            "finished_at": game.finished_at.isoformat() if game.finished_at else None,
-            "current_bets": bet_list
-        })
+            "finished_at": game.finished_at.isoformat() if game.finished_at else None
+        }
+        if bets == "full":
+            item["current_bets"] = bets_by_game[game.id]
+        elif bets == "summary":
+            item.update(summary_by_game.get(game.id, {"bet_count": 0, "bet_total": 0.0}))
+        game_list.append(item)
     
     # Ключевое исправление: возвращаем объект, а не массив
     return {
         "success": True,
         "games": game_list,
-        "count": len(game_list)
+        "count": len(game_list),
+        "next_cursor": encode_games_cursor(games[-1]) if has_more else None
+    }
+
+async def pay_winner(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, bet: dict):
+    """Зачисляет выигрыш на кошелек и отправляет уведомление"""
+    async with semaphore:
+        try:
+            await client.post(
+                f"{WALLET_SERVICE_URL}/graphql",
+                json={
+                    "query": f"""
+                    mutation {{
+                        createTransaction(type: "win", amount: {bet['payout']}) {{
+                            ... on TransactionSuccess {{
+                                transaction {{ id amount }}
+                            }}
+                            ... on TransactionError {{
+                                message
+                            }}
+                        }}
+                    }}
+                    """
+                },
+                headers={"Authorization": f"Bearer {bet['user_id']}"}
+            )
+            print(f"Payout successful for user {bet['user_id']}: {bet['payout']}")
+        except Exception as e:
+            print(f"Error processing payout for user {bet['user_id']}: {str(e)}")
+        
+        try:
+            await client.post(
+                "http://notification-service:8005/notifications/trigger/win",
+                json={
+                    "user_id": bet["user_id"],
+                    "amount": bet["payout"],
+                    "game_type": "roulette"
+                }
+            )
+        except Exception as e:
+            print(f"Notification service error: {str(e)}")
+
+def round_results(db: Session, game_id: int) -> Dict[int, float]:
+    """Чистый результат игроков раунда: выплаты минус ставки"""
+    from sqlalchemy import func
+    from .database import RouletteBet
+    
+    rows = db.query(
+        RouletteBet.user_id,
+        func.sum(func.coalesce(RouletteBet.payout_amount, 0.0) - RouletteBet.amount)
+    ).filter(RouletteBet.game_id == game_id).group_by(RouletteBet.user_id).all()
+    return {user_id: float(net or 0.0) for user_id, net in rows}
+
+async def finish_round(db: AsyncSession, game) -> dict:
+    """Крутит колесо, рассчитывает ставки раунда и выплачивает выигрыши.
+
+    Раунд забирается охраняемым переходом в FINISHED: если его уже
+    рассчитал другой запрос или воркер - TransitionConflict, и ни расчет,
+    ни выплаты не повторяются.
+    """
+    from .database import RouletteGame, RouletteGameStatus
+    
+    game_id = game.id
+    # Крутим рулетку - число воспроизводимо по сиду раунда (старые игры без сида - CSPRNG)
+    if game.server_seed:
+        winning_number = roulette_number(bytes.fromhex(game.server_seed), game_id)
+    else:
+        winning_number = outcomes.randint(0, 36)
+    winning_color = number_color(winning_number)
+    
+    # Забираем раунд: условный UPDATE проходит только у одного из конкурентов,
+    # блокировка строки держится до коммита вместе с расчетом ставок
+    finished_at = datetime.utcnow()
+    await transition(db, RouletteGame, game_id, UNFINISHED_STATUSES, {
+        RouletteGame.status: RouletteGameStatus.FINISHED,
+        RouletteGame.winning_number: winning_number,
+        RouletteGame.winning_color: winning_color,
+        RouletteGame.finished_at: finished_at
+    }, version=game.version)
+    
+    # Закрываем буфер и дописываем все принятые ставки до расчета
+    await bet_buffer.close_round(game_id)
+    await bet_buffer.flush_game(game_id, wait=True)
+    
+    # Рассчитываем все ставки одним UPDATE, выигравшие - через RETURNING
+    winners = await db.run_sync(settle_round_sql, game_id, winning_number)
+    await db.commit()
+    await game_manager.remove_game(game_id)
+    
+    # Лидерборд: чистый результат каждого игрока раунда одним pipeline,
+    # история: первые страницы всех игроков раунда одним DEL
+    try:
+        results = await db.run_sync(round_results, game_id)
+        await leaderboard.record_many("roulette", results, at=finished_at)
+        await history.invalidate_first_page(*results)
+    except Exception as e:
+        print(f"Leaderboard update failed: {str(e)}")
+    
+    # Выплачиваем выигрыши параллельно, с ограничением числа запросов
+    winning_bets = [{
+        "id": bet.id,
+        "user_id": bet.user_id,
+        "amount": float(bet.amount),
+        "payout": float(bet.payout_amount),
+        "bet_type": bet.bet_type.value
+    } for bet in winners if bet.payout_amount and bet.payout_amount > 0]
+    total_payout = sum(bet["payout"] for bet in winning_bets)
+    
+    semaphore = asyncio.Semaphore(PAYOUT_CONCURRENCY)
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        await asyncio.gather(*(pay_winner(client, semaphore, bet) for bet in winning_bets))
+    
+    result = {
+        "success": True,
+        "game_id": game_id,
+        "winning_number": winning_number,
+        "winning_color": winning_color,
+        "total_payout": float(total_payout),
+        "winning_bets": winning_bets,
+        "message": f"Roulette spun! Winning number: {winning_number} ({winning_color})"
     }
+    stats = None
+    if game.table_id is not None:
+        try:
+            await table_stats.record(game.table_id, winning_number)
+            stats = await table_stats.snapshot(game.table_id)
+        except Exception as e:
+            print(f"Table stats update failed: {str(e)}")
+    try:
+        await table_feed.publish(feed_channels(game_id, game.table_id), {
+            "type": "round_result",
+            "table_id": game.table_id,
+            **{key: result[key] for key in ("game_id", "winning_number", "winning_color", "total_payout", "winning_bets")},
+            "stats": stats
+        })
+    except Exception as e:
+        print(f"Table feed publish failed: {str(e)}")
+    return result
 
 @router.post("/games/{game_id}/spin")
 async def spin_roulette(
     game_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Крутит рулетку, определяет победителя и выплачивает выигрыши"""
-    from .database import RouletteGame, RouletteBet, RouletteBetType, RouletteGameStatus
+    from .database import RouletteGame, RouletteGameStatus
     
     # Находим игру
-    game = db.query(RouletteGame).filter(RouletteGame.id == game_id).first()
+    game = await db.get(RouletteGame, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
+    # Раунды общих столов крутит только планировщик
+    if game.table_id is not None:
+        raise HTTPException(status_code=403, detail="Table rounds are spun by the table scheduler")
+    
+    # Личную игру крутит только ее владелец
+    if game.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Only the game owner can spin it")
+    
     # Проверяем что игра еще не завершена
     if game.status == RouletteGameStatus.FINISHED:
         raise HTTPException(status_code=400, detail="Game already finished")
     
-    # Крутим рулетку - генерируем выигрышное число
-    winning_number = random.randint(0, 36)
-    winning_color = "green" if winning_number == 0 else "red" if winning_number in [1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36] else "black"
-    
-    # Обновляем игру - используем Enum, а не строку!
-    game.winning_number = winning_number
-    game.winning_color = winning_color
-    game.status = RouletteGameStatus.FINISHED  # ← ИСПОЛЬЗУЕМ ENUM!
-    
-    # Находим все ставки для этой игры
-    bets = db.query(RouletteBet).filter(RouletteBet.game_id == game_id).all()
-    
-    # Обрабатываем ставки и выплачиваем выигрыши
-    total_payout = 0
-    winning_bets = []
-    
-    for bet in bets:
-        is_winner = False
-        payout_amount = 0
-        
-        # Проверяем выиграла ли ставка
-        if bet.bet_type == RouletteBetType.STRAIGHT:
-            is_winner = winning_number in (bet.numbers or [])
-            payout_amount = bet.amount * 35 if is_winner else 0
-            
-        elif bet.bet_type == RouletteBetType.RED:
-            is_winner = winning_color == "red"
-            payout_amount = bet.amount * 2 if is_winner else 0
-            
-        elif bet.bet_type == RouletteBetType.BLACK:
-            is_winner = winning_color == "black" 
-            payout_amount = bet.amount * 2 if is_winner else 0
-            
-        elif bet.bet_type == RouletteBetType.EVEN:
-            is_winner = winning_number % 2 == 0 and winning_number != 0
-            payout_amount = bet.amount * 2 if is_winner else 0
-            
-        elif bet.bet_type == RouletteBetType.ODD:
-            is_winner = winning_number % 2 == 1
-            payout_amount = bet.amount * 2 if is_winner else 0
-            
-        # Обновляем ставку
-        bet.is_winner = is_winner
-        bet.payout_amount = payout_amount
-        
-        if is_winner:
-            total_payout += payout_amount
-            winning_bets.append({
-                "id": bet.id,
-                "user_id": bet.user_id,
-                "amount": float(bet.amount),
-                "payout": float(payout_amount),
-                "bet_type": bet.bet_type.value
-            })
-            
-            # Выплачиваем выигрыш на кошелек
-            async with httpx.AsyncClient() as client:
-                try:
-                    wallet_response = await client.post(
-                        f"{WALLET_SERVICE_URL}/graphql",
-                        json={
-                            "query": f"""
-                            mutation {{
-                                createTransaction(type: "win", amount: {payout_amount}) {{
-                                    ... on TransactionSuccess {{
-                                        transaction {{ id amount }}
-                                    }}
-                                    ... on TransactionError {{
-                                        message
-                                    }}
-                                }}
-                            }}
-                            """
-                        },
-                        headers={"Authorization": f"Bearer {bet.user_id}"}
-                    )
-                    print(f"Payout successful for user {bet.user_id}: {payout_amount}") 
-                except Exception as e:
-                    print(f"Error processing payout for user {bet.user_id}: {str(e)}")
-                # После определения выигрыша в рулетке
-            try:
-                async with httpx.AsyncClient() as client:
-                    await client.post(
-                        "http://notification-service:8005/notifications/trigger/win",
-                        json={
-                            "user_id": bet.user_id,
-                            "amount": payout_amount, 
-                            "game_type": "roulette"
-                        }
-                    )
-            except Exception as e:
-                print(f"Notification service error: {str(e)}")
-    db.commit()
-    
+    try:
+        return await finish_round(db, game)
+    except TransitionConflict:
+        # Игру одновременно рассчитал другой запрос - выплаты уже сделаны им
+        raise HTTPException(status_code=409, detail="Game is being settled by another request")
+
+@router.get("/tables")
+async def get_tables():
+    """Общие столы и их текущие раунды"""
+    tables = [await table_state(table) for table in (await game_manager.get_tables()).values()]
+    return {"success": True, "tables": tables, "count": len(tables)}
+
+@router.get("/tables/{table_id}")
+async def get_table(table_id: str):
+    """Текущий раунд стола: в него и нужно ставить через /games/{game_id}/bet"""
+    table = await game_manager.get_table(table_id)
+    if not table:
+        raise HTTPException(status_code=404, detail="Table not found")
+    return await table_state(table)
+
+@router.get("/tables/{table_id}/stats")
+async def get_table_stats(table_id: str):
+    """Горячие и холодные числа стола по последним спинам - из кэша, без БД"""
+    return ORJSONResponse(await table_stats.snapshot(table_id))
+
+async def table_state(table: dict) -> dict:
+    players = await game_manager.get_game_players(table["game_id"])
     return {
-        "success": True,
-        "winning_number": winning_number,
-        "winning_color": winning_color,
-        "total_payout": float(total_payout),
-        "winning_bets": winning_bets,
-        "message": f"Roulette spun! Winning number: {winning_number} ({winning_color})"
+        **table,
+        "seconds_left": max(table["phase_ends_at"] - time.time(), 0.0),
+        "players": len(players)
+    }
+
+async def _follow_feed(websocket: WebSocket, channel: str, snapshot: dict):
+    """Держит подписку: снимок при подключении, дальше только рассылка"""
+    await table_feed.connect(websocket, channel)
+    try:
+        await websocket.send_text(json.dumps(snapshot, default=str))
+        while True:
+            # Входящие сообщения не нужны - ждем отключения клиента
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        table_feed.disconnect(websocket, channel)
+
+@router.websocket("/ws/tables/{table_id}")
+async def table_websocket(websocket: WebSocket, table_id: str):
+    """События общего стола: фазы раундов, принятые ставки, результаты спинов"""
+    table = await game_manager.get_table(table_id)
+    snapshot = {
+        "type": "snapshot",
+        "table_id": table_id,
+        "table": await table_state(table) if table else None,
+        "stats": await table_stats.snapshot(table_id)
     }
+    await _follow_feed(websocket, table_channel(table_id), snapshot)
+
+@router.websocket("/ws/games/{game_id}")
+async def game_websocket(websocket: WebSocket, game_id: int):
+    """События одной игры: принятые ставки и результат спина"""
+    from .database import AsyncSessionLocal, RouletteGame
+    
+    async with AsyncSessionLocal() as db:
+        game = await db.get(RouletteGame, game_id)
+    snapshot = {
+        "type": "snapshot",
+        "game_id": game_id,
+        "status": game.status.value if game and game.status else None,
+        "winning_number": game.winning_number if game else None
+    }
+    await _follow_feed(websocket, game_channel(game_id), snapshot)
+
 @router.get("/test")
 async def roulette_test():
     return {"message": "Roulette is working!"}
\ No newline at end of file
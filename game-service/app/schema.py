@@ -0,0 +1,85 @@
+"""Доводка схемы существующей базы до моделей.
+
+create_all создает только недостающие таблицы: новые колонки и индексы
+уже существующих таблиц он не трогает, и база, созданная до них, ломает
+каждый запрос, который их читает. Здесь - идемпотентные шаги, которые
+main.py выполняет при старте сразу после create_all:
+
+  * недостающие колонки добавляются по списку ADDED_COLUMNS. version
+    сразу NOT NULL DEFAULT 0 - у старых игр счетчик переходов с нуля,
+    machine у старых спинов - classic, остальные колонки у старых строк
+    NULL, как у игр, сыгранных до соответствующей функции;
+  * недостающие индексы моделей создаются по Base.metadata.
+
+На Postgres шаги идут под advisory lock транзакции: воркеры, стартующие
+одновременно, не добавляют одну колонку дважды. Индексы на больших
+таблицах строятся с блокировкой записи - крупную базу лучше довести
+заранее вручную:
+
+    python -m app.schema
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_LOCK_ID = 7_420_046  # Ключ pg_advisory_xact_lock доводки схемы
+
+# Колонки, появившиеся в уже существующих таблицах: (таблица, колонка, DDL)
+ADDED_COLUMNS = [
+    ("roulette_games", "table_id", "VARCHAR"),
+    ("roulette_games", "user_id", "INTEGER"),
+    ("roulette_games", "server_seed", "VARCHAR"),
+    ("roulette_games", "server_seed_hash", "VARCHAR"),
+    ("roulette_games", "seed_chain_anchor", "VARCHAR"),
+    ("roulette_games", "seed_chain_index", "INTEGER"),
+    ("roulette_games", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ("roulette_bets", "coverage_mask", "BIGINT"),
+    ("slot_games", "machine", "VARCHAR DEFAULT 'classic'"),
+    ("slot_games", "grid", "BIGINT"),
+    ("blackjack_games", "version", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+def _add_missing_columns(conn: Connection):
+    inspector = inspect(conn)
+    for table, column, ddl in ADDED_COLUMNS:
+        if column in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        logger.info(f"Added column {table}.{column}")
+
+
+def _create_missing_indexes(conn: Connection):
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                logger.info(f"Created index {index.name}")
+
+
+def upgrade_schema(engine: Engine):
+    """Идемпотентно доводит существующие таблицы до моделей; одна транзакция"""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_ID})
+        _add_missing_columns(conn)
+        _create_missing_indexes(conn)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from .database import engine
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    print("Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,63 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+import asyncio
 import httpx
+from sqlalchemy import insert, select
 
-from .database import get_db, SlotGame, SlotSymbol
-from .dependencies import get_current_user_id
+from .database import get_async_db, SlotGame, SlotSymbol
+from .dependencies import get_current_user_id, get_current_admin
+from .reels import CLASSIC_PAYOUTS, MACHINES
+from .paylines import GRID_MACHINES
+from .outcomes import outcomes
+from . import jackpot, leaderboard, history
 
 router = APIRouter(prefix="/slots", tags=["slots"])
 
-# Логика выплат для 3 барабанов
-PAYOUT_RULES = {
-    (SlotSymbol.SEVEN, SlotSymbol.SEVEN, SlotSymbol.SEVEN): 50,    # 3 семерки
-    (SlotSymbol.BELL, SlotSymbol.BELL, SlotSymbol.BELL): 15,       # 3 колокола
-    (SlotSymbol.PLUM, SlotSymbol.PLUM, SlotSymbol.PLUM): 10,       # 3 сливы
-    (SlotSymbol.ORANGE, SlotSymbol.ORANGE, SlotSymbol.ORANGE): 5,  # 3 апельсина
-    (SlotSymbol.LEMON, SlotSymbol.LEMON, SlotSymbol.LEMON): 3,     # 3 лимона
-    (SlotSymbol.CHERRY, SlotSymbol.CHERRY, SlotSymbol.CHERRY): 2,  # 3 вишни
-}
+# Логика выплат для 3 барабанов (классическая машина)
+PAYOUT_RULES = CLASSIC_PAYOUTS
 
 # Схемы Pydantic
 from pydantic import BaseModel
 
 class SlotSpinRequest(BaseModel):
     bet_amount: float
+    machine: str = "classic"
+
+class SlotBatchSpinRequest(BaseModel):
+    bet_amount: float
+    spins: int
+    machine: str = "classic"
+    stop_on_win_above: Optional[float] = None      # остановиться после выигрыша больше X
+    stop_on_balance_below: Optional[float] = None  # остановиться, когда баланс ниже Y
+
+class SlotSimulationRequest(BaseModel):
+    spins: int = 1_000_000
+    seed: Optional[int] = None
+    machine: str = "classic"
 
 class SlotSpinResponse(BaseModel):
     id: int
     user_id: int
     bet_amount: float
-    reel1: str
-    reel2: str  
-    reel3: str
+    reel1: Optional[str] = None
+    reel2: Optional[str] = None
+    reel3: Optional[str] = None
+    grid: Optional[List[List[str]]] = None     # Многолинейные машины: строки сетки
+    line_wins: Optional[List[dict]] = None
     win_amount: float
     payout_multiplier: float
     is_winner: bool
+    jackpot_win: float = 0.0
     created_at: datetime
 
 @router.post("/spin", response_model=SlotSpinResponse)
 async def spin_slots(
     spin_data: SlotSpinRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id),
     authorization: str = Header(..., alias="Authorization")
 ):
@@ -50,6 +67,11 @@ async def spin_slots(
     if spin_data.bet_amount <= 0:
         raise HTTPException(status_code=400, detail="Bet amount must be positive")
     
+    machine = MACHINES.get(spin_data.machine)
+    grid_machine = GRID_MACHINES.get(spin_data.machine)
+    if not machine and not grid_machine:
+        raise HTTPException(status_code=400, detail="Unknown slot machine")
+    
     # 2. Снимаем деньги через Wallet Service
     async with httpx.AsyncClient() as client:
         try:
@@ -80,16 +102,26 @@ async def spin_slots(
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Wallet service error: {str(e)}")
 
-    # 3. Генерируем случайные символы
-    symbols = list(SlotSymbol)
-    reel1 = random.choice(symbols)
-    reel2 = random.choice(symbols)  
-    reel3 = random.choice(symbols)
+    # 3-4. Генерируем символы по взвешенным барабанам (alias-таблицы, O(1)) и определяем выигрыш
+    grid_spin = None
+    if grid_machine:
+        grid_spin = grid_machine.spin_result(outcomes.random)
+        reel1 = reel2 = reel3 = None
+        payout_multiplier = grid_spin["multiplier"]
+    else:
+        reel1, reel2, reel3 = machine.spin(outcomes.random)
+        payout_multiplier = machine.multiplier((reel1, reel2, reel3))
     
-    # 4. Определяем выигрыш
-    combination = (reel1, reel2, reel3)
-    payout_multiplier = PAYOUT_RULES.get(combination, 0.0)
-    win_amount = spin_data.bet_amount * payout_multiplier
+    # Доля ставки - в прогрессивный джекпот; розыгрыш джекпота атомарен (Lua)
+    jackpot_win, jackpot_epoch = 0.0, None
+    try:
+        await jackpot.contribute(spin_data.bet_amount)
+        if outcomes.random() < jackpot.hit_probability(spin_data.bet_amount):
+            jackpot_win, jackpot_epoch = await jackpot.award()
+    except Exception as e:
+        print(f"Jackpot error: {str(e)}")
+    
+    win_amount = spin_data.bet_amount * payout_multiplier + jackpot_win
     is_winner = win_amount > 0
     
     # 5. Если выиграли - зачисляем выигрыш
@@ -133,18 +165,31 @@ async def spin_slots(
     # 6. Сохраняем игру в БД
     slot_game = SlotGame(
         user_id=user_id,
+        machine=spin_data.machine,
         bet_amount=spin_data.bet_amount,
         reel1=reel1,
         reel2=reel2,
         reel3=reel3,
+        grid=grid_machine.encode_grid(grid_spin["grid"]) if grid_machine else None,
         win_amount=win_amount,
         payout_multiplier=payout_multiplier,
         is_winner=is_winner
     )
     
     db.add(slot_game)
-    db.commit()
-    db.refresh(slot_game)
+    await db.commit()
+    
+    if jackpot_epoch is not None:
+        try:
+            await jackpot.record_award(user_id, jackpot_win, jackpot_epoch, slot_game.id)
+        except Exception as e:
+            print(f"Jackpot record failed: {str(e)}")
+    
+    try:
+        await leaderboard.record("slots", user_id, win_amount - spin_data.bet_amount, at=slot_game.created_at)
+        await history.invalidate_first_page(user_id)
+    except Exception as e:
+        print(f"Leaderboard update failed: {str(e)}")
 
     # 7. ОТПРАВЛЯЕМ СОБЫТИЯ В ANALYTICS (ПОСЛЕ СОХРАНЕНИЯ В БД!)
     try:
@@ -179,32 +224,288 @@ async def spin_slots(
         print(f"Analytics tracking failed: {str(e)}")
     
     # 8. Возвращаем результат
-    return SlotSpinResponse(
-        id=slot_game.id,
-        user_id=slot_game.user_id,
-        bet_amount=slot_game.bet_amount,
-        reel1=slot_game.reel1.value,
-        reel2=slot_game.reel2.value,
-        reel3=slot_game.reel3.value,
-        win_amount=slot_game.win_amount,
-        payout_multiplier=slot_game.payout_multiplier,
-        is_winner=slot_game.is_winner,
-        created_at=slot_game.created_at
-    )
+    # Тело SlotSpinResponse без повторной валидации - сразу в orjson
+    return ORJSONResponse({
+        "id": slot_game.id,
+        "user_id": slot_game.user_id,
+        "bet_amount": slot_game.bet_amount,
+        "reel1": slot_game.reel1.value if slot_game.reel1 else None,
+        "reel2": slot_game.reel2.value if slot_game.reel2 else None,
+        "reel3": slot_game.reel3.value if slot_game.reel3 else None,
+        "grid": grid_machine.decode_grid(slot_game.grid) if grid_machine else None,
+        "line_wins": grid_spin["line_wins"] if grid_spin else None,
+        "win_amount": slot_game.win_amount,
+        "payout_multiplier": slot_game.payout_multiplier,
+        "is_winner": slot_game.is_winner,
+        "jackpot_win": jackpot_win,
+        "created_at": slot_game.created_at
+    })
+# Автоигра: N спинов за один запрос, два обращения к кошельку вместо 2N
+MAX_BATCH_SPINS = 500
+
+def run_autoplay(
+    machine,
+    bet_amount: float,
+    spins: int,
+    balance: float,
+    stop_on_win_above: Optional[float] = None,
+    stop_on_balance_below: Optional[float] = None,
+    uniform: Callable[[], float] = outcomes.random
+) -> dict:
+    """Разыгрывает серию спинов локально, отслеживая баланс игрока.
+
+    Серия прерывается, если на следующую ставку не хватает денег,
+    выигрыш спина больше stop_on_win_above или баланс опустился ниже
+    stop_on_balance_below.
+    """
+    results = []
+    stop_reason = "completed"
+    for _ in range(spins):
+        if balance < bet_amount:
+            stop_reason = "insufficient_funds"
+            break
+        reels = machine.spin(uniform)
+        multiplier = machine.multiplier(reels)
+        win_amount = bet_amount * multiplier
+        balance += win_amount - bet_amount
+        results.append((reels, multiplier, win_amount))
+
+        if stop_on_win_above is not None and win_amount > stop_on_win_above:
+            stop_reason = "win_above"
+            break
+        if stop_on_balance_below is not None and balance < stop_on_balance_below:
+            stop_reason = "balance_below"
+            break
+
+    total_bet = bet_amount * len(results)
+    total_win = sum(win for _, _, win in results)
+    return {
+        "results": results,
+        "stop_reason": stop_reason,
+        "total_bet": total_bet,
+        "total_win": total_win,
+        "net": total_win - total_bet,
+        "balance": balance,
+    }
+
+async def get_wallet_balance(authorization: str) -> float:
+    """Текущий баланс игрока из Wallet Service"""
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            "http://wallet-service:8000/graphql",
+            json={"query": "query { getBalance { __typename ... on Balance { balance } ... on TransactionError { message } } }"},
+            headers={"Authorization": authorization},
+            timeout=5.0
+        )
+    data = response.json()
+    if "errors" in data:
+        raise HTTPException(status_code=400, detail=f"Balance check failed: {data['errors'][0]['message']}")
+    result = data["data"]["getBalance"]
+    if result["__typename"] != "Balance":
+        raise HTTPException(status_code=400, detail=f"Balance check failed: {result['message']}")
+    return result["balance"]
+
+async def wallet_transaction(authorization: str, transaction_type: str, amount: float, action: str):
+    """Одна транзакция кошелька; отказ кошелька - HTTP 400"""
+    if amount <= 0:
+        return
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            "http://wallet-service:8000/graphql",
+            json={
+                "query": f"""
+                mutation {{
+                    createTransaction(type: "{transaction_type}", amount: {amount}) {{
+                        __typename
+                        ... on TransactionSuccess {{
+                            transaction {{ id amount }}
+                        }}
+                        ... on TransactionError {{
+                            message
+                        }}
+                    }}
+                }}
+                """
+            },
+            headers={"Authorization": authorization},
+            timeout=5.0
+        )
+    data = response.json()
+    if "errors" in data:
+        raise HTTPException(status_code=400, detail=f"{action} failed: {data['errors'][0]['message']}")
+    result = data["data"]["createTransaction"]
+    if result["__typename"] == "TransactionError":
+        raise HTTPException(status_code=400, detail=f"{action} failed: {result['message']}")
+
+CREDIT_ATTEMPTS = 3
+
+async def credit_batch(authorization: str, amount: float, user_id: int,
+                       failure_detail: str = "Spins are saved, but crediting the wallet failed"):
+    """Зачисление неиспользованной ставки и выигрышей серии, с повторами"""
+    for attempt in range(1, CREDIT_ATTEMPTS + 1):
+        try:
+            return await wallet_transaction(authorization, "win", amount, "Settlement")
+        except Exception as e:
+            print(f"Autoplay credit of {amount} for user {user_id} failed (attempt {attempt}): {str(e)}")
+            if attempt < CREDIT_ATTEMPTS:
+                await asyncio.sleep(0.2 * attempt)
+    raise HTTPException(status_code=502, detail=failure_detail)
+
+async def send_autoplay_events(user_id: int, spins: int, wins: int,
+                               total_bet: float, total_win: float):
+    """Одно агрегированное событие в analytics и одно уведомление о выигрыше"""
+    async with httpx.AsyncClient() as client:
+        try:
+            await client.post(
+                "http://analytics-service:8004/analytics/events/game",
+                json={
+                    "type": "batch",
+                    "game_type": "slots",
+                    "user_id": user_id,
+                    "game_id": None,
+                    "spins": spins,
+                    "wins": wins,
+                    "amount": total_bet,
+                    "win_amount": total_win
+                },
+                timeout=2.0
+            )
+        except Exception as e:
+            print(f"Analytics tracking failed: {str(e)}")
+
+        if total_win > 0:
+            try:
+                await client.post(
+                    "http://notification-service:8005/notifications/trigger/win",
+                    json={"user_id": user_id, "amount": total_win, "game_type": "slots"},
+                    timeout=2.0
+                )
+            except Exception as e:
+                print(f"Notification service error: {str(e)}")
+
+@router.post("/spin/batch")
+async def spin_slots_batch(
+    batch_data: SlotBatchSpinRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id),
+    authorization: str = Header(..., alias="Authorization")
+):
+    """Автоигра: ставка серии списывается заранее, итог зачисляется одной транзакцией"""
+    if batch_data.bet_amount <= 0:
+        raise HTTPException(status_code=400, detail="Bet amount must be positive")
+    if batch_data.spins <= 0 or batch_data.spins > MAX_BATCH_SPINS:
+        raise HTTPException(status_code=400, detail=f"Spins must be between 1 and {MAX_BATCH_SPINS}")
+    machine = MACHINES.get(batch_data.machine)
+    if not machine:
+        raise HTTPException(status_code=400, detail="Unknown slot machine")
+
+    # 1. Баланс нужен для условий остановки серии; списываем только то, что он покрывает
+    balance = await get_wallet_balance(authorization)
+    spins = min(batch_data.spins, int(balance // batch_data.bet_amount))
+    if spins <= 0:
+        raise HTTPException(status_code=400, detail="Insufficient funds")
+    stake = batch_data.bet_amount * spins
+
+    # 2. Списываем ставку серии до игры - отказ кошелька значит, что серия не сыграна
+    await wallet_transaction(authorization, "bet", stake, "Bet")
+
+    try:
+        # 3. Разыгрываем серию локально
+        autoplay = run_autoplay(
+            machine, batch_data.bet_amount, spins, balance,
+            batch_data.stop_on_win_above, batch_data.stop_on_balance_below
+        )
+        if autoplay["stop_reason"] == "completed" and spins < batch_data.spins:
+            # Серия урезана по балансу на момент списания
+            autoplay["stop_reason"] = "insufficient_funds"
+        results = autoplay["results"]
+
+        # 4. Все спины одной multi-row вставкой - до зачисления выигрышей
+        created_at = datetime.utcnow()
+        rows = [{
+            "user_id": user_id,
+            "machine": machine.name,
+            "bet_amount": batch_data.bet_amount,
+            "reel1": reels[0],
+            "reel2": reels[1],
+            "reel3": reels[2],
+            "win_amount": win_amount,
+            "payout_multiplier": multiplier,
+            "is_winner": win_amount > 0,
+            "created_at": created_at
+        } for reels, multiplier, win_amount in results]
+        await db.execute(insert(SlotGame), rows)
+        await db.commit()
+    except Exception as e:
+        # Серия не записана - возвращаем всю списанную ставку
+        await db.rollback()
+        print(f"Autoplay for user {user_id} failed, refunding {stake}: {str(e)}")
+        await credit_batch(authorization, stake, user_id,
+                           failure_detail="Autoplay failed and refunding the stake failed")
+        raise HTTPException(status_code=500, detail="Autoplay failed, the stake was refunded")
+
+    # 5. Джекпот: каждый спин серии вносит долю ставки и разыгрывает джекпот, как /spin
+    jackpot_win = 0.0
+    try:
+        await jackpot.contribute(autoplay["total_bet"])
+        hit_probability = jackpot.hit_probability(batch_data.bet_amount)
+        if any(outcomes.random() < hit_probability for _ in results):
+            jackpot_win, jackpot_epoch = await jackpot.award()
+            await jackpot.record_award(user_id, jackpot_win, jackpot_epoch, None)
+    except Exception as e:
+        print(f"Jackpot error: {str(e)}")
+    total_win = autoplay["total_win"] + jackpot_win
+    net = autoplay["net"] + jackpot_win
+
+    # 6. Одно зачисление: несыгранная часть ставки плюс выигрыши
+    await credit_batch(authorization, stake - autoplay["total_bet"] + total_win, user_id)
+
+    try:
+        await leaderboard.record("slots", user_id, net, at=created_at)
+        await history.invalidate_first_page(user_id)
+    except Exception as e:
+        print(f"Leaderboard update failed: {str(e)}")
+
+    wins = sum(1 for _, _, win_amount in results if win_amount > 0)
+    await send_autoplay_events(user_id, len(results), wins, autoplay["total_bet"], total_win)
+
+    return {
+        "spins_played": len(results),
+        "stop_reason": autoplay["stop_reason"],
+        "total_bet": autoplay["total_bet"],
+        "total_win": total_win,
+        "jackpot_win": jackpot_win,
+        "net": net,
+        "balance": autoplay["balance"] + jackpot_win,
+        "spins": [
+            {
+                "reels": [symbol.value for symbol in reels],
+                "win_amount": win_amount,
+                "payout_multiplier": multiplier
+            }
+            for reels, multiplier, win_amount in results
+        ]
+    }
+
 @router.get("/history")
 async def get_slots_history(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """Получаем историю игр в слотах для текущего пользователя"""
-    games = db.query(SlotGame).filter(SlotGame.user_id == user_id).order_by(SlotGame.created_at.desc()).limit(10).all()
+    games = (await db.execute(
+        select(SlotGame).where(SlotGame.user_id == user_id).order_by(SlotGame.created_at.desc()).limit(10)
+    )).scalars().all()
     
     return {
         "games": [
             {
                 "id": game.id,
                 "bet_amount": game.bet_amount,
-                "reels": [game.reel1.value, game.reel2.value, game.reel3.value],
+                "machine": game.machine,
+                "reels": [game.reel1.value, game.reel2.value, game.reel3.value] if game.reel1 else None,
+                "grid": GRID_MACHINES[game.machine].decode_grid(game.grid)
+                        if game.grid is not None and game.machine in GRID_MACHINES else None,
                 "win_amount": game.win_amount,
                 "is_winner": game.is_winner,
                 "created_at": game.created_at.isoformat()
@@ -213,6 +514,41 @@ async def get_slots_history(
         ]
     }
 
+@router.get("/jackpot")
+async def get_jackpot():
+    """Текущий прогрессивный джекпот для лобби - одно чтение из Redis"""
+    return {"name": jackpot.JACKPOT_NAME, "amount": await jackpot.current_value()}
+
+# Пул процессов для тяжелых симуляций, чтобы не блокировать event loop
+MAX_SIMULATION_SPINS = 100_000_000
+_simulation_executor: Optional[ProcessPoolExecutor] = None
+
+def get_simulation_executor() -> ProcessPoolExecutor:
+    global _simulation_executor
+    if _simulation_executor is None:
+        _simulation_executor = ProcessPoolExecutor(max_workers=2)
+    return _simulation_executor
+
+@router.post("/admin/simulate")
+async def simulate_slots(
+    sim_data: SlotSimulationRequest,
+    admin_id: int = Depends(get_current_admin)
+):
+    """Monte Carlo проверка RTP и волатильности таблицы выплат"""
+    from .slots_sim import simulate, DEFAULT_BATCH_SIZE
+    
+    if sim_data.spins <= 0 or sim_data.spins > MAX_SIMULATION_SPINS:
+        raise HTTPException(status_code=400, detail=f"Spins must be between 1 and {MAX_SIMULATION_SPINS}")
+    if sim_data.machine not in MACHINES:
+        raise HTTPException(status_code=400, detail="Unknown slot machine")
+    
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        get_simulation_executor(), simulate, sim_data.spins, sim_data.seed,
+        DEFAULT_BATCH_SIZE, sim_data.machine
+    )
+    return {"success": True, "simulation": result}
+
 @router.get("/test")
 async def slots_test():
     return {"message": "Slots are working!"}
\ No newline at end of file
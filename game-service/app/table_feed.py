@@ -0,0 +1,102 @@
+"""Подписка на события столов и игр рулетки по WebSocket.
+
+Клиент подписывается на канал стола (table:{id}) или игры (game:{id}) и
+получает принятые ставки, смену фазы и результат спина сразу, без
+опроса GET /roulette/games/{id}. Сообщение сериализуется в JSON один
+раз в момент события и рассылается всем подписчикам как готовая строка.
+
+С Redis-бэкендом событие публикуется в канал Redis, и каждый воркер
+пересылает ту же строку своим подписчикам - клиент может быть подключен
+к любому воркеру или реплике.
+"""
+import os
+import json
+import asyncio
+import logging
+from typing import Dict, Set
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL_PREFIX = "roulette:feed:"
+SEND_TIMEOUT_SECONDS = float(os.getenv("TABLE_FEED_SEND_TIMEOUT", "2"))
+
+
+def table_channel(table_id: str) -> str:
+    return f"table:{table_id}"
+
+
+def game_channel(game_id: int) -> str:
+    return f"game:{game_id}"
+
+
+class TableFeed:
+    """Подписчики каналов этого процесса и рассылка сообщений"""
+
+    def __init__(self, redis=None):
+        self.redis = redis
+        self.subscribers: Dict[str, Set[WebSocket]] = {}
+
+    async def connect(self, websocket: WebSocket, channel: str):
+        await websocket.accept()
+        self.subscribers.setdefault(channel, set()).add(websocket)
+        logger.info(f"Feed {channel}: {len(self.subscribers[channel])} subscribers")
+
+    def disconnect(self, websocket: WebSocket, channel: str):
+        subscribers = self.subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.subscribers[channel]
+
+    async def publish(self, channels, message: dict):
+        """Сериализует сообщение один раз и отправляет во все каналы"""
+        data = json.dumps(message, default=str)
+        for channel in channels:
+            if self.redis is not None:
+                await self.redis.publish(REDIS_CHANNEL_PREFIX + channel, data)
+            else:
+                await self.deliver(channel, data)
+
+    async def deliver(self, channel: str, data: str):
+        """Отправляет готовую строку локальным подписчикам канала"""
+        subscribers = list(self.subscribers.get(channel, ()))
+        if not subscribers:
+            return
+        results = await asyncio.gather(
+            *(asyncio.wait_for(ws.send_text(data), SEND_TIMEOUT_SECONDS) for ws in subscribers),
+            return_exceptions=True
+        )
+        # Медленных и отвалившихся клиентов отключаем
+        for websocket, result in zip(subscribers, results):
+            if isinstance(result, BaseException):
+                self.disconnect(websocket, channel)
+
+    async def listen(self):
+        """Пересылает события из Redis локальным подписчикам"""
+        if self.redis is None:
+            return None
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.psubscribe(REDIS_CHANNEL_PREFIX + "*")
+                async for message in pubsub.listen():
+                    if message.get("type") != "pmessage":
+                        continue
+                    channel = message["channel"][len(REDIS_CHANNEL_PREFIX):]
+                    if channel in self.subscribers:
+                        await self.deliver(channel, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Table feed listener failed: {str(e)}")
+                await asyncio.sleep(1.0)
+
+
+def create_table_feed() -> TableFeed:
+    """Redis pub/sub при GAME_MANAGER_BACKEND=redis, иначе рассылка внутри процесса"""
+    if os.getenv("GAME_MANAGER_BACKEND", "memory").lower() == "redis":
+        from .redis_client import redis_client
+        return TableFeed(redis_client)
+    return TableFeed()
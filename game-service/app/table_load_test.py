@@ -0,0 +1,72 @@
+"""Нагрузочный тест общего стола рулетки: ставок в секунду на стол.
+
+Запускается против работающего game-service:
+    python -m app.table_load_test --url http://localhost:8003 --token <JWT> \
+        --table main --concurrency 50 --duration 15
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+BET_SHAPES = [
+    ("straight", lambda: [random.randint(0, 36)]),
+    ("red", lambda: []),
+    ("black", lambda: []),
+    ("even", lambda: []),
+    ("odd", lambda: []),
+    ("dozen", lambda: [random.randint(1, 3)]),
+    ("column", lambda: [random.randint(1, 3)]),
+]
+
+
+async def bettor(client: httpx.AsyncClient, args, deadline: float, stats: dict):
+    while time.perf_counter() < deadline:
+        table = (await client.get(f"/roulette/tables/{args.table}")).json()
+        if table.get("phase") != "accepting_bets":
+            await asyncio.sleep(0.2)
+            continue
+
+        bet_type, numbers = random.choice(BET_SHAPES)
+        started = time.perf_counter()
+        response = await client.post(
+            f"/roulette/games/{table['game_id']}/bet",
+            json={"bet_type": bet_type, "numbers": numbers(), "amount": args.amount}
+        )
+        stats["latency"].append(time.perf_counter() - started)
+        stats["accepted" if response.status_code == 200 else "rejected"] += 1
+
+
+async def run(args):
+    stats = {"accepted": 0, "rejected": 0, "latency": []}
+    headers = {"Authorization": f"Bearer {args.token}"}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=10.0) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(bettor(client, args, deadline, stats) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latency = sorted(stats["latency"]) or [0.0]
+    print(f"Table {args.table}: {stats['accepted']:,} bets accepted, {stats['rejected']:,} rejected "
+          f"in {elapsed:.1f}s")
+    print(f"Throughput: {stats['accepted'] / elapsed:,.1f} bets/s")
+    print(f"Latency p50 {latency[len(latency) // 2] * 1000:.1f} ms, "
+          f"p99 {latency[int(len(latency) * 0.99)] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roulette table load test")
+    parser.add_argument("--url", default="http://localhost:8003")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--table", default="main")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--amount", type=float, default=1.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
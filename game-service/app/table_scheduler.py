@@ -0,0 +1,179 @@
+"""Планировщик общих столов рулетки.
+
+Каждый стол - отдельная asyncio задача, которая крутит раунды по
+фиксированному циклу: прием ставок -> ставки закрыты -> спин и расчет.
+Все игроки стола ставят в один и тот же раунд, поэтому один спин
+рассчитывает сразу все ставки.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import select
+
+from .database import AsyncSessionLocal, RouletteGame, RouletteGameStatus
+from .game_manager import RedisGameManager
+from . import bet_buffer
+from .roulette import game_manager, finish_round, assign_fair_seed, table_feed, table_stats
+from .table_feed import table_channel
+from .table_stats import WINDOW_SIZE
+from .transitions import transition, TransitionConflict
+
+logger = logging.getLogger(__name__)
+
+TABLE_IDS = [t.strip() for t in os.getenv("ROULETTE_TABLES", "main").split(",") if t.strip()]
+BETTING_SECONDS = float(os.getenv("ROULETTE_BETTING_SECONDS", "20"))
+NO_MORE_BETS_SECONDS = float(os.getenv("ROULETTE_NO_MORE_BETS_SECONDS", "2"))
+RESULT_SECONDS = float(os.getenv("ROULETTE_RESULT_SECONDS", "5"))
+SCHEDULER_ENABLED = os.getenv("ROULETTE_SCHEDULER_ENABLED", "true").lower() == "true"
+
+# С Redis-бэкендом стол крутит только один воркер - владелец блокировки
+LEADER_KEY = "roulette:table:{}:leader"
+LEADER_TTL_SECONDS = int(BETTING_SECONDS + NO_MORE_BETS_SECONDS + RESULT_SECONDS + 30)
+WORKER_ID = uuid.uuid4().hex
+
+
+async def _set_status(game_id: int, expected: RouletteGameStatus, status: RouletteGameStatus):
+    """Охраняемый переход фазы раунда; чужой переход - TransitionConflict"""
+    async with AsyncSessionLocal() as db:
+        await transition(db, RouletteGame, game_id, [expected], {RouletteGame.status: status})
+        await db.commit()
+
+
+async def _open_round(table_id: str) -> int:
+    """Создает новый раунд стола в статусе ACCEPTING_BETS"""
+    async with AsyncSessionLocal() as db:
+        game = RouletteGame(
+            table_id=table_id,
+            status=RouletteGameStatus.ACCEPTING_BETS,
+            started_at=datetime.utcnow()
+        )
+        await assign_fair_seed(game)
+        db.add(game)
+        await db.commit()
+        return game.id
+
+
+async def _set_phase(table_id: str, game_id: int, phase: RouletteGameStatus, phase_ends_at: float):
+    """Запоминает фазу стола и рассылает ее подписчикам"""
+    await game_manager.set_table_round(table_id, game_id, phase.value, phase_ends_at)
+    try:
+        await table_feed.publish([table_channel(table_id)], {
+            "type": "phase",
+            "table_id": table_id,
+            "game_id": game_id,
+            "phase": phase.value,
+            "phase_ends_at": phase_ends_at
+        })
+    except Exception as e:
+        logger.error(f"Table feed publish failed: {str(e)}")
+
+
+async def _spin_round(game_id: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        game = await db.get(RouletteGame, game_id)
+        return await finish_round(db, game)
+
+
+async def run_round(table_id: str) -> dict:
+    """Один полный раунд стола"""
+    game_id = await _open_round(table_id)
+    await game_manager.add_game(game_id)
+
+    await _set_phase(table_id, game_id, RouletteGameStatus.ACCEPTING_BETS, time.time() + BETTING_SECONDS)
+    await asyncio.sleep(BETTING_SECONDS)
+
+    await _set_status(game_id, RouletteGameStatus.ACCEPTING_BETS, RouletteGameStatus.NO_MORE_BETS)
+    await bet_buffer.close_round(game_id)
+    await bet_buffer.flush_game(game_id, wait=True)
+    await _set_phase(table_id, game_id, RouletteGameStatus.NO_MORE_BETS, time.time() + NO_MORE_BETS_SECONDS)
+    await asyncio.sleep(NO_MORE_BETS_SECONDS)
+
+    await _set_status(game_id, RouletteGameStatus.NO_MORE_BETS, RouletteGameStatus.SPINNING)
+    await _set_phase(table_id, game_id, RouletteGameStatus.SPINNING, time.time())
+    result = await _spin_round(game_id)
+
+    await _set_phase(table_id, game_id, RouletteGameStatus.FINISHED, time.time() + RESULT_SECONDS)
+    logger.info(f"Table {table_id}: round {game_id} finished, number {result['winning_number']}, "
+                f"{len(result['winning_bets'])} winning bets")
+    await asyncio.sleep(RESULT_SECONDS)
+    return result
+
+
+async def acquire_table(table_id: str) -> bool:
+    """Захватывает или продлевает право крутить стол"""
+    if not isinstance(game_manager, RedisGameManager):
+        return True
+    key = LEADER_KEY.format(table_id)
+    redis = game_manager.redis
+    if await redis.set(key, WORKER_ID, nx=True, ex=LEADER_TTL_SECONDS):
+        return True
+    if await redis.get(key) == WORKER_ID:
+        await redis.expire(key, LEADER_TTL_SECONDS)
+        return True
+    return False
+
+
+async def recover_open_rounds(table_id: str):
+    """Доигрывает раунды стола, оборванные перезапуском сервиса"""
+    async with AsyncSessionLocal() as db:
+        game_ids = (await db.execute(select(RouletteGame.id).where(
+            RouletteGame.table_id == table_id,
+            RouletteGame.status != RouletteGameStatus.FINISHED
+        ))).scalars().all()
+    for game_id in game_ids:
+        logger.info(f"Table {table_id}: settling interrupted round {game_id}")
+        try:
+            await _spin_round(game_id)
+        except TransitionConflict:
+            logger.info(f"Table {table_id}: round {game_id} already settled by another worker")
+
+
+async def warm_stats(table_id: str):
+    """Заполняет пустое окно статистики последними результатами стола из БД"""
+    if not await table_stats.is_empty(table_id):
+        return
+    async with AsyncSessionLocal() as db:
+        numbers = (await db.execute(select(RouletteGame.winning_number).where(
+            RouletteGame.table_id == table_id,
+            RouletteGame.status == RouletteGameStatus.FINISHED,
+            RouletteGame.winning_number.isnot(None)
+        ).order_by(RouletteGame.finished_at.desc(), RouletteGame.id.desc()).limit(WINDOW_SIZE))).scalars().all()
+    await table_stats.load(table_id, reversed(numbers))
+
+
+async def run_table(table_id: str):
+    """Бесконечный цикл раундов одного стола"""
+    logger.info(f"Roulette table {table_id} started")
+    is_leader = False
+    while True:
+        try:
+            if not await acquire_table(table_id):
+                is_leader = False
+                await asyncio.sleep(RESULT_SECONDS)
+                continue
+            if not is_leader:
+                # Стал владельцем стола - сначала доигрываем оборванные раунды
+                is_leader = True
+                await recover_open_rounds(table_id)
+                await warm_stats(table_id)
+            await run_round(table_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Roulette table {table_id} round failed: {str(e)}")
+            await asyncio.sleep(RESULT_SECONDS)
+
+
+def start_tables() -> List[asyncio.Task]:
+    """Запускает задачи всех столов"""
+    if not SCHEDULER_ENABLED:
+        return []
+    if not isinstance(game_manager, RedisGameManager):
+        logger.warning("Table scheduler runs with the in-memory game manager: every worker spins its own "
+                       "rounds of each table. Set GAME_MANAGER_BACKEND=redis when running several workers")
+    return [asyncio.create_task(run_table(table_id)) for table_id in TABLE_IDS]
@@ -0,0 +1,166 @@
+"""Горячие и холодные числа общих столов рулетки.
+
+На каждый стол хранится кольцевой буфер последних N результатов и
+счетчики по окну: числа, цвета, чет/нечет, малые/большие, дюжины и
+текущая серия цвета. Счетчики обновляются инкрементально на каждом
+спине - новое число прибавляется, вытесненное из окна вычитается, -
+поэтому снимок статистики не пересчитывает историю и не ходит в БД.
+
+С Redis-бэкендом буфер - список, счетчики - хэш; спин записывается
+одним Lua-скриптом, и все воркеры видят одну и ту же статистику.
+"""
+import os
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Optional
+
+from .roulette_bets import number_color, DOZENS
+
+WINDOW_SIZE = int(os.getenv("ROULETTE_STATS_WINDOW", "100"))
+RECENT_COUNT = int(os.getenv("ROULETTE_STATS_RECENT", "20"))
+HOT_COLD_COUNT = int(os.getenv("ROULETTE_STATS_HOT_COLD", "5"))
+
+RECENT_KEY = "roulette:stats:{}:recent"
+COUNTS_KEY = "roulette:stats:{}:counts"
+
+# KEYS: буфер, счетчики; ARGV: запись (поля счетчиков через пробел), размер окна, цвет
+RECORD_SCRIPT = """
+redis.call('LPUSH', KEYS[1], ARGV[1])
+for field in string.gmatch(ARGV[1], '%S+') do
+    redis.call('HINCRBY', KEYS[2], field, 1)
+end
+if redis.call('LLEN', KEYS[1]) > tonumber(ARGV[2]) then
+    local evicted = redis.call('RPOP', KEYS[1])
+    for field in string.gmatch(evicted, '%S+') do
+        redis.call('HINCRBY', KEYS[2], field, -1)
+    end
+end
+if redis.call('HGET', KEYS[2], 'streak_color') == ARGV[3] then
+    redis.call('HINCRBY', KEYS[2], 'streak_length', 1)
+else
+    redis.call('HSET', KEYS[2], 'streak_color', ARGV[3], 'streak_length', 1)
+end
+return 1
+"""
+
+
+def result_fields(number: int) -> List[str]:
+    """Счетчики, в которые попадает число; первое поле - само число"""
+    fields = [f"n:{number}", f"c:{number_color(number)}"]
+    if number:
+        fields.append("even" if number % 2 == 0 else "odd")
+        fields.append("low" if number <= 18 else "high")
+        fields.extend(f"d:{i + 1}" for i, dozen in enumerate(DOZENS) if number in dozen)
+    return fields
+
+
+def entry_number(entry: str) -> int:
+    return int(entry.split(" ", 1)[0][2:])
+
+
+def build_snapshot(table_id: str, recent: List[int], counts: Dict[str, int],
+                   streak_color: Optional[str], streak_length: int) -> dict:
+    """Снимок статистики из буфера (новые первыми) и счетчиков окна"""
+    numbers = sorted(range(37), key=lambda n: (-counts.get(f"n:{n}", 0), n))
+    # Холодные - реже всех, при равенстве дольше не выпадавшие
+    last_seen = {}
+    for i, number in enumerate(recent):
+        last_seen.setdefault(number, i)
+    cold = sorted(range(37), key=lambda n: (counts.get(f"n:{n}", 0), -last_seen.get(n, len(recent)), n))
+    return {
+        "table_id": table_id,
+        "window": WINDOW_SIZE,
+        "spins": sum(counts.get(f"n:{n}", 0) for n in range(37)),
+        "recent": recent[:RECENT_COUNT],
+        "hot": [{"number": n, "count": counts.get(f"n:{n}", 0)} for n in numbers[:HOT_COLD_COUNT]],
+        "cold": [{"number": n, "count": counts.get(f"n:{n}", 0)} for n in cold[:HOT_COLD_COUNT]],
+        "colors": {color: counts.get(f"c:{color}", 0) for color in ("red", "black", "green")},
+        "parity": {key: counts.get(key, 0) for key in ("even", "odd")},
+        "halves": {key: counts.get(key, 0) for key in ("low", "high")},
+        "dozens": {str(i): counts.get(f"d:{i}", 0) for i in (1, 2, 3)},
+        "streak": {"color": streak_color, "length": streak_length},
+    }
+
+
+class TableStats:
+    """Статистика столов в памяти процесса"""
+
+    def __init__(self, window: int = WINDOW_SIZE):
+        self.window = window
+        self.recent: Dict[str, deque] = {}
+        self.counts: Dict[str, Counter] = {}
+        self.streaks: Dict[str, list] = {}
+
+    async def record(self, table_id: str, number: int):
+        recent = self.recent.setdefault(table_id, deque())
+        counts = self.counts.setdefault(table_id, Counter())
+        recent.appendleft(number)
+        counts.update(result_fields(number))
+        if len(recent) > self.window:
+            counts.subtract(result_fields(recent.pop()))
+
+        color = number_color(number)
+        streak = self.streaks.get(table_id)
+        if streak and streak[0] == color:
+            streak[1] += 1
+        else:
+            self.streaks[table_id] = [color, 1]
+
+    async def load(self, table_id: str, numbers: Iterable[int]):
+        """Заполняет окно историей стола (от старых к новым)"""
+        self.recent.pop(table_id, None)
+        self.counts.pop(table_id, None)
+        self.streaks.pop(table_id, None)
+        for number in numbers:
+            await self.record(table_id, number)
+
+    async def is_empty(self, table_id: str) -> bool:
+        return not self.recent.get(table_id)
+
+    async def snapshot(self, table_id: str) -> dict:
+        color, length = self.streaks.get(table_id, (None, 0))
+        return build_snapshot(table_id, list(self.recent.get(table_id, ())),
+                              self.counts.get(table_id, {}), color, length)
+
+
+class RedisTableStats:
+    """Статистика столов в Redis, общая для всех воркеров"""
+
+    def __init__(self, redis, window: int = WINDOW_SIZE):
+        self.redis = redis
+        self.window = window
+        self._record = redis.register_script(RECORD_SCRIPT)
+
+    async def record(self, table_id: str, number: int, client=None):
+        await self._record(
+            keys=[RECENT_KEY.format(table_id), COUNTS_KEY.format(table_id)],
+            args=[" ".join(result_fields(number)), self.window, number_color(number)],
+            client=client
+        )
+
+    async def load(self, table_id: str, numbers: Iterable[int]):
+        """Заполняет окно историей стола (от старых к новым) одной транзакцией"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(RECENT_KEY.format(table_id), COUNTS_KEY.format(table_id))
+            for number in numbers:
+                await self.record(table_id, number, client=pipe)
+            await pipe.execute()
+
+    async def is_empty(self, table_id: str) -> bool:
+        return not await self.redis.exists(RECENT_KEY.format(table_id))
+
+    async def snapshot(self, table_id: str) -> dict:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.lrange(RECENT_KEY.format(table_id), 0, -1)
+            pipe.hgetall(COUNTS_KEY.format(table_id))
+            entries, raw = await pipe.execute()
+        counts = {field: int(value) for field, value in raw.items() if field != "streak_color"}
+        return build_snapshot(table_id, [entry_number(e) for e in entries], counts,
+                              raw.get("streak_color"), counts.get("streak_length", 0))
+
+
+def create_table_stats():
+    """Redis при GAME_MANAGER_BACKEND=redis, иначе память процесса"""
+    if os.getenv("GAME_MANAGER_BACKEND", "memory").lower() == "redis":
+        from .redis_client import redis_client
+        return RedisTableStats(redis_client)
+    return TableStats()
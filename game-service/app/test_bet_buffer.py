@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from app import bet_buffer
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(bet_buffer, "redis_client", fake)
+    monkeypatch.setattr(bet_buffer, "_release_script", fake.register_script(bet_buffer.RELEASE_SCRIPT))
+    monkeypatch.setattr(bet_buffer, "_trim_script", fake.register_script(bet_buffer.TRIM_SCRIPT))
+    return fake
+
+
+def test_expired_flush_does_not_release_the_next_owners_lock(redis, monkeypatch):
+    lock_key = bet_buffer.FLUSH_LOCK_KEY.format(1)
+
+    async def slow_insert(rows):
+        # Вставка дольше TTL блокировки: ее успевает взять другой flush
+        await redis.delete(lock_key)
+        await redis.set(lock_key, "other-flusher", ex=bet_buffer.FLUSH_LOCK_SECONDS)
+
+    monkeypatch.setattr(bet_buffer, "_insert_bets", slow_insert)
+
+    async def run():
+        await redis.rpush(bet_buffer.BUFFER_KEY.format(1), json.dumps({"id": 1}))
+        flushed = await bet_buffer.flush_game(1)
+        return flushed, await redis.get(lock_key), await redis.llen(bet_buffer.BUFFER_KEY.format(1))
+
+    flushed, owner, buffered = asyncio.run(run())
+    # Без блокировки пачка не срезается - ее срежет владелец после своей вставки
+    assert (flushed, owner, buffered) == (0, "other-flusher", 1)
+
+
+def test_expired_flush_does_not_trim_bets_it_never_inserted(redis, monkeypatch):
+    monkeypatch.setattr(bet_buffer, "FLUSH_BATCH_SIZE", 2)
+    buffer_key = bet_buffer.BUFFER_KEY.format(1)
+    inserted = []
+    stalled = []
+
+    async def insert(rows):
+        if not stalled:
+            stalled.append(True)
+            # Первый flush завис на вставке: блокировка истекла, второй flush
+            # вставил и срезал ту же голову, а за ней пришли новые ставки
+            await redis.delete(bet_buffer.FLUSH_LOCK_KEY.format(1))
+            await bet_buffer.flush_game(1)
+            await redis.rpush(buffer_key, *(json.dumps({"id": i}) for i in (3, 4)))
+        inserted.extend(row["id"] for row in rows)
+
+    monkeypatch.setattr(bet_buffer, "_insert_bets", insert)
+
+    async def run():
+        await redis.rpush(buffer_key, *(json.dumps({"id": i}) for i in (1, 2)))
+        await bet_buffer.flush_game(1, wait=True)
+        return await redis.llen(buffer_key)
+
+    assert asyncio.run(run()) == 0
+    # Ставки 3 и 4 не потеряны; повторная вставка 1 и 2 игнорируется по id
+    assert set(inserted) == {1, 2, 3, 4}
@@ -0,0 +1,74 @@
+import asyncio
+import random
+
+import numpy as np
+
+from app import blackjack
+from app.blackjack import calculate_score, deal_card, dealer_turn, determine_winner
+from app.database import BlackjackGame, BlackjackGameStatus
+from app.outcomes import SeededOutcomeSource
+from app.blackjack_sim import (
+    RANKS, RANK_VALUES, ACE, UPCARD_INDEX, basic_strategy, hand_score, simulate
+)
+
+
+def test_hand_score_matches_calculate_score():
+    """Векторный счет совпадает с calculate_score на случайных руках"""
+    rng = random.Random(1)
+    for _ in range(2000):
+        cards = [rng.choice(RANKS) for _ in range(rng.randint(2, 6))]
+        idx = [RANKS.index(c) for c in cards]
+        hard = np.array([RANK_VALUES[idx].sum()])
+        has_ace = np.array([ACE in idx])
+        assert hand_score(hard, has_ace)[0] == calculate_score(cards)
+
+
+async def _reference_hand(strategy) -> int:
+    """Одна раздача настоящими функциями blackjack.py: +1 выигрыш, 0 ничья, -1 проигрыш"""
+    # Начальная раздача - как в start_blackjack
+    player = [deal_card([]), deal_card([])]
+    upcard = deal_card([])
+    game = BlackjackGame(bet_amount=1.0, status=BlackjackGameStatus.PLAYER_TURN,
+                         player_cards=player, player_score=calculate_score(player),
+                         dealer_cards=[upcard, "?"], dealer_score=calculate_score([upcard]),
+                         win_amount=0.0, is_winner=False, is_push=False)
+    up_idx = UPCARD_INDEX[RANKS.index(upcard)]
+
+    # Ходы игрока по стратегии - как в player_action
+    while game.player_score <= 21:
+        hard = calculate_score([c if c != "A" else "1" for c in game.player_cards])
+        table = strategy["soft"] if game.player_score != hard else strategy["hard"]
+        if not table[game.player_score, up_idx]:
+            break
+        game.player_cards.append(deal_card(game.player_cards + [upcard]))
+        game.player_score = calculate_score(game.player_cards)
+
+    if game.player_score > 21:
+        game.status = BlackjackGameStatus.FINISHED
+        determine_winner(game)
+    else:
+        game.status = BlackjackGameStatus.DEALER_TURN
+        await dealer_turn(game, game.player_cards + [upcard])
+
+    if game.is_push:
+        return 0
+    return 1 if game.is_winner else -1
+
+
+def test_house_edge_matches_game_rules(monkeypatch):
+    """Регрессия: симулятор и правила из blackjack.py дают одно преимущество казино"""
+    # Карты раздает воспроизводимый поток - результат не зависит от запуска
+    monkeypatch.setattr(blackjack, "outcomes", SeededOutcomeSource(b"blackjack-sim", "reference"))
+    strategy = basic_strategy()
+    n = 100_000
+
+    async def play():
+        return [await _reference_hand(strategy) for _ in range(n)]
+
+    reference_edge = -sum(asyncio.run(play())) / n
+
+    result = simulate(400_000, seed=7)
+    assert abs(result["house_edge"] - reference_edge) < 0.015
+    # Текущие правила: дилер стоит на 17, ничья - возврат, без бонуса за блэкджек
+    assert 0.01 < result["house_edge"] < 0.04
+    assert abs(result["win_rate"] + result["push_rate"] + result["loss_rate"] - 1.0) < 1e-9
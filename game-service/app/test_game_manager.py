@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import fakeredis
+
+from app.game_manager import (
+    GameManager, RedisGameManager, create_game_manager, GAMES_KEY, PLAYERS_KEY, TABLES_KEY
+)
+
+
+def test_in_memory_game_manager():
+    """In-memory реализация для тестов и одного воркера"""
+    async def scenario():
+        manager = GameManager()
+        await manager.add_game(1)
+        await manager.add_player_to_game(1, 10)
+        await manager.add_player_to_game(2, 10)  # неактивная игра - игнорируем
+        assert await manager.is_active_game(1)
+        assert await manager.get_game_players(1) == {10}
+        assert await manager.get_game_players(2) == set()
+
+        await manager.set_table_round("main", 1, "accepting_bets", 100.0)
+        assert (await manager.get_table("main"))["game_id"] == 1
+        assert list(await manager.get_tables()) == ["main"]
+
+        await manager.remove_game(1)
+        assert not await manager.is_active_game(1)
+        assert await manager.get_game_players(1) == set()
+
+    asyncio.run(scenario())
+
+
+def test_backend_selected_from_env(monkeypatch):
+    monkeypatch.setenv("GAME_MANAGER_BACKEND", "memory")
+    assert isinstance(create_game_manager(), GameManager)
+
+
+def test_redis_game_manager_shares_state_between_workers():
+    """Два воркера на одном Redis: запись pipeline-ом, кэш с TTL, инвалидация через pub/sub"""
+    async def scenario():
+        server = fakeredis.FakeServer()
+        redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        writer = RedisGameManager(fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+        reader = RedisGameManager(fakeredis.FakeAsyncRedis(server=server, decode_responses=True), cache_ttl=60)
+
+        await writer.add_game(1)
+        await writer.add_player_to_game(1, 10)
+        await writer.add_player_to_game(2, 10)  # неактивная игра - игнорируем
+        await writer.set_table_round("main", 1, "accepting_bets", 100.0)
+        assert await redis.smembers(GAMES_KEY) == {"1"}
+        assert await redis.smembers(PLAYERS_KEY.format(1)) == {"10"}
+        assert await redis.exists(PLAYERS_KEY.format(2)) == 0
+        assert json.loads(await redis.hget(TABLES_KEY, "main"))["game_id"] == 1
+
+        assert await reader.is_active_game(1)
+        assert await reader.get_game_players(1) == {10}
+        assert (await reader.get_table("main"))["phase"] == "accepting_bets"
+
+        # Запись в обход менеджера не видна, пока жив локальный кэш
+        await redis.sadd(GAMES_KEY, 2)
+        assert not await reader.is_active_game(2)
+
+        listener = asyncio.create_task(reader.listen())
+        await asyncio.sleep(0.1)
+        # Инвалидация от другого воркера сбрасывает кэш сразу, не дожидаясь TTL
+        await writer.remove_game(1)
+        await writer.set_table_round("main", 3, "spinning", 200.0)
+        await asyncio.sleep(0.1)
+        assert not await reader.is_active_game(1)
+        assert await reader.is_active_game(2)
+        assert await reader.get_game_players(1) == set()
+        assert (await reader.get_table("main"))["game_id"] == 3
+
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_local_cache_expires_after_ttl():
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        manager = RedisGameManager(redis, cache_ttl=0.05)
+        assert not await manager.is_active_game(1)
+        await redis.sadd(GAMES_KEY, 1)
+        assert not await manager.is_active_game(1)
+        await asyncio.sleep(0.1)
+        assert await manager.is_active_game(1)
+
+    asyncio.run(scenario())
+
+
+def test_listener_closes_pubsub_on_reconnect():
+    """Каждая упавшая подписка закрывается перед переподключением"""
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        created, closed = [], []
+        make_pubsub = redis.pubsub
+
+        def pubsub():
+            ps = make_pubsub()
+            created.append(ps)
+            aclose = ps.aclose
+
+            async def track_close():
+                closed.append(ps)
+                await aclose()
+
+            ps.aclose = track_close
+            if len(created) == 1:
+                async def broken(*args):
+                    raise ConnectionError("connection lost")
+                ps.subscribe = broken
+            return ps
+
+        redis.pubsub = pubsub
+        manager = RedisGameManager(redis)
+        listener = asyncio.create_task(manager.listen())
+        for _ in range(30):
+            if len(created) >= 2:
+                break
+            await asyncio.sleep(0.1)
+        assert closed == created[:1]
+
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        assert closed == created
+
+    asyncio.run(scenario())
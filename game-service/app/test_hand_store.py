@@ -0,0 +1,222 @@
+import asyncio
+from datetime import datetime
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import blackjack, hand_store
+from app.database import Base, BlackjackGame, BlackjackGameStatus
+from app.hand_store import encode_hand, decode_hand
+
+
+def test_hand_roundtrip():
+    """Раздача переживает упаковку в хеш Redis без потерь"""
+    game = BlackjackGame(
+        id=7,
+        user_id=42,
+        bet_amount=12.5,
+        status=BlackjackGameStatus.PLAYER_TURN,
+        player_cards=["10", "A"],
+        player_score=21,
+        dealer_cards=["K", "?"],
+        dealer_score=10,
+        created_at=datetime(2024, 1, 1, 12, 30),
+        win_amount=25.0,
+        is_winner=True,
+        is_push=False,
+    )
+
+    data = encode_hand(game)
+    assert all(isinstance(v, str) for v in data.values())
+
+    restored = decode_hand(7, data)
+    assert restored.id == 7
+    assert restored.user_id == 42
+    assert restored.bet_amount == 12.5
+    assert restored.status == BlackjackGameStatus.PLAYER_TURN
+    assert restored.player_cards == ["10", "A"]
+    assert restored.dealer_cards == ["K", "?"]
+    assert restored.player_score == 21
+    assert restored.dealer_score == 10
+    assert restored.created_at == game.created_at
+    assert (restored.win_amount, restored.is_winner, restored.is_push) == (25.0, True, False)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """Redis с Lua-скриптами: раздача и CAS проверяются настоящими скриптами модуля"""
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(hand_store, "redis_client", fake)
+    monkeypatch.setattr(hand_store, "_save_script", fake.register_script(hand_store.SAVE_SCRIPT))
+    monkeypatch.setattr(hand_store, "_drop_if_unchanged_script",
+                        fake.register_script(hand_store.DROP_IF_UNCHANGED_SCRIPT))
+    return fake
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield sessionmaker(bind=engine)(), async_sessionmaker(async_engine, expire_on_commit=False)
+    engine.dispose()
+
+
+def open_hand(db) -> BlackjackGame:
+    # 5 очков - hit не может перебрать, раздача после него продолжается
+    game = BlackjackGame(id=5, user_id=1, bet_amount=10.0, status=BlackjackGameStatus.PLAYER_TURN,
+                         player_cards=["2", "3"], player_score=5, dealer_cards=["9", "?"], dealer_score=9,
+                         created_at=datetime(2024, 1, 1), version=0)
+    db.add(game)
+    db.commit()
+    return game
+
+
+def test_hit_racing_stand_never_settles_a_stale_hand(redis, sessions, monkeypatch):
+    db, AsyncTestingSession = sessions
+    open_hand(db)
+    payouts = []
+
+    async def fake_pay_out(game, authorization):
+        payouts.append(list(game.player_cards))
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(blackjack, "pay_out", fake_pay_out)
+    monkeypatch.setattr(blackjack.leaderboard, "record", noop)
+    monkeypatch.setattr(blackjack.history, "invalidate_first_page", noop)
+
+    # Оба запроса читают раздачу с одного и того же хода, прежде чем кто-то запишет
+    loaded = asyncio.Barrier(2)
+    load_hand = hand_store.load_hand
+
+    async def load_together(session, game_id, user_id):
+        game = await load_hand(session, game_id, user_id)
+        await loaded.wait()
+        return game
+
+    monkeypatch.setattr(hand_store, "load_hand", load_together)
+
+    async def act(action: str):
+        async with AsyncTestingSession() as session:
+            return await blackjack.player_action(5, blackjack.BlackjackActionRequest(action=action),
+                                                 db=session, user_id=1, authorization="Bearer t")
+
+    async def run():
+        results = await asyncio.gather(act("hit"), act("stand"), return_exceptions=True)
+        return results, await redis.hgetall(hand_store.HAND_KEY.format(5))
+
+    (hit, stand), hand = asyncio.run(run())
+    outcomes = [r for r in (hit, stand) if not isinstance(r, Exception)]
+    conflicts = [r for r in (hit, stand) if isinstance(r, HTTPException)]
+    assert len(outcomes) == 1 and len(conflicts) == 1 and conflicts[0].status_code == 409
+
+    db.expire_all()
+    stored = db.get(BlackjackGame, 5)
+    if isinstance(stand, HTTPException):
+        # Прошел hit: раздача продолжается в Redis, расчета и выплаты нет
+        assert stored.status == BlackjackGameStatus.PLAYER_TURN
+        assert hand["p"].count(",") == 2 and hand["v"] == "1"
+        assert payouts == []
+    else:
+        # Прошел stand: рассчитана раздача без карты hit, выплата одна
+        assert stored.status == BlackjackGameStatus.FINISHED
+        assert stored.player_cards == ["2", "3"]
+        assert payouts == [["2", "3"]]
+        assert hand == {}
+
+
+def test_sweep_keeps_hand_moved_during_persist(redis, sessions, monkeypatch):
+    db, AsyncTestingSession = sessions
+    game = open_hand(db)
+    db.refresh(game)
+    db.expunge(game)
+    monkeypatch.setattr(hand_store, "AsyncSessionLocal", AsyncTestingSession)
+    monkeypatch.setattr(hand_store, "HAND_IDLE_SECONDS", -1)
+
+    persist_hand = hand_store.persist_hand
+
+    async def persist_then_move(session, snapshot):
+        await persist_hand(session, snapshot)
+        # Игрок делает ход, пока sweep пишет снимок в БД
+        moved = hand_store.decode_hand(5, await redis.hgetall(hand_store.HAND_KEY.format(5)))
+        moved.player_cards.append("4")
+        moved.version = 1
+        assert await hand_store.save_hand(moved, expected_version=0)
+
+    async def run():
+        await hand_store.save_hand(game)
+        monkeypatch.setattr(hand_store, "persist_hand", persist_then_move)
+        await hand_store.sweep_abandoned_hands()
+
+        hand = await redis.hgetall(hand_store.HAND_KEY.format(5))
+        assert hand["v"] == "1" and hand["p"] == "2,3,4"
+        assert await redis.zscore(hand_store.ACTIVE_HANDS_KEY, "5") is not None
+
+        # Без хода в промежутке sweep сбрасывает раздачу и освобождает Redis
+        monkeypatch.setattr(hand_store, "persist_hand", persist_hand)
+        await hand_store.sweep_abandoned_hands()
+        assert await redis.exists(hand_store.HAND_KEY.format(5)) == 0
+        assert await redis.zcard(hand_store.ACTIVE_HANDS_KEY) == 0
+
+    asyncio.run(run())
+    db.expire_all()
+    assert db.get(BlackjackGame, 5).player_cards == ["2", "3", "4"]
+
+
+def test_sweep_settles_hand_claimed_but_not_persisted(redis, sessions, monkeypatch):
+    db, AsyncTestingSession = sessions
+    open_hand(db)
+    monkeypatch.setattr(hand_store, "AsyncSessionLocal", AsyncTestingSession)
+    monkeypatch.setattr(hand_store, "HAND_IDLE_SECONDS", -1)
+    payouts = []
+
+    async def fake_pay_out(game, authorization):
+        payouts.append((game.win_amount, authorization))
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(blackjack, "pay_out", fake_pay_out)
+    monkeypatch.setattr(blackjack.leaderboard, "record", noop)
+    monkeypatch.setattr(blackjack.history, "invalidate_first_page", noop)
+
+    persist_hand = hand_store.persist_hand
+
+    async def failing_persist(session, game):
+        raise RuntimeError("database is unavailable")
+
+    # Стоять на 20 против 19 дилера - выигрыш
+    won = BlackjackGame(id=5, user_id=1, bet_amount=10.0, status=BlackjackGameStatus.FINISHED,
+                        player_cards=["10", "K"], player_score=20, dealer_cards=["9", "K"], dealer_score=19,
+                        created_at=datetime(2024, 1, 1), version=1, win_amount=20.0, is_winner=True,
+                        is_push=False)
+
+    async def run():
+        async with AsyncTestingSession() as session:
+            await hand_store.load_hand(session, 5, 1)
+        monkeypatch.setattr(hand_store, "persist_hand", failing_persist)
+        assert await hand_store.claim_hand(won, expected_version=0)
+        with pytest.raises(RuntimeError):
+            async with AsyncTestingSession() as session:
+                await blackjack.settle_hand(session, won, "Bearer t")
+        # Пока расчет не записан, раздача в Redis - выигрыш, а не проигрыш
+        async with AsyncTestingSession() as session:
+            assert (await hand_store.load_hand(session, 5, 1)).win_amount == 20.0
+
+        monkeypatch.setattr(hand_store, "persist_hand", persist_hand)
+        await hand_store.sweep_abandoned_hands()
+        await hand_store.sweep_abandoned_hands()
+        return await redis.exists(hand_store.HAND_KEY.format(5))
+
+    assert asyncio.run(run()) == 0
+    db.expire_all()
+    stored = db.get(BlackjackGame, 5)
+    assert (stored.status, stored.win_amount, stored.is_winner) == (BlackjackGameStatus.FINISHED, 20.0, True)
+    assert payouts == [(20.0, "Bearer 1")]
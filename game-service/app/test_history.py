@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import (
+    Base, SlotGame, SlotSymbol, BlackjackGame, BlackjackGameStatus, RouletteBet, RouletteBetType
+)
+from app.history import fetch_history
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    start = datetime(2024, 1, 1)
+    for i in range(1, 6):
+        session.add(SlotGame(id=i, user_id=1, bet_amount=1.0, win_amount=0.0, reel1=SlotSymbol.BELL,
+                             created_at=start + timedelta(minutes=3 * i)))
+        session.add(BlackjackGame(id=i, user_id=1, bet_amount=5.0, win_amount=10.0,
+                                  status=BlackjackGameStatus.FINISHED,
+                                  created_at=start + timedelta(minutes=3 * i + 1)))
+        session.add(RouletteBet(id=i, game_id=100, user_id=1, bet_type=RouletteBetType.RED, numbers=[],
+                                amount=2.0, payout_multiplier=2, created_at=start + timedelta(minutes=3 * i + 2)))
+    # Совпадение (created_at, id) между таблицами и чужая игра
+    session.add(SlotGame(id=6, user_id=1, bet_amount=1.0, reel1=SlotSymbol.BELL, created_at=start))
+    session.add(BlackjackGame(id=6, user_id=1, bet_amount=1.0, status=BlackjackGameStatus.FINISHED,
+                              created_at=start))
+    session.add(SlotGame(id=7, user_id=2, bet_amount=1.0, reel1=SlotSymbol.BELL, created_at=start))
+    session.commit()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_keyset_pages_cover_all_games_once(db_session):
+    queries = []
+    listener = lambda *args: queries.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        items, cursor = [], None
+        while True:
+            page = fetch_history(db_session, 1, 4, cursor)
+            items += page["items"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    keys = [(item["created_at"], item["id"], item["game_type"]) for item in items]
+    assert len(items) == 17
+    assert len(set(keys)) == 17
+    assert keys == sorted(keys, reverse=True)
+    assert items[0]["game_type"] == "roulette" and items[0]["round_id"] == 100
+    # Каждая страница - один запрос UNION ALL
+    assert len(queries) == 5
+    assert all("UNION ALL" in q for q in queries)
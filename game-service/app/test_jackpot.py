@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import jackpot
+from app.database import Base, Jackpot, JackpotWin
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """Redis с Lua: сворачивание и розыгрыш идут настоящими скриптами модуля"""
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(jackpot, "redis_client", fake)
+    monkeypatch.setattr(jackpot, "_fold_script", fake.register_script(jackpot.FOLD_SCRIPT))
+    monkeypatch.setattr(jackpot, "_award_script", fake.register_script(jackpot.AWARD_SCRIPT))
+    # Свой круг шардов - глобальный итератор модуля тест не трогает
+    monkeypatch.setattr(jackpot, "_shard_cycle", itertools.cycle(range(jackpot.SHARDS)))
+    return fake
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setattr(jackpot, "AsyncSessionLocal", async_sessionmaker(async_engine, expire_on_commit=False))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_contribution_and_hit_probability_scale_with_bet():
+    assert jackpot.contribution_for(10.0) == round(10.0 * jackpot.CONTRIBUTION_RATE, 6)
+    assert jackpot.hit_probability(10.0) == 10 * jackpot.hit_probability(1.0)
+    assert jackpot.hit_probability(1e12) == 1.0
+
+
+def test_contributions_spread_over_every_shard(redis, db):
+    async def run():
+        for _ in range(jackpot.SHARDS):
+            await jackpot.contribute(100.0)
+        return await redis.mget(jackpot._keys("slots")[2:])
+
+    # Взносы идут по шардам по кругу, а не в один горячий ключ
+    shards = asyncio.run(run())
+    assert all(float(value) == jackpot.contribution_for(100.0) for value in shards)
+
+
+def test_award_takes_everything_once_and_loses_no_concurrent_contributions(redis, db):
+    bets = [float(i % 7 + 1) for i in range(300)]
+    contributed = sum(jackpot.contribution_for(bet) for bet in bets)
+
+    async def run():
+        await jackpot.ensure_jackpot()
+        await jackpot.contribute(50.0)
+        before_award = jackpot.contribution_for(50.0)
+
+        async def contribute_all():
+            for bet in bets:
+                await jackpot.contribute(bet)
+
+        async def fold_repeatedly():
+            for _ in range(5):
+                await jackpot.fold()
+                await asyncio.sleep(0)
+
+        # Взносы, сворачивание и два розыгрыша вперемешку
+        awards = await asyncio.gather(contribute_all(), fold_repeatedly(), jackpot.award(), jackpot.award())
+        won = [awards[2], awards[3]]
+        await jackpot.fold()
+        return before_award, won, await jackpot.current_value()
+
+    before_award, won, remaining = asyncio.run(run())
+    (first_total, first_epoch), (second_total, second_epoch) = sorted(won, key=lambda w: w[1])
+    # Каждый розыгрыш увеличивает эпоху
+    assert (first_epoch, second_epoch) == (1, 2)
+    # Деньги не теряются и не задваиваются: стартовая сумма пула и каждого
+    # сброса плюс все взносы = оба выигрыша плюс текущий джекпот
+    total_in = 3 * jackpot.SEED_AMOUNT + before_award + contributed
+    total_out = first_total + second_total + remaining
+    assert total_out == pytest.approx(total_in, abs=0.05)
+    assert first_total >= jackpot.SEED_AMOUNT + before_award - 0.01
+
+    # Снимок SQL догоняет Redis после последнего сворачивания
+    db.expire_all()
+    snapshot = db.get(Jackpot, "slots")
+    assert snapshot.epoch == 2
+    assert snapshot.amount == pytest.approx(remaining, abs=0.01)
+
+
+def test_record_award_keeps_newer_snapshot(redis, db):
+    async def run():
+        await jackpot.ensure_jackpot()
+        await jackpot.contribute(1000.0)
+        amount, epoch = await jackpot.award()
+        await jackpot.record_award(7, amount, epoch, slot_game_id=3)
+        # Устаревший снимок эпохи 0 (опоздавшее сворачивание) не перетирает новый
+        async with jackpot.AsyncSessionLocal() as session:
+            await jackpot._save_snapshot(session, "slots", 99999.0, 0)
+            await session.commit()
+        return amount
+
+    amount = asyncio.run(run())
+    db.expire_all()
+    win = db.query(JackpotWin).one()
+    assert (win.user_id, win.amount, win.slot_game_id) == (7, amount, 3)
+    snapshot = db.get(Jackpot, "slots")
+    assert (snapshot.amount, snapshot.epoch) == (jackpot.SEED_AMOUNT, 1)
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime
+
+import fakeredis
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.util import await_only
+
+from app import leaderboard
+from app.database import (
+    Base, SlotGame, SlotSymbol, BlackjackGame, BlackjackGameStatus,
+    RouletteGame, RouletteGameStatus, RouletteBet, RouletteBetType
+)
+from app.leaderboard import aggregate_from_sql, board_key, period_window
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_board_keys_and_windows():
+    at = datetime(2024, 1, 3, 15, 0)  # среда
+    assert board_key("slots", "daily", at) == "lb:slots:daily:2024-01-03"
+    assert board_key("slots", "weekly", at) == "lb:slots:weekly:2024-W01"
+    assert board_key("slots", "alltime", at) == "lb:slots:alltime:all"
+    assert period_window("weekly", at) == (datetime(2024, 1, 1), datetime(2024, 1, 8))
+    assert period_window("alltime", at) == (None, None)
+
+
+def test_rebuild_aggregates_net_result_per_user():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        day = datetime(2024, 1, 3, 12, 0)
+        db.add_all([
+            SlotGame(user_id=1, bet_amount=2.0, win_amount=10.0, reel1=SlotSymbol.BELL, created_at=day),
+            SlotGame(user_id=1, bet_amount=2.0, win_amount=0.0, reel1=SlotSymbol.BELL, created_at=day),
+            SlotGame(user_id=2, bet_amount=5.0, win_amount=0.0, reel1=SlotSymbol.BELL,
+                     created_at=datetime(2024, 1, 2)),
+            BlackjackGame(user_id=1, bet_amount=10.0, win_amount=20.0,
+                          status=BlackjackGameStatus.FINISHED, created_at=day),
+            # Незавершенная раздача в доску не попадает
+            BlackjackGame(user_id=2, bet_amount=10.0, win_amount=0.0,
+                          status=BlackjackGameStatus.PLAYER_TURN, created_at=day),
+            # Ставка сделана накануне, раунд рассчитан в этот день - очки в доске дня расчета
+            RouletteGame(id=1, status=RouletteGameStatus.FINISHED, finished_at=day),
+            RouletteBet(game_id=1, user_id=3, bet_type=RouletteBetType.RED, numbers=[], amount=5.0,
+                        payout_multiplier=2, is_winner=True, payout_amount=10.0,
+                        created_at=datetime(2024, 1, 2, 23, 59)),
+            RouletteBet(game_id=1, user_id=3, bet_type=RouletteBetType.BLACK, numbers=[], amount=5.0,
+                        payout_multiplier=2, is_winner=False, payout_amount=0.0, created_at=day),
+        ])
+        db.commit()
+
+        assert aggregate_from_sql(db, "slots") == {1: 6.0, 2: -5.0}
+        assert aggregate_from_sql(db, "slots", *period_window("daily", day)) == {1: 6.0}
+        assert aggregate_from_sql(db, "blackjack") == {1: 10.0}
+        assert aggregate_from_sql(db, "roulette") == {3: 0.0}
+        assert aggregate_from_sql(db, "roulette", *period_window("daily", day)) == {3: 0.0}
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_rebuild_keeps_scores_recorded_while_it_runs(monkeypatch, tmp_path):
+    path = tmp_path / "test.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=sync_engine)
+    day = datetime(2024, 1, 3, 12, 0)
+    with sessionmaker(bind=sync_engine)() as db:
+        db.add(SlotGame(user_id=1, bet_amount=2.0, win_amount=10.0, reel1=SlotSymbol.BELL, created_at=day))
+        db.commit()
+
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(leaderboard, "redis_client", fake)
+    monkeypatch.setattr(leaderboard, "_record_script", fake.register_script(leaderboard.RECORD_SCRIPT))
+    monkeypatch.setattr(leaderboard, "_swap_script", fake.register_script(leaderboard.SWAP_SCRIPT))
+
+    aggregate = leaderboard.aggregate_from_sql
+
+    def aggregate_with_concurrent_game(session, game_type, since=None, until=None):
+        scores = aggregate(session, game_type, since, until)
+        # Игра рассчитывается, пока пересборка читает SQL: ее нет в снимке
+        if game_type == "slots":
+            await_only(leaderboard.record("slots", 2, 7.0, at=day))
+        return scores
+
+    monkeypatch.setattr(leaderboard, "aggregate_from_sql", aggregate_with_concurrent_game)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async def run():
+        await leaderboard.record("slots", 1, 100.0, at=day)  # расхождение, которое пересборка исправит
+        async with AsyncSession(async_engine) as session:
+            await leaderboard.rebuild(session, day, periods=("daily",))
+        await async_engine.dispose()
+        key = board_key("slots", "daily", day)
+        return (await fake.zrange(key, 0, -1, withscores=True), await fake.ttl(key),
+                await fake.keys(f"{key}:*"))
+
+    board, ttl, leftovers = asyncio.run(run())
+    sync_engine.dispose()
+    assert board == [("2", 7.0), ("1", 8.0)]
+    assert ttl > 0
+    assert leftovers == []
@@ -0,0 +1,48 @@
+import time
+import asyncio
+
+from app import lobby
+
+
+def test_sources_run_concurrently_with_partial_results():
+    async def balance():
+        await asyncio.sleep(0.1)
+        return 250.0
+
+    async def games():
+        await asyncio.sleep(0.1)
+        return [{"id": 1}]
+
+    async def slow():
+        await asyncio.sleep(5)
+        return []
+
+    async def broken():
+        raise RuntimeError("notification service down")
+
+    sources = {"balance": balance, "roulette_games": games, "slots_history": slow, "notifications": broken}
+    timeouts = {"balance": 1.0, "roulette_games": 1.0, "slots_history": 0.2, "notifications": 1.0}
+
+    started = time.perf_counter()
+    data, errors = asyncio.run(lobby.fetch_sources(sources, timeouts))
+    elapsed = time.perf_counter() - started
+
+    # Источники опрашиваются параллельно, медленный обрезан своим таймаутом
+    assert elapsed < 0.5
+    assert data == {"balance": 250.0, "roulette_games": [{"id": 1}], "slots_history": None, "notifications": None}
+    assert errors == {"slots_history": "timeout", "notifications": "error"}
+
+
+def test_snapshot_marks_partial():
+    async def ok():
+        return 1
+
+    async def broken():
+        raise RuntimeError("down")
+
+    full = asyncio.run(lobby.build_snapshot(7, {"balance": ok}))
+    assert full["partial"] is False and full["balance"] == 1 and full["user_id"] == 7
+
+    partial = asyncio.run(lobby.build_snapshot(7, {"balance": ok, "notifications": broken}))
+    assert partial["partial"] is True
+    assert partial["errors"] == {"notifications": "error"}
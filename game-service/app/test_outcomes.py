@@ -0,0 +1,94 @@
+import asyncio
+import random
+from collections import Counter
+
+import fakeredis
+import pytest
+
+from app.outcomes import (
+    BufferedOutcomeSource, OutcomeSource, SeedChain, SeedChainManager, RedisSeedChainManager,
+    SeededOutcomeSource, commit_seed, hash_seed, roulette_number, verify_chain, verify_seed,
+)
+
+
+def test_buffered_source_is_unbiased_and_reads_in_blocks():
+    """Числа равномерны, а энтропия берется редкими большими блоками"""
+    rnd = random.Random(1)
+    reads = []
+
+    def entropy(n):
+        reads.append(n)
+        return rnd.randbytes(n)
+
+    source = BufferedOutcomeSource(buffer_size=4096, entropy=entropy)
+    counts = Counter(source.randint(0, 36) for _ in range(74_000))
+    assert set(counts) == set(range(37))
+    # Ожидаем по 2000 на число; хи-квадрат с 36 степенями свободы
+    chi2 = sum((c - 2000) ** 2 / 2000 for c in counts.values())
+    assert chi2 < 70
+    assert len(reads) < 74_000 * 2 / 4096 + 2
+    assert all(0 <= source.random() < 1 for _ in range(1000))
+    with pytest.raises(IndexError):
+        source.choice([])
+
+
+def test_seeded_source_is_reproducible():
+    seed = bytes(range(32))
+    first = [SeededOutcomeSource(seed, "roulette:7").randint(0, 36) for _ in range(3)]
+    assert len(set(first)) == 1
+    assert roulette_number(seed, 7) == first[0]
+    a, b = SeededOutcomeSource(seed, "x"), SeededOutcomeSource(seed, "x")
+    assert [a.randbelow(1000) for _ in range(50)] == [b.randbelow(1000) for _ in range(50)]
+
+
+def test_source_without_byte_stream_cannot_be_created():
+    with pytest.raises(TypeError):
+        OutcomeSource()
+
+
+def test_seed_chain_links_rounds_to_anchor():
+    chain = SeedChain(length=20, terminal_seed=b"terminal")
+    issued = [chain.next_seed() for _ in range(20)]
+    assert chain.next_seed() is None
+    assert [index for index, _ in issued] == list(range(1, 21))
+    assert verify_chain([seed for _, seed in issued], chain.anchor)
+    assert hash_seed(issued[5][1]) == issued[4][1]
+    assert verify_seed(issued[9][1], chain.anchor, 10)
+    assert not verify_seed(issued[9][1], chain.anchor, 9)
+
+    manager = SeedChainManager(length=2)
+
+    async def issue():
+        return [(await manager.next_seed())[0] for _ in range(3)], await manager.anchors()
+
+    anchors, published = asyncio.run(issue())
+    # Третий раунд уже из новой цепочки
+    assert anchors[0] == anchors[1] != anchors[2]
+    assert published == [anchors[0], anchors[2]]
+
+
+def test_commitment_does_not_reveal_previous_round_seed():
+    chain = SeedChain(length=5)
+    (_, previous), (_, current) = chain.next_seed(), chain.next_seed()
+    # sha256 сида - это сид предыдущего раунда, поэтому публикуется HMAC с меткой
+    assert hash_seed(current) == previous
+    assert commit_seed(current) not in (previous, hash_seed(current))
+
+
+def test_redis_seed_chain_is_shared_by_workers_and_survives_restart():
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        first, second = RedisSeedChainManager(redis, length=3), RedisSeedChainManager(redis, length=3)
+        issued = [await manager.next_seed() for manager in (first, second, first, second)]
+        # Перезапуск воркера: новая память процесса, та же цепочка
+        restarted = RedisSeedChainManager(redis, length=3)
+        issued.append(await restarted.next_seed())
+        return issued, await restarted.anchors()
+
+    issued, anchors = asyncio.run(scenario())
+    assert [(anchor, index) for anchor, index, _ in issued] == [
+        (anchors[0], 1), (anchors[0], 2), (anchors[0], 3), (anchors[1], 1), (anchors[1], 2)
+    ]
+    assert len(anchors) == 2
+    assert all(verify_seed(seed, anchor, index) for anchor, index, seed in issued)
+    assert len({seed for _, _, seed in issued}) == 5
@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+
+from app.database import SlotSymbol
+from app.reels import AliasTable, SlotMachine, CLASSIC_PAYOUTS, MACHINES, SYMBOLS
+
+
+def test_alias_table_matches_weights():
+    """Частоты выборки совпадают с весами - и поштучно, и пачкой"""
+    weights = [10, 1, 0, 5, 3, 1]
+    expected = np.array(weights) / sum(weights)
+
+    table = AliasTable(weights)
+    batch = table.sample_batch(np.random.default_rng(7), 500_000)
+    assert np.abs(np.bincount(batch, minlength=6) / 500_000 - expected).max() < 0.003
+
+    rnd = random.Random(7)
+    single = [table.sample(rnd.random) for _ in range(100_000)]
+    assert np.abs(np.bincount(single, minlength=6) / 100_000 - expected).max() < 0.006
+    assert 2 not in single
+
+
+def test_classic_machine_keeps_old_rtp():
+    """Классическая машина - равные веса и прежние выплаты"""
+    classic = MACHINES["classic"]
+    assert abs(classic.exact_rtp() - sum(CLASSIC_PAYOUTS.values()) / 216) < 1e-12
+    assert classic.multiplier([SlotSymbol.SEVEN] * 3) == 50
+    assert classic.multiplier([SlotSymbol.SEVEN, SlotSymbol.BELL, SlotSymbol.SEVEN]) == 0
+
+
+def test_weighted_machine_batch_matches_exact_rtp():
+    """Взвешенные барабаны: симуляция пачкой сходится к точному RTP"""
+    reel = {symbol: 1.0 for symbol in SYMBOLS}
+    reel[SlotSymbol.CHERRY] = 6.0
+    machine = SlotMachine("cherry", [reel, reel, reel], CLASSIC_PAYOUTS)
+
+    ids, multipliers = machine.spin_batch(np.random.default_rng(1), 1_000_000)
+    assert ids.shape == (1_000_000, 3)
+    assert abs(multipliers.mean() - machine.exact_rtp()) < 0.01
+    # Вишня 6/11 на каждом барабане, остальные символы по 1/11
+    assert abs(machine.exact_rtp() - (2 * 6 ** 3 + 83) / 11 ** 3) < 1e-12
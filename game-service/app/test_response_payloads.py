@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from app.blackjack import BlackjackGameResponse, game_payload as blackjack_payload
+from app.database import (
+    BlackjackGame, BlackjackGameStatus, RouletteGame, RouletteGameStatus, RouletteBet, RouletteBetType
+)
+from app.roulette import RouletteGameResponse, game_payload as roulette_payload
+
+
+def assert_matches_model(payload: dict, model):
+    """Быстрый ответ совпадает с тем, что отдал бы стандартный путь через response_model"""
+    body = orjson.loads(ORJSONResponse(payload).body)
+    assert body == orjson.loads(model.model_validate(payload).model_dump_json())
+
+
+def test_blackjack_payload_matches_response_model():
+    game = BlackjackGame(
+        id=3, user_id=42, bet_amount=10.0, status=BlackjackGameStatus.FINISHED,
+        player_cards=["10", "A"], player_score=21, dealer_cards=["K", "7"], dealer_score=17,
+        win_amount=20.0, is_winner=True, is_push=False, created_at=datetime(2024, 1, 1, 12, 30, 0, 123456)
+    )
+    assert_matches_model(blackjack_payload(game), BlackjackGameResponse)
+
+
+def test_roulette_payload_matches_response_model():
+    game = RouletteGame(id=5, status=RouletteGameStatus.FINISHED, winning_number=17, winning_color="black",
+                        created_at=datetime(2024, 1, 1), finished_at=datetime(2024, 1, 1, 0, 1),
+                        server_seed_hash="ab" * 32)
+    bets = [
+        RouletteBet(id=1, game_id=5, user_id=1, bet_type=RouletteBetType.STRAIGHT, numbers=[17], amount=1.0,
+                    payout_multiplier=36, created_at=datetime(2024, 1, 1), is_winner=True, payout_amount=36.0),
+        RouletteBet(id=2, game_id=5, user_id=2, bet_type=RouletteBetType.RED, numbers=[], amount=2.0,
+                    payout_multiplier=2, created_at=datetime(2024, 1, 1), is_winner=False, payout_amount=0.0),
+    ]
+    assert_matches_model(roulette_payload(game, bets), RouletteGameResponse)
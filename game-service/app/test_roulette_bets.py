@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from app.database import RouletteBetType
+from app.roulette_bets import (
+    InvalidBetError, RED_NUMBERS, build_bet_mask, mask_of, settle_round
+)
+
+
+def covered(mask: int):
+    return [n for n in range(37) if mask >> n & 1]
+
+
+@pytest.mark.parametrize("bet_type, numbers, expected", [
+    (RouletteBetType.STRAIGHT, [17], [17]),
+    (RouletteBetType.SPLIT, [17, 20], [17, 20]),
+    (RouletteBetType.SPLIT, [0, 2], [0, 2]),
+    (RouletteBetType.STREET, [13, 14, 15], [13, 14, 15]),
+    (RouletteBetType.CORNER, [17, 18, 20, 21], [17, 18, 20, 21]),
+    (RouletteBetType.LOW, [], list(range(1, 19))),
+    (RouletteBetType.HIGH, [], list(range(19, 37))),
+    (RouletteBetType.DOZEN, [2], list(range(13, 25))),
+    (RouletteBetType.COLUMN, [1], list(range(1, 37, 3))),
+    (RouletteBetType.RED, [], sorted(RED_NUMBERS)),
+    (RouletteBetType.EVEN, [], list(range(2, 37, 2))),
+])
+def test_bet_masks(bet_type, numbers, expected):
+    assert covered(build_bet_mask(bet_type, numbers)) == expected
+
+
+@pytest.mark.parametrize("bet_type, numbers", [
+    (RouletteBetType.STRAIGHT, [37]),
+    (RouletteBetType.STRAIGHT, [1, 2]),
+    (RouletteBetType.SPLIT, [3, 4]),
+    (RouletteBetType.STREET, [2, 3, 4]),
+    (RouletteBetType.CORNER, [3, 4, 6, 7]),
+    (RouletteBetType.DOZEN, [4]),
+])
+def test_invalid_bets_rejected(bet_type, numbers):
+    with pytest.raises(InvalidBetError):
+        build_bet_mask(bet_type, numbers)
+
+
+def test_settle_round_matches_scalar_check():
+    """Векторный расчет совпадает с проверкой каждой ставки по отдельности"""
+    masks = [mask_of([0]), mask_of(range(1, 19)), build_bet_mask(RouletteBetType.RED, []), mask_of([5, 8])]
+    amounts = np.array([10.0, 20.0, 5.0, 1.0])
+    multipliers = np.array([36.0, 2.0, 2.0, 18.0])
+
+    for winning_number in range(37):
+        winners, payouts = settle_round(np.array(masks, dtype=np.uint64), amounts, multipliers, winning_number)
+        for i, mask in enumerate(masks):
+            hit = winning_number in covered(mask)
+            assert winners[i] == hit
+            assert payouts[i] == (amounts[i] * multipliers[i] if hit else 0.0)
+
+
+@pytest.mark.parametrize("bet_type, numbers", [
+    (RouletteBetType.STRAIGHT, [17]),
+    (RouletteBetType.SPLIT, [17, 20]),
+    (RouletteBetType.STREET, [16, 17, 18]),
+    (RouletteBetType.CORNER, [17, 18, 20, 21]),
+    (RouletteBetType.RED, []),
+    (RouletteBetType.EVEN, []),
+    (RouletteBetType.HIGH, []),
+    (RouletteBetType.DOZEN, [2]),
+    (RouletteBetType.COLUMN, [2]),
+])
+def test_pay_table_is_total_return(bet_type, numbers):
+    """Множитель - полный возврат: у любой ставки одно и то же ожидание 36/37"""
+    from app.roulette import PAYOUT_MULTIPLIERS
+
+    mask = build_bet_mask(bet_type, numbers)
+    assert len(covered(mask)) * PAYOUT_MULTIPLIERS[bet_type.value] == 36
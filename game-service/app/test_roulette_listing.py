@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, get_async_db, RouletteGame, RouletteBet, RouletteGameStatus, RouletteBetType
+from app.roulette import router
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """Тестовая БД в файле: синхронный движок для подготовки, асинхронный - для эндпоинтов"""
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    yield engine, async_engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engines):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engines[0])()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(engines):
+    AsyncTestingSession = async_sessionmaker(engines[1], expire_on_commit=False)
+
+    async def override_db():
+        async with AsyncTestingSession() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_db] = override_db
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def games(db_session):
+    """5 активных игр по 2 ставки и 1 завершенная"""
+    start = datetime(2024, 1, 1)
+    for i in range(6):
+        status = RouletteGameStatus.FINISHED if i == 0 else RouletteGameStatus.ACCEPTING_BETS
+        game = RouletteGame(status=status, created_at=start + timedelta(minutes=i))
+        db_session.add(game)
+        db_session.flush()
+        for amount in (1.0, 2.5):
+            db_session.add(RouletteBet(game_id=game.id, user_id=1, bet_type=RouletteBetType.RED,
+                                       numbers=[], amount=amount, payout_multiplier=2))
+    db_session.commit()
+
+
+def test_listing_is_paged_and_batched(client, games, engines):
+    engine = engines[1].sync_engine
+    queries = []
+    listener = lambda *args: queries.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        first = client.get("/roulette/games", params={"limit": 3}).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    # Одна выборка игр + одна выборка ставок, независимо от числа игр
+    assert len(queries) == 2
+    assert [g["id"] for g in first["games"]] == [6, 5, 4]
+    assert all(len(g["current_bets"]) == 2 for g in first["games"])
+
+    second = client.get("/roulette/games", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+    # Завершенная игра 1 по умолчанию не попадает в ленту
+    assert [g["id"] for g in second["games"]] == [3, 2]
+    assert second["next_cursor"] is None
+
+
+def test_listing_summary_and_status_filter(client, games):
+    data = client.get("/roulette/games", params={"status": "finished", "bets": "summary"}).json()
+    assert [g["id"] for g in data["games"]] == [1]
+    assert data["games"][0]["bet_count"] == 2
+    assert data["games"][0]["bet_total"] == 3.5
+    assert "current_bets" not in data["games"][0]
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import MetaData, Table, create_engine, event, inspect, text
+from sqlalchemy.orm import Session
+
+from app.database import Base, BlackjackGame, RouletteGame, RouletteGameStatus, SlotGame
+from app.schema import ADDED_COLUMNS, upgrade_schema
+
+
+def create_old_schema(engine):
+    """Таблицы моделей без колонок и индексов, которых не было в первой версии схемы"""
+    added = {(table, column) for table, column, _ in ADDED_COLUMNS}
+    old = MetaData()
+    for table in Base.metadata.sorted_tables:
+        Table(table.name, old, *[
+            column._copy() for column in table.columns if (table.name, column.name) not in added
+        ])
+    old.create_all(bind=engine)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_old_schema_is_upgraded_to_models(engine):
+    create_old_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO roulette_games (id, status, created_at) "
+                          "VALUES (1, 'FINISHED', '2024-01-01 00:00:00')"))
+        conn.execute(text("INSERT INTO slot_games (id, user_id, bet_amount, created_at) "
+                          "VALUES (1, 7, 1.0, '2024-01-01 00:00:00')"))
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        assert columns == {c.name for c in table.columns}
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes
+
+    with Session(engine) as db:
+        old_game = db.get(RouletteGame, 1)
+        assert old_game.version == 0 and old_game.server_seed_hash is None
+        assert db.get(SlotGame, 1).machine == "classic"
+        db.add(RouletteGame(status=RouletteGameStatus.WAITING, user_id=7, created_at=datetime(2024, 1, 2)))
+        db.add(BlackjackGame(user_id=7, bet_amount=1.0))
+        db.commit()
+
+
+def test_upgrade_is_noop_on_fresh_schema(engine):
+    Base.metadata.create_all(bind=engine)
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        upgrade_schema(engine)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert not [s for s in statements if s.startswith(("ALTER", "CREATE"))]
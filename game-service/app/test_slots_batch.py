@@ -0,0 +1,181 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import slots
+from app.database import Base, get_async_db, SlotGame, SlotSymbol
+from app.dependencies import get_current_user_id
+from app.reels import MACHINES
+
+
+class FixedMachine:
+    """Машина с заранее заданной лентой результатов"""
+    name = "fixed"
+
+    def __init__(self, multipliers):
+        self.multipliers = list(multipliers)
+
+    def spin(self, uniform=None):
+        return [SlotSymbol.CHERRY] * 3
+
+    def multiplier(self, reels):
+        return self.multipliers.pop(0)
+
+
+def test_autoplay_stop_conditions():
+    """Серия прерывается по крупному выигрышу, по балансу и по нехватке денег"""
+    result = slots.run_autoplay(FixedMachine([0, 0, 20, 0]), 1.0, 4, 100.0, stop_on_win_above=10)
+    assert result["stop_reason"] == "win_above"
+    assert len(result["results"]) == 3
+    assert result["net"] == 17.0 and result["balance"] == 117.0
+
+    result = slots.run_autoplay(FixedMachine([0] * 10), 1.0, 10, 100.0, stop_on_balance_below=97)
+    assert result["stop_reason"] == "balance_below"
+    assert len(result["results"]) == 4
+
+    result = slots.run_autoplay(FixedMachine([0] * 10), 2.0, 10, 5.0)
+    assert result["stop_reason"] == "insufficient_funds"
+    assert result["total_bet"] == 4.0
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    # Один файл БД: эндпоинт пишет через aiosqlite, тест читает синхронной сессией
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    AsyncTestingSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_db():
+        async with AsyncTestingSession() as async_session:
+            yield async_session
+    calls = {"wallet": [], "events": [], "leaderboard": [], "jackpot": [], "balance": 1000.0}
+
+    async def fake_balance(authorization):
+        return calls["balance"]
+
+    async def fake_transaction(authorization, transaction_type, amount, action):
+        if calls.get("reject_bet") and transaction_type == "bet":
+            raise slots.HTTPException(status_code=400, detail="Bet failed: insufficient funds")
+        calls["wallet"].append((transaction_type, amount))
+
+    async def fake_events(*args):
+        calls["events"].append(args)
+
+    async def fake_record(*args, at=None):
+        calls["leaderboard"].append(args)
+
+    async def fake_contribute(bet_amount):
+        calls["jackpot"].append(bet_amount)
+
+    monkeypatch.setattr(slots, "get_wallet_balance", fake_balance)
+    monkeypatch.setattr(slots, "wallet_transaction", fake_transaction)
+    monkeypatch.setattr(slots, "send_autoplay_events", fake_events)
+    monkeypatch.setattr(slots.leaderboard, "record", fake_record)
+    monkeypatch.setattr(slots.history, "invalidate_first_page", fake_events)
+    monkeypatch.setattr(slots.jackpot, "contribute", fake_contribute)
+    monkeypatch.setattr(slots.jackpot, "hit_probability", lambda bet_amount: 0.0)
+
+    app = FastAPI()
+    app.include_router(slots.router)
+    app.dependency_overrides[get_async_db] = override_db
+    app.dependency_overrides[get_current_user_id] = lambda: 7
+    with TestClient(app) as c:
+        yield c, session, calls, async_engine.sync_engine
+    session.close()
+    engine.dispose()
+
+
+def test_batch_settles_once_and_inserts_once(client):
+    c, session, calls, engine = client
+    inserts = []
+    listener = lambda *args: inserts.append(args[2]) if args[2].startswith("INSERT") else None
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = c.post("/slots/spin/batch", json={"bet_amount": 1.0, "spins": 200},
+                          headers={"Authorization": "Bearer t"})
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    data = response.json()
+    assert response.status_code == 200
+    assert data["spins_played"] == 200
+    # Одна вставка всех спинов, списание ставки до игры и одно зачисление, одно событие analytics
+    assert len(inserts) == 1
+    assert calls["wallet"] == [("bet", 200.0), ("win", pytest.approx(data["total_win"]))]
+    assert len(calls["events"]) == 2  # агрегат в analytics + сброс кэша истории
+    assert calls["leaderboard"] == [("slots", 7, pytest.approx(data["net"]))]
+    # Доля всех ставок серии - в джекпот, как у обычного спина
+    assert calls["jackpot"] == [200.0]
+
+    games = session.query(SlotGame).filter(SlotGame.user_id == 7).all()
+    assert len(games) == 200
+    assert sum(g.win_amount for g in games) == pytest.approx(data["total_win"])
+    classic = MACHINES["classic"]
+    assert all(s["payout_multiplier"] == classic.multiplier([SlotSymbol(r) for r in s["reels"]])
+               for s in data["spins"])
+
+
+def test_batch_rejects_too_many_spins(client):
+    c, _, _, _ = client
+    response = c.post("/slots/spin/batch", json={"bet_amount": 1.0, "spins": slots.MAX_BATCH_SPINS + 1},
+                      headers={"Authorization": "Bearer t"})
+    assert response.status_code == 400
+
+
+def test_batch_is_not_played_when_stake_debit_fails(client):
+    """Отказ кошелька на списании: ни спинов, ни зачисления выигрышей"""
+    c, session, calls, _ = client
+    calls["reject_bet"] = True
+    response = c.post("/slots/spin/batch", json={"bet_amount": 1.0, "spins": 50},
+                      headers={"Authorization": "Bearer t"})
+    assert response.status_code == 400
+    assert calls["wallet"] == []
+    assert session.query(SlotGame).count() == 0
+
+
+def test_unplayed_stake_is_refunded_with_winnings(client, monkeypatch):
+    c, _, calls, _ = client
+    monkeypatch.setitem(slots.MACHINES, "fixed", FixedMachine([0, 0, 20]))
+    response = c.post("/slots/spin/batch", json={"bet_amount": 1.0, "spins": 10, "machine": "fixed",
+                                                 "stop_on_win_above": 10},
+                      headers={"Authorization": "Bearer t"})
+    assert response.json()["spins_played"] == 3
+    # Списано 10, сыграно 3: возврат 7 и выигрыш 20 одной транзакцией
+    assert calls["wallet"] == [("bet", 10.0), ("win", 27.0)]
+
+
+def test_stake_is_refunded_when_spins_are_not_saved(client, monkeypatch):
+    c, session, calls, _ = client
+
+    def broken_insert(table):
+        raise RuntimeError("database is unavailable")
+
+    monkeypatch.setattr(slots, "insert", broken_insert)
+    response = c.post("/slots/spin/batch", json={"bet_amount": 1.0, "spins": 50},
+                      headers={"Authorization": "Bearer t"})
+    assert response.status_code == 500
+    assert calls["wallet"] == [("bet", 50.0), ("win", 50.0)]
+    assert session.query(SlotGame).count() == 0
+
+
+def test_series_is_capped_by_balance(client, monkeypatch):
+    """Денег меньше, чем на всю серию: играется то, что покрывает баланс"""
+    c, _, calls, _ = client
+    calls["balance"] = 5.5
+    monkeypatch.setitem(slots.MACHINES, "fixed", FixedMachine([0] * 10))
+    response = c.post("/slots/spin/batch", json={"bet_amount": 1.0, "spins": 10, "machine": "fixed"},
+                      headers={"Authorization": "Bearer t"})
+    data = response.json()
+    assert (data["spins_played"], data["stop_reason"]) == (5, "insufficient_funds")
+    assert calls["wallet"] == [("bet", 5.0), ("win", 0.0)]
+
+    calls["balance"] = 0.5
+    response = c.post("/slots/spin/batch", json={"bet_amount": 1.0, "spins": 10},
+                      headers={"Authorization": "Bearer t"})
+    assert response.status_code == 400
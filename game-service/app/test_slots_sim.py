@@ -0,0 +1,20 @@
+from app.slots import PAYOUT_RULES
+from app.slots_sim import build_payout_table, exact_rtp, simulate
+
+
+def test_payout_table_matches_rules():
+    """Плотная таблица содержит ровно выигрышные комбинации из PAYOUT_RULES"""
+    table = build_payout_table()
+    assert table.shape == (216,)
+    assert (table > 0).sum() == len(PAYOUT_RULES)
+    assert sorted(table[table > 0]) == sorted(PAYOUT_RULES.values())
+
+
+def test_simulated_rtp_matches_expected():
+    """RTP симуляции совпадает с теоретическим в пределах погрешности"""
+    result = simulate(2_000_000, seed=12345, batch_size=500_000)
+    assert result["machine"] == "classic"
+    low, high = result["rtp_ci95"]
+    assert low <= exact_rtp() <= high
+    assert abs(result["hit_rate"] - len(PAYOUT_RULES) / 216) < 0.001
+    assert result["max_multiplier"] == max(PAYOUT_RULES.values())
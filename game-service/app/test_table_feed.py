@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from app import table_feed
+from app.table_feed import TableFeed, table_channel, game_channel
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        if self.fail:
+            raise RuntimeError("closed")
+        await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+
+def test_message_serialized_once_and_broadcast(monkeypatch):
+    dumps_calls = []
+    real_dumps = json.dumps
+    monkeypatch.setattr(table_feed.json, "dumps", lambda *a, **kw: dumps_calls.append(1) or real_dumps(*a, **kw))
+
+    async def run():
+        feed = TableFeed()
+        table_sockets = [FakeWebSocket() for _ in range(50)]
+        game_socket = FakeWebSocket()
+        for ws in table_sockets:
+            await feed.connect(ws, table_channel("t1"))
+        await feed.connect(game_socket, game_channel(7))
+        await feed.publish([game_channel(7), table_channel("t1")], {"type": "round_result", "winning_number": 17})
+        return table_sockets, game_socket
+
+    table_sockets, game_socket = asyncio.run(run())
+    assert len(dumps_calls) == 1
+    # Все подписчики получили один и тот же объект строки
+    assert all(len(ws.sent) == 1 and ws.sent[0] is game_socket.sent[0] for ws in table_sockets)
+    assert json.loads(game_socket.sent[0])["winning_number"] == 17
+
+
+def test_slow_and_failed_subscribers_dropped(monkeypatch):
+    monkeypatch.setattr(table_feed, "SEND_TIMEOUT_SECONDS", 0.05)
+
+    async def run():
+        feed = TableFeed()
+        ok, slow, broken = FakeWebSocket(), FakeWebSocket(delay=1.0), FakeWebSocket(fail=True)
+        for ws in (ok, slow, broken):
+            await feed.connect(ws, table_channel("t1"))
+        await feed.publish([table_channel("t1")], {"type": "phase"})
+        return feed, ok
+
+    feed, ok = asyncio.run(run())
+    assert feed.subscribers[table_channel("t1")] == {ok}
+    assert len(ok.sent) == 1
+
+
+def test_last_subscriber_removes_channel():
+    async def run():
+        feed = TableFeed()
+        ws = FakeWebSocket()
+        await feed.connect(ws, game_channel(1))
+        feed.disconnect(ws, game_channel(1))
+        await feed.publish([game_channel(1)], {"type": "phase"})
+        return feed
+
+    assert asyncio.run(run()).subscribers == {}
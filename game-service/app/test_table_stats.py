@@ -0,0 +1,65 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import roulette
+from app.table_stats import TableStats, result_fields
+
+
+def test_window_evicts_oldest_and_keeps_counters_in_sync():
+    stats = TableStats(window=3)
+
+    async def run():
+        for number in (7, 7, 0, 12):
+            await stats.record("main", number)
+        return await stats.snapshot("main")
+
+    snapshot = asyncio.run(run())
+
+    # Первая 7 вытеснена из окна и вычтена из счетчиков
+    assert snapshot["recent"] == [12, 0, 7]
+    assert snapshot["spins"] == 3
+    assert snapshot["hot"][0]["count"] == 1
+    assert snapshot["colors"] == {"red": 2, "black": 0, "green": 1}
+    assert snapshot["parity"] == {"even": 1, "odd": 1}
+    assert snapshot["dozens"] == {"1": 2, "2": 0, "3": 0}
+    assert snapshot["streak"] == {"color": "red", "length": 1}
+
+    # Счетчики совпадают с полным пересчетом по окну
+    expected = {}
+    for number in snapshot["recent"]:
+        for field in result_fields(number):
+            expected[field] = expected.get(field, 0) + 1
+    assert {k: v for k, v in stats.counts["main"].items() if v} == expected
+
+
+def test_hot_cold_and_streak():
+    stats = TableStats(window=100)
+
+    async def run():
+        await stats.load("main", [5, 5, 5, 17, 32, 32])
+        return await stats.snapshot("main")
+
+    snapshot = asyncio.run(run())
+    assert [h["number"] for h in snapshot["hot"][:3]] == [5, 32, 17]
+    assert snapshot["hot"][0]["count"] == 3
+    # Ни разу не выпадавшие числа - самые холодные
+    assert all(c["count"] == 0 for c in snapshot["cold"])
+    assert snapshot["streak"] == {"color": "red", "length": 2}
+
+
+def test_stats_endpoint(monkeypatch):
+    stats = TableStats(window=10)
+    monkeypatch.setattr(roulette, "table_stats", stats)
+    asyncio.run(stats.record("main", 17))
+
+    app = FastAPI()
+    app.include_router(roulette.router)
+    with TestClient(app) as client:
+        data = client.get("/roulette/tables/main/stats").json()
+        empty = client.get("/roulette/tables/other/stats").json()
+
+    assert data["recent"] == [17]
+    assert data["hot"][0] == {"number": 17, "count": 1}
+    assert empty["spins"] == 0 and empty["streak"]["color"] is None
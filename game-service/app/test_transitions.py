@@ -0,0 +1,192 @@
+import asyncio
+from datetime import datetime
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import roulette, hand_store
+from app.database import (
+    Base, RouletteGame, RouletteGameStatus, RouletteBet, RouletteBetType, BlackjackGame, BlackjackGameStatus
+)
+from app.history import FIRST_PAGE_KEY
+from app.outcomes import SeedChain, commit_seed, roulette_number
+from app.transitions import TransitionConflict
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    """Файловая БД: каждый конкурент работает через свое соединение, как разные воркеры"""
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield sessionmaker(bind=engine)(), async_sessionmaker(async_engine, expire_on_commit=False)
+    engine.dispose()
+
+
+def test_concurrent_spins_settle_round_once(sessions, monkeypatch):
+    db, AsyncTestingSession = sessions
+    db.add(RouletteGame(id=1, status=RouletteGameStatus.ACCEPTING_BETS))
+    db.commit()
+
+    settlements = []
+
+    async def slow_close(game_id):
+        # Держим транзакцию открытой, пока второй конкурент пытается забрать раунд
+        await asyncio.sleep(0.1)
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(roulette.bet_buffer, "close_round", slow_close)
+    monkeypatch.setattr(roulette.bet_buffer, "flush_game", noop)
+    monkeypatch.setattr(roulette.leaderboard, "record_many", noop)
+    monkeypatch.setattr(roulette, "settle_round_sql",
+                        lambda session, game_id, number: settlements.append(game_id) or [])
+
+    async def spin():
+        async with AsyncTestingSession() as session:
+            game = await session.get(RouletteGame, 1)
+            return await roulette.finish_round(session, game)
+
+    async def run():
+        return await asyncio.gather(spin(), spin(), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sorted(type(r).__name__ for r in results) == ["TransitionConflict", "dict"]
+    assert settlements == [1]
+
+    db.expire_all()
+    game = db.get(RouletteGame, 1)
+    assert game.status == RouletteGameStatus.FINISHED
+    assert game.version == 1
+    assert game.winning_number == next(r for r in results if isinstance(r, dict))["winning_number"]
+
+
+def test_finished_round_invalidates_history_of_every_player(sessions, monkeypatch):
+    db, AsyncTestingSession = sessions
+    db.add_all([
+        RouletteGame(id=3, user_id=1, status=RouletteGameStatus.ACCEPTING_BETS),
+        RouletteBet(game_id=3, user_id=1, bet_type=RouletteBetType.RED, numbers=[], amount=5.0),
+        RouletteBet(game_id=3, user_id=2, bet_type=RouletteBetType.ODD, numbers=[], amount=5.0),
+        RouletteBet(game_id=4, user_id=3, bet_type=RouletteBetType.ODD, numbers=[], amount=5.0),
+    ])
+    db.commit()
+
+    async def noop(*args, **kwargs):
+        pass
+
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(roulette.history, "redis_client", fake)
+    monkeypatch.setattr(roulette.bet_buffer, "close_round", noop)
+    monkeypatch.setattr(roulette.bet_buffer, "flush_game", noop)
+    monkeypatch.setattr(roulette.leaderboard, "record_many", noop)
+    monkeypatch.setattr(roulette, "settle_round_sql", lambda session, game_id, number: [])
+
+    async def run():
+        for user_id in (1, 2, 3):
+            await fake.hset(FIRST_PAGE_KEY.format(user_id), "20", "[]")
+        async with AsyncTestingSession() as session:
+            await roulette.finish_round(session, await session.get(RouletteGame, 3))
+        return [user_id for user_id in (1, 2, 3) if await fake.exists(FIRST_PAGE_KEY.format(user_id))]
+
+    # Кэш сброшен у обоих игроков раунда, игрок другой игры не затронут
+    assert asyncio.run(run()) == [3]
+
+
+def test_seed_is_revealed_only_after_earlier_rounds_of_its_chain(sessions):
+    db, AsyncTestingSession = sessions
+    chain = SeedChain(length=2)
+    games = []
+    for game_id in (6, 7):
+        index, seed = chain.next_seed()
+        games.append(RouletteGame(
+            id=game_id, status=RouletteGameStatus.ACCEPTING_BETS, server_seed=seed.hex(),
+            server_seed_hash=commit_seed(seed).hex(), seed_chain_anchor=chain.anchor.hex(),
+            seed_chain_index=index
+        ))
+    # Раунд 7 сыгран раньше раунда 6: его сид хешируется в сид открытого раунда 6
+    games[1].status = RouletteGameStatus.FINISHED
+    games[1].winning_number = roulette_number(chain.seed(2), 7)
+    db.add_all(games)
+    db.commit()
+
+    async def fairness(game_id: int):
+        async with AsyncTestingSession() as session:
+            return await roulette.get_game_fairness(game_id, db=session)
+
+    pending = asyncio.run(fairness(7))
+    assert pending["reveal_pending"] and pending["server_seed"] is None
+
+    games[0].status = RouletteGameStatus.FINISHED
+    games[0].winning_number = roulette_number(chain.seed(1), 6)
+    db.commit()
+    revealed = asyncio.run(fairness(7))
+    assert revealed["server_seed"] == chain.seed(2).hex()
+    assert revealed["verified"] is True
+
+
+def test_personal_game_is_spun_only_by_its_owner(sessions, monkeypatch):
+    db, AsyncTestingSession = sessions
+    db.add(RouletteGame(id=2, user_id=1, status=RouletteGameStatus.ACCEPTING_BETS))
+    db.commit()
+    spun = []
+
+    async def fake_finish_round(session, game):
+        spun.append(game.id)
+        return {"game_id": game.id}
+
+    monkeypatch.setattr(roulette, "finish_round", fake_finish_round)
+
+    async def spin(user_id: int):
+        async with AsyncTestingSession() as session:
+            return await roulette.spin_roulette(2, db=session, user_id=user_id)
+
+    with pytest.raises(HTTPException) as denied:
+        asyncio.run(spin(2))
+    assert denied.value.status_code == 403
+    assert spun == []
+
+    assert asyncio.run(spin(1)) == {"game_id": 2}
+    assert spun == [2]
+
+
+def test_blackjack_hand_settles_once(sessions):
+    db, AsyncTestingSession = sessions
+    db.add(BlackjackGame(id=5, user_id=1, bet_amount=10.0, status=BlackjackGameStatus.PLAYER_TURN,
+                         player_cards=["10", "6"], player_score=16, dealer_cards=["9", "?"], dealer_score=9,
+                         created_at=datetime(2024, 1, 1)))
+    db.commit()
+
+    def finished_hand(win_amount: float) -> BlackjackGame:
+        return BlackjackGame(id=5, user_id=1, bet_amount=10.0, status=BlackjackGameStatus.FINISHED,
+                             player_cards=["10", "6", "3"], player_score=19, dealer_cards=["9", "8"],
+                             dealer_score=17, win_amount=win_amount, is_winner=win_amount > 0,
+                             is_push=False, version=1)
+
+    async def persist(game):
+        async with AsyncTestingSession() as session:
+            await hand_store.persist_hand(session, game)
+
+    async def run():
+        # Два запроса с одного и того же хода: stand и повторный stand
+        return await asyncio.gather(persist(finished_hand(20.0)), persist(finished_hand(20.0)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, TransitionConflict) for r in results) == 1
+
+    # Устаревший снимок из sweep не перетирает рассчитанную раздачу
+    stale = finished_hand(0.0)
+    stale.status, stale.version = BlackjackGameStatus.PLAYER_TURN, 0
+    with pytest.raises(TransitionConflict):
+        asyncio.run(persist(stale))
+
+    db.expire_all()
+    game = db.get(BlackjackGame, 5)
+    assert game.status == BlackjackGameStatus.FINISHED
+    assert game.win_amount == 20.0
@@ -0,0 +1,42 @@
+"""Охраняемые переходы статусов игр.
+
+Проверка "статус еще не FINISHED" и запись нового статуса выполняются
+одним условным UPDATE:
+
+    UPDATE ... SET status = :next, version = version + 1
+    WHERE id = :id AND status IN (:expected) [AND version = :version]
+
+Два запроса или два воркера могут одновременно пройти проверку в
+Python, но UPDATE затронет строку только у одного из них: второй после
+снятия блокировки строки видит уже новый статус и получает rowcount 0.
+Поэтому расчет и выплаты выполняет только тот, кто выиграл переход, -
+без глобальной блокировки и с любым числом воркеров.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TransitionConflict(Exception):
+    """Строку уже перевел другой запрос или воркер"""
+
+
+async def transition(db: AsyncSession, model, row_id: int, expected: Iterable, values: dict,
+                     version: Optional[int] = None) -> None:
+    """Переводит строку из одного из ожидаемых статусов; иначе TransitionConflict.
+
+    Коммит остается за вызывающим кодом - переход фиксируется вместе с
+    остальными изменениями той же транзакции.
+    """
+    expected = list(expected)
+    stmt = update(model).where(model.id == row_id, model.status.in_(expected))
+    if version is not None:
+        stmt = stmt.where(model.version == version)
+    result = await db.execute(
+        stmt.values({model.version: model.version + 1, **values}).execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise TransitionConflict(
+            f"{model.__tablename__} {row_id} is no longer in status {', '.join(s.value for s in expected)}"
+        )